@@ -0,0 +1,575 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import argparse
+import functools
+import html
+import io
+import json
+import logging
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+# Content types served by the mock and IDs of their modules
+CONTENT_SCORM_PRESENTATION = "scorm_presentation"
+CONTENT_SCORM_BOOK = "scorm_book"
+CONTENT_H5P_PRESENTATION = "h5p_presentation"
+MODULE_IDS = {CONTENT_SCORM_PRESENTATION: 1, CONTENT_SCORM_BOOK: 2, CONTENT_H5P_PRESENTATION: 3}
+
+# Name of the session cookie (the same as Moodle's one)
+SESSION_COOKIE = "MoodleSession"
+
+# Size of generated slide images
+SLIDE_IMAGE_SIZE = (1280, 720)
+
+# Common page layout
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>
+"""
+
+# Login form with the same element IDs as Moodle's one
+_LOGIN_FORM = """
+{errors}
+<form action="/login/index.php" method="post">
+    <input type="text" name="username" id="username">
+    <input type="password" name="password" id="password">
+    <button type="submit" id="loginbtn">Log in</button>
+</form>
+"""
+
+# Module page with enter button (Moodle shows it for SCORM modules)
+_SCORM_VIEW = """
+<span class="usertext">{user}</span>
+<form action="/mod/scorm/player.php" method="get">
+    <input type="hidden" name="id" value="{module_id}">
+    <input class="btn btn-primary" type="submit" value="Enter">
+</form>
+"""
+
+# SCORM presentation player. Slide is replaced with a delay after clicking next button like real players do
+_SCORM_PRESENTATION_PLAYER = """
+<style>
+    body {{ margin: 0; }}
+    #slide img {{ width: 100%; }}
+</style>
+<div id="playerView">
+    <div id="slide"></div>
+    <button aria-label="next slide" id="next">Next</button>
+</div>
+<script>
+const slidesCount = {slides}, slideLatency = {slide_latency};
+const nextButton = document.getElementById("next");
+let current = 0;
+const render = () => {{
+    document.getElementById("slide").innerHTML = "<h1>Slide " + (current + 1) + " of " + slidesCount + "</h1>"
+        + "<img src='slides/slide" + (current + 1) + ".png'>";
+    nextButton.disabled = current >= slidesCount - 1;
+}};
+nextButton.addEventListener("click", () => {{
+    if (current < slidesCount - 1) setTimeout(() => {{ current++; render(); }}, slideLatency);
+}});
+render();
+</script>
+"""
+
+# SCORM book player. It's opened in book view mode that must be switched to the page view
+_SCORM_BOOK_PLAYER = """
+<style>
+    .page {{ display: none; }}
+    .page.current {{ display: block; }}
+</style>
+<button class="btn" id="mode"><div class="icon viewMode book"></div></button>
+<div class="viewer bookViewer" id="viewer">{pages}</div>
+<button class="btn" id="next"><div class="icon next down"></div></button>
+<script>
+const pagesCount = {slides}, slideLatency = {slide_latency};
+const viewer = document.getElementById("viewer"), nextButton = document.getElementById("next");
+const modeButton = document.getElementById("mode");
+let current = 0;
+const render = () => {{
+    viewer.querySelectorAll(".page").forEach((page, index) => page.classList.toggle("current", index === current));
+    nextButton.disabled = current >= pagesCount - 1;
+}};
+modeButton.addEventListener("click", () => {{
+    setTimeout(() => {{ viewer.className = "viewer pageViewer"; modeButton.remove(); }}, slideLatency);
+}});
+nextButton.addEventListener("click", () => {{
+    if (current < pagesCount - 1) setTimeout(() => {{ current++; render(); }}, slideLatency);
+}});
+render();
+</script>
+"""
+
+# H5P activity page with the content's iframe
+_H5P_VIEW = """
+<span class="usertext">{user}</span>
+<iframe class="h5p-iframe" src="/h5p/embed.php?id={module_id}" width="1280" height="760"></iframe>
+"""
+
+# H5P Course Presentation with the same classes, API and H5PIntegration object as the real one
+_H5P_EMBED = """<!DOCTYPE html>
+<html class="h5p-iframe"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+    body {{ margin: 0; }}
+    .h5p-slide {{ display: none; width: 1280px; height: 720px; position: relative; }}
+    .h5p-slide.h5p-current {{ display: block; }}
+    .h5p-slide img {{ position: absolute; left: 0; top: 0; width: 100%; height: 100%; }}
+    .h5p-slide .h5p-text {{ position: absolute; left: 5%; top: 5%; font-size: 32px; }}
+    .h5p-footer-button {{ display: inline-block; padding: 8px; cursor: pointer; }}
+</style>
+</head>
+<body>
+<div class="h5p-content"><div class="h5p-wrapper">
+    <div class="h5p-slides-wrapper">{slides_html}</div>
+    <div class="h5p-footer">
+        <div class="h5p-footer-button h5p-footer-previous-slide" role="button" aria-disabled="true">&lt;</div>
+        <div class="h5p-footer-button h5p-footer-next-slide" role="button" aria-disabled="false">&gt;</div>
+    </div>
+</div></div>
+<script>
+window.H5PIntegration = {integration};
+const slidesCount = {slides}, slideLatency = {slide_latency};
+const slides = document.querySelectorAll(".h5p-slide");
+const previousButton = document.querySelector(".h5p-footer-previous-slide");
+const nextButton = document.querySelector(".h5p-footer-next-slide");
+const instance = {{
+    slides: Array.from(slides),
+    currentSlideIndex: 0,
+    jumpToSlide: (slideIndex) => setTimeout(() => {{ instance.currentSlideIndex = slideIndex; render(); }},
+                                            slideLatency)
+}};
+window.H5P = {{instances: [instance]}};
+const render = () => {{
+    slides.forEach((slide, index) => slide.classList.toggle("h5p-current", index === instance.currentSlideIndex));
+    previousButton.setAttribute("aria-disabled", String(instance.currentSlideIndex === 0));
+    nextButton.setAttribute("aria-disabled", String(instance.currentSlideIndex >= slidesCount - 1));
+}};
+previousButton.addEventListener("click", () => {{
+    if (instance.currentSlideIndex > 0) instance.jumpToSlide(instance.currentSlideIndex - 1);
+}});
+nextButton.addEventListener("click", () => {{
+    if (instance.currentSlideIndex < slidesCount - 1) instance.jumpToSlide(instance.currentSlideIndex + 1);
+}});
+render();
+</script>
+</body></html>
+"""
+
+# Paragraphs of SCORM book pages
+_BOOK_TEXT = "Page {page} of the book. Lorem ipsum dolor sit amet, consectetur adipiscing elit, " \
+             "sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. "
+
+
+class MockLMS:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 slides: int = 20,
+                 latency: float = 0.,
+                 slide_latency: float = 0.3,
+                 h5p_image_slides: float = 0.5,
+                 login: str = "student",
+                 password: str = "password") -> None:
+        """
+        Initializes MockLMS class (local stand-in for Moodle that serves login form, SCORM presentation and book
+        players and H5P Course Presentation to benchmark LMSDownloader offline)
+        :param host: Address to listen on
+        :param port: Port to listen on. 0 to pick a free one
+        :param slides: Number of slides (pages) of each content
+        :param latency: Delay (in seconds) before responding to each request
+        :param slide_latency: Delay (in seconds) between clicking next button and showing the next slide
+        :param h5p_image_slides: Part (0-1) of H5P slides that consist of one full-slide image only
+        (they can be built from the original images)
+        :param login: Accepted LMS login
+        :param password: Accepted LMS password
+        """
+        self.slides = slides
+        self.latency = latency
+        self.slide_latency = slide_latency
+        self.h5p_image_slides = h5p_image_slides
+        self.login = login
+        self.password = password
+
+        self.stats = {"requests": 0, "logins": 0}
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        :return: Base URL of the server (without trailing slash)
+        """
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def login_link(self) -> str:
+        """
+        :return: Link to the login page
+        """
+        return self.url + "/login/index.php"
+
+    def link(self, content_type: str) -> str:
+        """
+        Generates link to the module
+        :param content_type: CONTENT_SCORM_PRESENTATION, CONTENT_SCORM_BOOK or CONTENT_H5P_PRESENTATION
+        :return: Link to the module's page
+        """
+        module = "h5pactivity" if content_type == CONTENT_H5P_PRESENTATION else "scorm"
+        return "{}/mod/{}/view.php?id={}".format(self.url, module, MODULE_IDS[content_type])
+
+    def start(self) -> None:
+        """
+        Starts serving in a background thread
+        :return:
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info("Mock LMS is running on {}".format(self.url))
+
+    def stop(self) -> None:
+        """
+        Stops server
+        :return:
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockLMS":
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def create_session(self, login: str, password: str) -> Optional[str]:
+        """
+        Checks credentials and creates new session
+        :param login: LMS login
+        :param password: LMS password
+        :return: Session ID or None if credentials are wrong
+        """
+        if login != self.login or password != self.password:
+            return None
+        session_id = secrets.token_hex(16)
+        with self._lock:
+            self._sessions.add(session_id)
+            self.stats["logins"] += 1
+        return session_id
+
+    def is_session_valid(self, session_id: Optional[str]) -> bool:
+        """
+        :param session_id: Value of the session cookie
+        :return: True if session was created by create_session()
+        """
+        with self._lock:
+            return session_id in self._sessions
+
+    def h5p_is_image_slide(self, slide_index: int) -> bool:
+        """
+        :param slide_index: Slide number (starting from 0)
+        :return: True if H5P slide consists of one full-slide image only
+        """
+        return int((slide_index + 1) * self.h5p_image_slides) > int(slide_index * self.h5p_image_slides)
+
+    def h5p_integration(self, module_id: int) -> dict:
+        """
+        Generates H5PIntegration object of Course Presentation
+        :param module_id: ID of H5P module
+        :return: H5PIntegration with one content
+        """
+        slides = []
+        for slide_index in range(self.slides):
+            image = {"library": "H5P.Image 1.1",
+                     "params": {"file": {"path": "images/slide-{}.png".format(slide_index + 1)}}}
+            if self.h5p_is_image_slide(slide_index):
+                elements = [{"x": 0, "y": 0, "width": 100, "height": 100, "action": image}]
+            else:
+                elements = [{"x": 0, "y": 0, "width": 100, "height": 100, "action": image},
+                            {"x": 5, "y": 5, "width": 90, "height": 10,
+                             "action": {"library": "H5P.AdvancedText 1.1",
+                                        "params": {"text": "Slide {}".format(slide_index + 1)}}}]
+            slides.append({"elements": elements})
+        return {"url": "/pluginfile.php/{}/mod_h5pactivity".format(module_id),
+                "contents": {"cid-{}".format(module_id): {
+                    "library": "H5P.CoursePresentation 1.25",
+                    "contentUrl": "/pluginfile.php/{}/mod_h5pactivity/content/{}".format(module_id, module_id),
+                    "jsonContent": json.dumps({"presentation": {"slides": slides}})}}}
+
+
+@functools.lru_cache(maxsize=256)
+def slide_image(slide_number: int, content_id: int) -> bytes:
+    """
+    Generates slide image (each slide has its own color and number)
+    :param slide_number: Slide number (starting from 1)
+    :param content_id: Module ID (to make images of different modules different)
+    :return: PNG image as bytes
+    """
+    color = ((slide_number * 47 + content_id * 91) % 200 + 40, (slide_number * 89) % 200 + 40,
+             (slide_number * 131 + content_id * 17) % 200 + 40)
+    image = Image.new("RGB", SLIDE_IMAGE_SIZE, color)
+    draw = ImageDraw.Draw(image)
+    for line_index in range(12):
+        draw.text((64, 64 + line_index * 48), "Module {} slide {} line {}".format(content_id, slide_number,
+                                                                                line_index + 1),
+                  fill=(255, 255, 255))
+    draw.rectangle((SLIDE_IMAGE_SIZE[0] - 320, SLIDE_IMAGE_SIZE[1] - 240, SLIDE_IMAGE_SIZE[0] - 64,
+                    SLIDE_IMAGE_SIZE[1] - 64), outline=(255, 255, 255), width=8)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def _scorm_manifest(module_id: int, slides_count: int, with_slide_images: bool) -> str:
+    """
+    Generates imsmanifest.xml of SCORM package
+    :param module_id: SCORM module ID
+    :param slides_count: Number of slides
+    :param with_slide_images: True to list pre-rendered slide images as package files
+    :return: XML as string
+    """
+    files = ["<file href=\"index.html\"/>"]
+    if with_slide_images:
+        files.extend("<file href=\"slides/slide{}.png\"/>".format(slide_number)
+                     for slide_number in range(1, slides_count + 1))
+    return """<?xml version="1.0" encoding="UTF-8"?>
+<manifest identifier="package-{module_id}" xmlns="http://www.imsglobal.org/xsd/imscp_v1p1">
+    <organizations default="organization">
+        <organization identifier="organization">
+            <item identifier="item" identifierref="resource"><title>Module {module_id}</title></item>
+        </organization>
+    </organizations>
+    <resources>
+        <resource identifier="resource" type="webcontent" href="index.html">
+            {files}
+        </resource>
+    </resources>
+</manifest>
+""".format(module_id=module_id, files="\n            ".join(files))
+
+
+def _make_handler(mock_lms: MockLMS):
+    """
+    Creates HTTP request handler class bound to the mock LMS
+    :param mock_lms: MockLMS instance
+    :return: BaseHTTPRequestHandler subclass
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self._handle()
+
+        def do_POST(self) -> None:
+            self._handle()
+
+        def log_message(self, format_: str, *args) -> None:
+            logging.debug("Mock LMS: " + format_ % args)
+
+        def _handle(self) -> None:
+            with mock_lms._lock:
+                mock_lms.stats["requests"] += 1
+            if mock_lms.latency > 0:
+                time.sleep(mock_lms.latency)
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            path = url.path.rstrip("/")
+            module_id = int(query.get("id", ["0"])[0]) if query.get("id", ["0"])[0].isdigit() else 0
+
+            # Login page is the only one available without session
+            if path == "/login/index.php":
+                self._login()
+                return
+            if not mock_lms.is_session_valid(self._session_id()):
+                self._redirect(mock_lms.login_link)
+                return
+
+            if path in ("", "/my"):
+                self._reply_page("Dashboard", "<span class=\"usertext\">{}</span>".format(mock_lms.login))
+
+            # SCORM module page and player
+            elif path == "/mod/scorm/view.php" and module_id in (MODULE_IDS[CONTENT_SCORM_PRESENTATION],
+                                                                  MODULE_IDS[CONTENT_SCORM_BOOK]):
+                self._reply_page("SCORM {}".format(module_id),
+                                 _SCORM_VIEW.format(user=mock_lms.login, module_id=module_id))
+            elif path == "/mod/scorm/player.php" and module_id:
+                self._reply_page("SCORM {}".format(module_id),
+                                 "<span class=\"usertext\">{}</span><iframe id=\"scorm_object\" "
+                                 "src=\"/pluginfile.php/{}/mod_scorm/content/{}/index.html\"></iframe>"
+                                 .format(mock_lms.login, module_id, module_id))
+            elif path.startswith("/pluginfile.php/") and "/mod_scorm/content/" in path:
+                self._scorm_file(path)
+
+            # H5P activity page, embedded content and its files
+            elif path == "/mod/h5pactivity/view.php" and module_id == MODULE_IDS[CONTENT_H5P_PRESENTATION]:
+                self._reply_page("H5P {}".format(module_id), _H5P_VIEW.format(user=mock_lms.login,
+                                                                              module_id=module_id))
+            elif path == "/h5p/embed.php" and module_id == MODULE_IDS[CONTENT_H5P_PRESENTATION]:
+                self._h5p_embed(module_id)
+            elif path.startswith("/pluginfile.php/") and "/mod_h5pactivity/content/" in path:
+                self._h5p_file(path)
+
+            else:
+                self._reply(404, "text/plain", b"Not found")
+
+        def _login(self) -> None:
+            # Already logged in
+            if self.command == "GET" and mock_lms.is_session_valid(self._session_id()):
+                self._reply_page("Dashboard", "<span class=\"usertext\">{}</span>".format(mock_lms.login))
+                return
+
+            errors = ""
+            if self.command == "POST":
+                form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+                session_id = mock_lms.create_session(form.get("username", [""])[0], form.get("password", [""])[0])
+                if session_id is not None:
+                    self._redirect(mock_lms.url + "/my/",
+                                   cookie="{}={}; Path=/; HttpOnly".format(SESSION_COOKIE, session_id))
+                    return
+                errors = "<div class=\"loginerrors\">Invalid login, please try again</div>"
+            self._reply_page("Log in", _LOGIN_FORM.format(errors=errors))
+
+        def _scorm_file(self, path: str) -> None:
+            parts = path.split("/")
+            module_id = int(parts[2]) if parts[2].isdigit() else 0
+            file_path = "/".join(parts[parts.index("content") + 2:])
+            if module_id == MODULE_IDS[CONTENT_SCORM_PRESENTATION]:
+                if file_path == "index.html":
+                    self._reply_page("Presentation", _SCORM_PRESENTATION_PLAYER.format(
+                        slides=mock_lms.slides, slide_latency=int(mock_lms.slide_latency * 1000)))
+                    return
+                if file_path.startswith("slides/slide") and file_path.endswith(".png"):
+                    slide_number = file_path[len("slides/slide"):-len(".png")]
+                    if slide_number.isdigit() and 1 <= int(slide_number) <= mock_lms.slides:
+                        self._reply(200, "image/png", slide_image(int(slide_number), module_id))
+                        return
+            elif module_id == MODULE_IDS[CONTENT_SCORM_BOOK] and file_path == "index.html":
+                pages = "".join("<div class=\"page\"><h2>Page {0}</h2><p>{1}</p></div>"
+                                .format(page_number, html.escape(_BOOK_TEXT.format(page=page_number) * 20))
+                                for page_number in range(1, mock_lms.slides + 1))
+                self._reply_page("Book", _SCORM_BOOK_PLAYER.format(
+                    pages=pages, slides=mock_lms.slides, slide_latency=int(mock_lms.slide_latency * 1000)))
+                return
+            if file_path == "imsmanifest.xml" and module_id in (MODULE_IDS[CONTENT_SCORM_PRESENTATION],
+                                                                 MODULE_IDS[CONTENT_SCORM_BOOK]):
+                manifest = _scorm_manifest(module_id, mock_lms.slides,
+                                           module_id == MODULE_IDS[CONTENT_SCORM_PRESENTATION])
+                self._reply(200, "application/xml", manifest.encode("utf-8"))
+                return
+            self._reply(404, "text/plain", b"Not found")
+
+        def _h5p_embed(self, module_id: int) -> None:
+            content_url = "/pluginfile.php/{}/mod_h5pactivity/content/{}".format(module_id, module_id)
+            slides_html = []
+            for slide_index in range(mock_lms.slides):
+                slide_html = "<div class=\"h5p-slide\"><img src=\"{}/images/slide-{}.png\">" \
+                    .format(content_url, slide_index + 1)
+                if not mock_lms.h5p_is_image_slide(slide_index):
+                    slide_html += "<div class=\"h5p-text\">Slide {}</div>".format(slide_index + 1)
+                slides_html.append(slide_html + "</div>")
+            body = _H5P_EMBED.format(title="H5P {}".format(module_id), slides_html="".join(slides_html),
+                                     integration=json.dumps(mock_lms.h5p_integration(module_id)),
+                                     slides=mock_lms.slides, slide_latency=int(mock_lms.slide_latency * 1000))
+            self._reply(200, "text/html; charset=utf-8", body.encode("utf-8"))
+
+        def _h5p_file(self, path: str) -> None:
+            parts = path.split("/")
+            module_id = int(parts[2]) if parts[2].isdigit() else 0
+            file_name = parts[-1]
+            if module_id == MODULE_IDS[CONTENT_H5P_PRESENTATION] and parts[-2] == "images" \
+                    and file_name.startswith("slide-") and file_name.endswith(".png"):
+                slide_number = file_name[len("slide-"):-len(".png")]
+                if slide_number.isdigit() and 1 <= int(slide_number) <= mock_lms.slides:
+                    self._reply(200, "image/png", slide_image(int(slide_number), module_id))
+                    return
+            self._reply(404, "text/plain", b"Not found")
+
+        def _session_id(self) -> Optional[str]:
+            for cookie in self.headers.get("Cookie", "").split(";"):
+                name, _, value = cookie.strip().partition("=")
+                if name == SESSION_COOKIE:
+                    return value
+            return None
+
+        def _redirect(self, location: str, cookie: Optional[str] = None) -> None:
+            self.send_response(303)
+            self.send_header("Location", location)
+            if cookie is not None:
+                self.send_header("Set-Cookie", cookie)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _reply_page(self, title: str, body: str) -> None:
+            self._reply(200, "text/html; charset=utf-8",
+                        _PAGE_TEMPLATE.format(title=html.escape(title), body=body).encode("utf-8"))
+
+        def _reply(self, code: int, content_type: str, body: bytes) -> None:
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return _Handler
+
+
+def main():
+    """
+    Runs mock LMS until interrupted (to test LMSDownloader manually)
+    :return:
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in for Moodle to benchmark LMSDownloader offline")
+    parser.add_argument("--host", help="address to listen on", type=str, default="127.0.0.1")
+    parser.add_argument("--port", help="port to listen on", type=int, default=8000)
+    parser.add_argument("--slides", help="number of slides (pages) of each content", type=int, default=20)
+    parser.add_argument("--latency", help="delay (in seconds) before responding to each request",
+                        type=float, default=0.)
+    parser.add_argument("--slide-latency", help="delay (in seconds) between clicking next button and "
+                                                "showing the next slide", type=float, default=0.3)
+    parser.add_argument("--h5p-image-slides", help="part (0-1) of H5P slides that consist of one full-slide "
+                                                   "image only", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(message)s")
+
+    mock_lms = MockLMS(args.host, args.port, slides=args.slides, latency=args.latency,
+                       slide_latency=args.slide_latency, h5p_image_slides=args.h5p_image_slides)
+    with mock_lms:
+        logging.info("Login: {} / {}".format(mock_lms.login, mock_lms.password))
+        for content_type in MODULE_IDS:
+            logging.info("{}: {}".format(content_type, mock_lms.link(content_type)))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
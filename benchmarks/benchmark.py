@@ -0,0 +1,278 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from PyPDF2 import PdfReader
+
+from LMSDownloader.LMSDownloader import LMSDownloader
+from LMSDownloader.main import logging_setup
+from MockLMS import MODULE_IDS, MockLMS
+
+
+class RSSSampler:
+    def __init__(self, interval: float = 0.1) -> None:
+        """
+        Initializes RSSSampler class (samples total RSS of this process and all its descendants,
+        including browser and chromedriver, in a background thread)
+        :param interval: How often (in seconds) to sample RSS
+        """
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.peak = 0
+
+    def start(self) -> None:
+        """
+        Starts sampling
+        :return:
+        """
+        self.peak = 0
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        """
+        Stops sampling
+        :return: Peak RSS in bytes (0 if it can't be measured on this platform)
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.peak
+
+    def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, tree_rss())
+            if self._stop_event.wait(self._interval):
+                break
+
+
+def tree_rss(pid: Optional[int] = None) -> int:
+    """
+    Calculates total RSS of the process and all its descendants using /proc (Linux only)
+    :param pid: Root process ID. None for the current process
+    :return: RSS in bytes or 0 if /proc is not available
+    """
+    if not os.path.isdir("/proc"):
+        return 0
+    pid = pid if pid is not None else os.getpid()
+
+    # Build parent -> children map
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open("/proc/{}/stat".format(entry), "r") as stat_file:
+                # Process name can contain spaces and brackets, so fields are counted from the last bracket
+                parent_pid = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(parent_pid, []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+
+    # Sum RSS of the whole tree
+    rss = 0
+    pids = [pid]
+    while pids:
+        pid_ = pids.pop()
+        pids.extend(children.get(pid_, []))
+        try:
+            with open("/proc/{}/status".format(pid_), "r") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+                        break
+        except (OSError, ValueError):
+            pass
+    return rss
+
+
+def run_once(mock_lms: MockLMS, content_type: str, save_to_directory: str, downloader_kwargs: dict) -> dict:
+    """
+    Downloads one content of the mock LMS end to end
+    :param mock_lms: Running MockLMS
+    :param content_type: One of MockLMS content types
+    :param save_to_directory: Path to the dir where to save downloaded files
+    :param downloader_kwargs: Additional LMSDownloader() params
+    :return: {"pages": int, "seconds": float, "pages_per_second": float, "peak_rss": int, "stages": dict,
+    "counters": dict}
+    """
+    lms_downloader = LMSDownloader(mock_lms.login, mock_lms.password, mock_lms.link(content_type),
+                                   login_link=mock_lms.login_link, link_check_regex="^", **downloader_kwargs)
+    rss_sampler = RSSSampler()
+    rss_sampler.start()
+    time_started = time.perf_counter()
+    try:
+        downloaded_paths = lms_downloader.download(save_to_directory)
+    finally:
+        seconds = time.perf_counter() - time_started
+        peak_rss = rss_sampler.stop()
+
+    # Count pages of the output files
+    pages = 0
+    for downloaded_path in downloaded_paths:
+        if downloaded_path.lower().endswith(".pdf"):
+            pages += len(PdfReader(downloaded_path).pages)
+    if pages != mock_lms.slides:
+        logging.warning("{}: {} pages downloaded instead of {}".format(content_type, pages, mock_lms.slides))
+
+    return {"pages": pages,
+            "seconds": seconds,
+            "pages_per_second": pages / seconds if seconds > 0 else 0.,
+            "peak_rss": peak_rss,
+            "stages": {name: dict(stage) for name, stage in lms_downloader.metrics.stages.items()},
+            "counters": dict(lms_downloader.metrics.counters)}
+
+
+def run_benchmark(mock_lms: MockLMS, content_types: list[str], repeat: int, downloader_kwargs: dict) -> dict:
+    """
+    Downloads each content type repeat times
+    :param mock_lms: Running MockLMS
+    :param content_types: Content types to benchmark
+    :param repeat: How many times to download each content
+    :param downloader_kwargs: Additional LMSDownloader() params
+    :return: {content type: run_once() result of the median run (by pages/sec) with peak RSS of all runs}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as save_to_directory:
+        for content_type in content_types:
+            runs = []
+            for run_index in range(repeat):
+                logging.warning("Benchmarking {} ({} / {})".format(content_type, run_index + 1, repeat))
+                runs.append(run_once(mock_lms, content_type, os.path.join(save_to_directory, str(run_index)),
+                                     downloader_kwargs))
+            runs.sort(key=lambda run: run["pages_per_second"])
+            result = runs[len(runs) // 2]
+            result["runs"] = [run["pages_per_second"] for run in runs]
+            result["pages_per_second_stdev"] = statistics.pstdev(result["runs"])
+            result["peak_rss"] = max(run["peak_rss"] for run in runs)
+            results[content_type] = result
+    return results
+
+
+def print_report(results: dict) -> None:
+    """
+    Prints results as tables
+    :param results: Result of run_benchmark()
+    :return:
+    """
+    print("{:<20} {:>6} {:>9} {:>10} {:>14}".format("content", "pages", "seconds", "pages/sec", "peak RSS (MB)"))
+    for content_type, result in results.items():
+        print("{:<20} {:>6} {:>9.2f} {:>10.3f} {:>14.1f}".format(content_type, result["pages"], result["seconds"],
+                                                                result["pages_per_second"],
+                                                                result["peak_rss"] / 1024 / 1024))
+    for content_type, result in results.items():
+        print()
+        print("{:<20} {:>6} {:>9} {:>9}".format(content_type, "count", "total", "max"))
+        for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["total"]):
+            print("  {:<18} {:>6} {:>9.3f} {:>9.3f}".format(name, stage["count"], stage["total"], stage["max"]))
+
+
+def check_regressions(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Compares pages/sec with the baseline
+    :param results: Result of run_benchmark()
+    :param baseline: Previously saved result of run_benchmark()
+    :param max_regression: Max allowed slowdown (0-1)
+    :return: Description of each regression
+    """
+    regressions = []
+    for content_type, result in results.items():
+        if content_type not in baseline:
+            continue
+        baseline_speed = baseline[content_type]["pages_per_second"]
+        if result["pages_per_second"] < baseline_speed * (1. - max_regression):
+            regressions.append("{}: {:.3f} pages/sec, baseline {:.3f} pages/sec"
+                               .format(content_type, result["pages_per_second"], baseline_speed))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks LMSDownloader end to end against local mock LMS")
+    parser.add_argument("--content", help="content types to benchmark", type=str, nargs="+",
+                        choices=list(MODULE_IDS), default=list(MODULE_IDS))
+    parser.add_argument("--slides", help="number of slides (pages) of each content", type=int, default=20)
+    parser.add_argument("--latency", help="delay (in seconds) before responding to each request",
+                        type=float, default=0.)
+    parser.add_argument("--slide-latency", help="delay (in seconds) between clicking next button and "
+                                                "showing the next slide", type=float, default=0.3)
+    parser.add_argument("--h5p-image-slides", help="part (0-1) of H5P slides that consist of one full-slide "
+                                                   "image only", type=float, default=0.5)
+    parser.add_argument("--repeat", help="how many times to download each content (median run is reported)",
+                        type=int, default=1)
+    parser.add_argument("--wait-between-pages", help="LMSDownloader's wait_between_pages", type=float, default=1.)
+    parser.add_argument("--no-headless", help="specify to show browser window", action="store_true")
+    parser.add_argument("--no-adaptive-wait", help="specify to benchmark fixed waits", action="store_true")
+    parser.add_argument("--no-h5p-fast-path", help="specify to capture all H5P slides as screenshots",
+                        action="store_true")
+    parser.add_argument("--scorm-fast-path", help="specify to download SCORM packages using imsmanifest.xml",
+                        action="store_true")
+    parser.add_argument("--json", help="path to the file to save results to", type=str, default=None)
+    parser.add_argument("--baseline", help="path to the results file of the previous run to compare pages/sec with",
+                        type=str, default=None)
+    parser.add_argument("--max-regression", help="max allowed pages/sec slowdown compared to --baseline (0-1). "
+                                                 "Exit code is 1 if it's exceeded", type=float, default=0.2)
+    parser.add_argument("--verbose", help="specify to print LMSDownloader logs", action="store_true")
+    args = parser.parse_args()
+
+    # Initialize logging
+    logging_setup()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    downloader_kwargs = {"wait_between_pages": args.wait_between_pages,
+                         "headless": not args.no_headless,
+                         "adaptive_wait": not args.no_adaptive_wait,
+                         "h5p_fast_path": not args.no_h5p_fast_path,
+                         "scorm_fast_path": args.scorm_fast_path}
+
+    with MockLMS(slides=args.slides, latency=args.latency, slide_latency=args.slide_latency,
+                 h5p_image_slides=args.h5p_image_slides) as mock_lms:
+        results = run_benchmark(mock_lms, args.content, args.repeat, downloader_kwargs)
+    print_report(results)
+
+    # Save results
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=4)
+
+    # Compare with the previous run
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            regressions = check_regressions(results, json.load(baseline_file), args.max_regression)
+        for regression in regressions:
+            logging.error("Regression! {}".format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,7 @@ setup(
         "pypdf2~=3.0.1",
         "beautifulsoup4~=4.12.2",
         "selenium~=4.14.0",
+        "urllib3~=2.0",
     ],
     long_description=Path.open(Path("README.md"), encoding="utf-8").read(),
     long_description_content_type="text/markdown",
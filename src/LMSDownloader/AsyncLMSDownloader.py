@@ -0,0 +1,657 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, Optional
+from urllib.parse import urljoin
+
+from LMSDownloader.CDPConnection import CDPConnection
+from LMSDownloader.ImagePdf import image_to_pdf
+from LMSDownloader.LMSDownloader import CONTENT_TYPE_H5P_PRESENTATION, CONTENT_TYPE_SCORM_BOOK, \
+    CONTENT_TYPE_SCORM_PRESENTATION, LINK_CHECK_REGEX_DEFAULT, USER_AGENT_DEFAULT
+from LMSDownloader.PdfAssembler import PdfAssembler
+
+# Chrome executables to look for if chrome_path is not specified
+CHROME_NAMES = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"]
+
+# Max size of each chunk of printed PDF (in bytes)
+CHUNK_SIZE = 1024 * 1024
+
+# Selectors (the same elements as LMSDownloader looks for using XPath)
+ENTER_BUTTON_SELECTOR = "input[class='btn btn-primary'][type='submit']"
+SCORM_PLAYER_SELECTORS = ["#playerView", "div[class='viewer bookViewer']", "div[class='viewer pageViewer']"]
+SCORM_PRESENTATION_SELECTOR = "#playerView"
+SCORM_BOOK_SELECTOR = "div[class='viewer pageViewer']"
+BOOK_MODE_BUTTON_SELECTOR = "button[class='btn'] > div[class='icon viewMode book']"
+MESSAGE_BOX_BUTTON_SELECTOR = ".message-box-buttons-panel__window-button"
+NEXT_BUTTON_SELECTORS = {
+    CONTENT_TYPE_SCORM_PRESENTATION: "button[aria-label='next slide']",
+    CONTENT_TYPE_SCORM_BOOK: "button[class='btn'] > div[class='icon next down']",
+    CONTENT_TYPE_H5P_PRESENTATION: "div[class='h5p-footer-button h5p-footer-next-slide']",
+}
+H5P_PREVIOUS_BUTTON_SELECTOR = "div[class='h5p-footer-button h5p-footer-previous-slide']"
+
+# Root documents of content (SCORM player is opened as page, H5P is inside same-origin iframe)
+_ROOT_SCORM = "() => document"
+_ROOT_H5P = "() => { const frame = document.querySelector('.h5p-iframe'); return frame && frame.contentDocument; }"
+
+# Helpers that wait for DOM changes using MutationObserver (installed into each new document of the tab)
+_HELPERS_SCRIPT = """
+window.__lmsDownloader = window.__lmsDownloader || (() => {
+    const documents = () => {
+        const list = [document];
+        for (const frame of document.querySelectorAll("iframe, frame")) {
+            try { if (frame.contentDocument) list.push(frame.contentDocument); } catch (e) {}
+        }
+        return list;
+    };
+    // Observes document and its iframes (iframes can be loaded later, so attach() is called on each change)
+    const observe = (callback) => {
+        const observers = [];
+        const attach = () => {
+            for (const doc of documents()) {
+                if (observers.some((observer) => observer.doc === doc)) continue;
+                const observer = new MutationObserver(() => { attach(); callback(); });
+                observer.observe(doc, {subtree: true, childList: true, attributes: true, characterData: true});
+                observers.push({doc: doc, observer: observer});
+            }
+        };
+        attach();
+        const interval = setInterval(attach, 250);
+        return () => { clearInterval(interval); observers.forEach((item) => item.observer.disconnect()); };
+    };
+    // First (or last) element that matches selector
+    const target = (root, selector, last) => {
+        const doc = root();
+        const elements = doc ? doc.querySelectorAll(selector) : [];
+        const element = elements[last ? elements.length - 1 : 0];
+        return element && (element.closest("button") || element);
+    };
+    const isDisabled = (element) => element.disabled || element.getAttribute("aria-disabled") === "true";
+    // Resolves when DOM is not changed for quiet ms (after the first change if changed is false) or on timeout
+    const waitQuiet = (changed, quiet, timeout) => new Promise((resolve) => {
+        let quietTimer = null;
+        const finish = () => { clearTimeout(quietTimer); clearTimeout(timer); stop(); resolve(changed); };
+        const arm = () => { clearTimeout(quietTimer); quietTimer = setTimeout(finish, quiet); };
+        const stop = observe(() => { changed = true; arm(); });
+        const timer = setTimeout(finish, timeout);
+        if (changed) arm();
+    });
+    return {
+        // Resolves with index of the first found selector or -1 on timeout
+        waitFor: (root, selectors, timeout) => new Promise((resolve) => {
+            const check = () => {
+                const doc = root();
+                return doc ? selectors.findIndex((selector) => doc.querySelector(selector)) : -1;
+            };
+            if (check() >= 0) return resolve(check());
+            const finish = (index) => { clearTimeout(timer); stop(); resolve(index); };
+            const stop = observe(() => { if (check() >= 0) finish(check()); });
+            const timer = setTimeout(() => finish(-1), timeout);
+        }),
+        waitQuiet: waitQuiet,
+        // Clicks element and waits for the page to react. Resolves with false if it's missing or disabled
+        click: async (root, selector, quiet, timeout, last) => {
+            const element = target(root, selector, last);
+            if (!element || isDisabled(element)) return false;
+            const changed = waitQuiet(false, quiet, timeout);
+            element.click();
+            await changed;
+            return true;
+        },
+        isEnabled: (root, selector) => {
+            const element = target(root, selector);
+            return !!element && !isDisabled(element);
+        }
+    };
+})();
+"""
+
+
+class AsyncLMSDownloader:
+    def __init__(self, lms_login: str, lms_password: str,
+                 login_link: str = "https://online.mospolytech.ru/login/index.php",
+                 wait_between_pages: float = 1.,
+                 link_check_regex: str = LINK_CHECK_REGEX_DEFAULT,
+                 user_agent: str = USER_AGENT_DEFAULT,
+                 window_size: str = "960,1080",
+                 headless: bool = True,
+                 max_volume_size: float = 0.,
+                 chrome_path: Optional[str] = None) -> None:
+        """
+        Initializes AsyncLMSDownloader class (asyncio counterpart of LMSDownloader that drives Chrome
+        using DevTools protocol directly. All downloads share one browser, one login and one event loop)
+        :param lms_login: LMS account login
+        :param lms_password: LMS account password
+        :param login_link: Link to LMS login page
+        :param wait_between_pages: Max time to wait for the page to react after going to next one
+        :param link_check_regex: Regex expression to check links, replace to "^" to bypass link check
+        :param user_agent: Browser's user agent to prevent mobile version
+        :param window_size: Default browser's window size
+        :param headless: Set True to open Chrome in headless mode
+        :param max_volume_size: Split output PDF into multiple files of this size (in MB). 0 to disable splitting
+        :param chrome_path: Path to Chrome executable. None to find it in PATH
+        """
+        self._lms_login = lms_login
+        self._lms_password = lms_password
+        self._login_link = login_link
+        self._wait_between_pages = wait_between_pages
+        self._link_check_regex = link_check_regex
+        self._user_agent = user_agent
+        self._window_size = [int(size) for size in window_size.split(",")]
+        self._headless = headless
+        self._max_volume_size = max_volume_size
+        self._chrome_path = chrome_path
+
+        self._process = None
+        self._stderr_task = None
+        self._user_data_dir = None
+        self._connection = None
+
+        # Created inside the running loop (lock is bound to the loop it's created in on Python < 3.10)
+        self._start_lock = None
+
+    async def __aenter__(self) -> "AsyncLMSDownloader":
+        await self.start_browser()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.quit_browser()
+
+    async def start_browser(self) -> None:
+        """
+        Starts browser, connects to it and logs into LMS (does nothing if it's already started)
+        :return:
+        """
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._connection is not None:
+                return
+            await self._start_browser()
+            try:
+                tab = await self._open_tab()
+                try:
+                    await self._login(tab)
+                finally:
+                    await tab.close()
+            except Exception:
+                await self.quit_browser()
+                raise
+
+    async def quit_browser(self) -> None:
+        """
+        Closes browser
+        :return:
+        """
+        if self._connection is not None:
+            logging.info("Exiting browser")
+            try:
+                await asyncio.wait_for(self._connection.send("Browser.close"), 10)
+            except Exception as e:
+                logging.warning("Error closing browser: {}".format(e))
+            await self._connection.close()
+            self._connection = None
+        if self._process is not None:
+            try:
+                await asyncio.wait_for(self._process.wait(), 10)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+            self._process = None
+        if self._stderr_task is not None:
+            self._stderr_task.cancel()
+            try:
+                await self._stderr_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._stderr_task = None
+        if self._user_data_dir is not None:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+            self._user_data_dir = None
+
+    async def download(self, link: str, save_to_directory: str = "", file_name: Optional[str] = None) -> list[str]:
+        """
+        Downloads pages into PDF (and TXT for SCORM book) in a new tab (starts browser if needed)
+        :param link: LMS link to download
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param file_name: Output file name without extension (relative to save_to_directory). None to use page title
+        :return: Paths to downloaded files
+        """
+        if re.search(self._link_check_regex, link) is None:
+            raise Exception("Invalid link to download from! The link must satisfy the expression: {}"
+                            .format(self._link_check_regex))
+        await self.start_browser()
+        tab = await self._open_tab()
+        try:
+            return await self._download_link(tab, link, save_to_directory, file_name)
+        finally:
+            await tab.close()
+
+    async def download_many(self, links: Iterable[str], save_to_directory: str = "", concurrency: int = 2,
+                            file_names: Optional[dict[str, str]] = None) -> list[dict]:
+        """
+        Downloads multiple links at the same time in separate tabs of one browser
+        :param links: LMS links to download
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param concurrency: Max number of tabs downloading at the same time
+        :param file_names: Output file names (without extension, relative to save_to_directory) for links
+        :return: One result per link in the same order as links: {"link": str, "paths": list[str], "error": str or None}
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def _download(link: str) -> dict:
+            async with semaphore:
+                result = {"link": link, "paths": [], "error": None}
+                try:
+                    result["paths"] = await self.download(link, save_to_directory, (file_names or {}).get(link))
+                    logging.info("Downloaded {}".format(link))
+                except Exception as e:
+                    logging.error("Error downloading {}".format(link), exc_info=e)
+                    result["error"] = str(e)
+                return result
+
+        return list(await asyncio.gather(*[_download(link) for link in links]))
+
+    async def _start_browser(self) -> None:
+        """
+        Starts Chrome with remote debugging and connects to it
+        :return:
+        """
+        chrome_path = self._chrome_path or next(filter(None, (shutil.which(name) for name in CHROME_NAMES)), None)
+        if chrome_path is None:
+            raise Exception("Chrome not found! Specify chrome_path")
+
+        logging.info("Starting browser{}... Please wait".format(" in headless mode" if self._headless else ""))
+        self._user_data_dir = tempfile.mkdtemp(prefix="lmsdownloader-")
+        arguments = ["--remote-debugging-port=0",
+                     "--user-data-dir={}".format(self._user_data_dir),
+                     "--user-agent={}".format(self._user_agent),
+                     "--window-size={},{}".format(*self._window_size),
+                     "--no-first-run",
+                     "--no-default-browser-check",
+                     "--disable-gpu",
+                     "--disable-blink-features=AutomationControlled",
+                     "--disable-extensions",
+                     "--ignore-certificate-errors",
+                     "--disable-default-apps",
+                     "--disable-notifications",
+                     "--no-sandbox",
+                     "--disable-background-timer-throttling",
+                     "--disable-backgrounding-occluded-windows",
+                     "--disable-renderer-backgrounding",
+                     "about:blank"]
+        if self._headless:
+            arguments.insert(0, "--headless=old")
+        self._process = await asyncio.create_subprocess_exec(chrome_path, *arguments,
+                                                             stdout=asyncio.subprocess.DEVNULL,
+                                                             stderr=asyncio.subprocess.PIPE)
+
+        # Chrome prints websocket URL into stderr
+        websocket_url = None
+        try:
+            while websocket_url is None:
+                line = await asyncio.wait_for(self._process.stderr.readline(), 60)
+                if not line:
+                    raise Exception("Browser exited before DevTools started")
+                match = re.search(r"DevTools listening on (ws://\S+)", line.decode("utf-8", errors="replace"))
+                if match:
+                    websocket_url = match.group(1)
+            self._connection = await CDPConnection.connect(websocket_url)
+        except Exception:
+            self._process.kill()
+            await self._process.wait()
+            self._process = None
+            raise
+
+        # Keep reading stderr so Chrome doesn't block on full pipe
+        self._stderr_task = asyncio.get_running_loop().create_task(self._drain_stderr(self._process))
+        logging.info("Connected to browser at {}".format(websocket_url))
+
+    @staticmethod
+    async def _drain_stderr(process) -> None:
+        """
+        Reads browser's stderr until it exits
+        :param process: Browser process
+        :return:
+        """
+        while await process.stderr.readline():
+            pass
+
+    async def _open_tab(self) -> "_Tab":
+        """
+        Opens new tab and attaches to it
+        :return: _Tab instance
+        """
+        target = await self._connection.send("Target.createTarget", {"url": "about:blank",
+                                                                     "width": self._window_size[0],
+                                                                     "height": self._window_size[1]})
+        session = await self._connection.send("Target.attachToTarget", {"targetId": target["targetId"],
+                                                                        "flatten": True})
+        tab = _Tab(self._connection, target["targetId"], session["sessionId"])
+        await tab.send("Page.enable")
+        await tab.send("Page.addScriptToEvaluateOnNewDocument", {"source": _HELPERS_SCRIPT})
+        await tab.send("Emulation.setDeviceMetricsOverride", {"width": self._window_size[0],
+                                                              "height": self._window_size[1],
+                                                              "deviceScaleFactor": 1, "mobile": False})
+        return tab
+
+    async def _login(self, tab: "_Tab") -> None:
+        """
+        Logs in into LMS account (cookies are shared by all tabs)
+        :param tab: Tab to log in with
+        :return:
+        """
+        logging.info("Loading {}".format(self._login_link))
+        await tab.navigate(self._login_link)
+        if await tab.wait_for(_ROOT_SCORM, ["#loginbtn"], 60) < 0:
+            raise Exception("Login page not loaded")
+
+        logging.info("Logging in...")
+        load_event = tab.wait_for_event("Page.loadEventFired")
+        try:
+            await tab.evaluate("""
+            document.getElementById("username").value = arguments_[0];
+            document.getElementById("password").value = arguments_[1];
+            document.getElementById("loginbtn").click();
+            """, [self._lms_login, self._lms_password])
+            await asyncio.wait_for(load_event, 60)
+        finally:
+            tab.remove_listener(load_event)
+
+        found = await tab.wait_for(_ROOT_SCORM, [".usertext", ".loginerrors"], 60)
+        if found != 0:
+            raise Exception("Login error! Check login / password")
+        logging.info("Logged in successfully")
+
+    async def _download_link(self, tab: "_Tab", link: str, save_to_directory: str,
+                             file_name: Optional[str]) -> list[str]:
+        """
+        Downloads one link using already logged-in browser
+        :param tab: Tab to download link in
+        :param link: LMS link to download
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param file_name: Output file name without extension (relative to save_to_directory). None to use page title
+        :return: Paths to downloaded files
+        """
+        # Open link and enter the module if needed
+        logging.info("Redirecting to {}".format(link))
+        await tab.navigate(link)
+        selectors = [ENTER_BUTTON_SELECTOR, "#scorm_object", ".h5p-iframe"]
+        if await tab.wait_for(_ROOT_SCORM, selectors, 60) == 0:
+            load_event = tab.wait_for_event("Page.loadEventFired")
+            try:
+                await tab.evaluate("document.querySelector(arguments_[0]).click();", [ENTER_BUTTON_SELECTOR])
+                await asyncio.wait_for(load_event, 60)
+            finally:
+                tab.remove_listener(load_event)
+        found = await tab.wait_for(_ROOT_SCORM, selectors, 60)
+
+        # SCORM player is opened as page, H5P stays in its iframe
+        if found == 1:
+            player_url = urljoin(link, await tab.evaluate("return document.getElementById('scorm_object').src;"))
+            content_type = await self._open_scorm(tab, player_url)
+            root = _ROOT_SCORM
+        elif found == 2:
+            content_type = await self._open_h5p(tab)
+            root = _ROOT_H5P
+        else:
+            raise ValueError("Wrong content type! Unsupported link")
+
+        # Output file
+        file_path_base = os.path.join(save_to_directory, file_name if file_name
+                                      else await tab.evaluate("return document.title;"))
+        if os.path.dirname(file_path_base):
+            os.makedirs(os.path.dirname(file_path_base), exist_ok=True)
+        pdf_assembler = PdfAssembler(file_path_base, max_volume_size=int(self._max_volume_size * 1024 * 1024))
+
+        # Capture pages. Previous page is added to PDF in background while the next one is captured
+        loop = asyncio.get_running_loop()
+        add_task = None
+        page_counter = 0
+        try:
+            while True:
+                logging.info("Capturing page {}".format(page_counter + 1))
+                if content_type == CONTENT_TYPE_H5P_PRESENTATION:
+                    image_data = await tab.screenshot(".h5p-iframe")
+                    pdf_data = await loop.run_in_executor(None, image_to_pdf, image_data)
+                else:
+                    pdf_data = await tab.print_to_pdf(landscape=content_type != CONTENT_TYPE_SCORM_BOOK)
+                if add_task is not None:
+                    await add_task
+                add_task = loop.run_in_executor(None, pdf_assembler.add_page, pdf_data)
+
+                # Finish or next
+                if not await tab.click(root, NEXT_BUTTON_SELECTORS[content_type], self._wait_between_pages):
+                    logging.info("Downloading done")
+                    break
+                page_counter += 1
+        finally:
+            if add_task is not None:
+                await add_task
+
+        downloaded_paths = []
+
+        # Extract text for SCORM book
+        if content_type == CONTENT_TYPE_SCORM_BOOK:
+            from bs4 import BeautifulSoup
+
+            logging.info("Extracting text")
+            page_source = await tab.evaluate("return document.documentElement.outerHTML;")
+            text = BeautifulSoup(page_source, "html.parser").get_text("\n")
+            txt_file_path = file_path_base + ".txt"
+            with open(txt_file_path, "w", encoding="utf-8") as txt_file:
+                logging.info("Saving text as {}".format(txt_file_path))
+                txt_file.write(text)
+            downloaded_paths.append(txt_file_path)
+
+        downloaded_paths.extend(await loop.run_in_executor(None, pdf_assembler.close))
+        return downloaded_paths
+
+    async def _open_scorm(self, tab: "_Tab", player_url: str) -> int:
+        """
+        Opens SCORM player and waits for it to load
+        :param tab: Tab to open player in
+        :param player_url: URL of the scorm_object iframe
+        :return: CONTENT_TYPE_SCORM_PRESENTATION or CONTENT_TYPE_SCORM_BOOK
+        """
+        logging.info("Opening SCORM player")
+        await tab.navigate(player_url)
+        if await tab.wait_for(_ROOT_SCORM, SCORM_PLAYER_SELECTORS, 60) < 0:
+            raise Exception("SCORM player not loaded")
+        await tab.wait_quiet(1.)
+
+        # Close message box (resume question)
+        await tab.click(_ROOT_SCORM, MESSAGE_BOX_BUTTON_SELECTOR, 1., last=True)
+
+        # Wait for player to load completely
+        logging.info("Waiting up to 10s for loading")
+        await tab.wait_quiet(10., quiet_period=1.)
+
+        # Handle book mode
+        if await tab.click(_ROOT_SCORM, BOOK_MODE_BUTTON_SELECTOR, 1.):
+            logging.info("Fixing book mode")
+
+        if await tab.wait_for(_ROOT_SCORM, [SCORM_PRESENTATION_SELECTOR], 0) == 0:
+            logging.info("Detected content type as SCORM presentation")
+            return CONTENT_TYPE_SCORM_PRESENTATION
+        if await tab.wait_for(_ROOT_SCORM, [SCORM_BOOK_SELECTOR], 0) == 0:
+            logging.info("Detected content type as SCORM book")
+            return CONTENT_TYPE_SCORM_BOOK
+        raise ValueError("Wrong content type! Unsupported link")
+
+    async def _open_h5p(self, tab: "_Tab") -> int:
+        """
+        Waits for H5P presentation to load and goes to the first slide
+        :param tab: Tab with H5P page
+        :return: CONTENT_TYPE_H5P_PRESENTATION
+        """
+        if await tab.wait_for(_ROOT_H5P, [".h5p-wrapper"], 60) < 0:
+            raise Exception("H5P presentation not loaded")
+        await tab.wait_quiet(1.)
+
+        # Go to the first slide (using API or by clicking previous button)
+        logging.info("Going to the first page")
+        await tab.evaluate("""
+        const view = (%s)().defaultView;
+        const instance = ((view.H5P && view.H5P.instances) || [])
+            .find((instance) => typeof instance.jumpToSlide === "function");
+        if (instance) instance.jumpToSlide(0);
+        """ % _ROOT_H5P)
+        while await tab.click(_ROOT_H5P, H5P_PREVIOUS_BUTTON_SELECTOR, self._wait_between_pages):
+            pass
+        logging.info("Detected content type as H5P presentation")
+        return CONTENT_TYPE_H5P_PRESENTATION
+
+
+class _Tab:
+    def __init__(self, connection: CDPConnection, target_id: str, session_id: str) -> None:
+        """
+        Initializes _Tab class (one page of the browser attached in flat mode)
+        :param connection: Browser's CDPConnection
+        :param target_id: Target ID
+        :param session_id: Session ID
+        """
+        self._connection = connection
+        self._target_id = target_id
+        self._session_id = session_id
+
+    async def send(self, method: str, params: Optional[dict] = None) -> dict:
+        return await self._connection.send(method, params, session_id=self._session_id)
+
+    def wait_for_event(self, method: str) -> asyncio.Future:
+        return self._connection.wait_for_event(method, session_id=self._session_id)
+
+    def remove_listener(self, future: asyncio.Future) -> None:
+        self._connection.remove_listener(future)
+
+    async def close(self) -> None:
+        try:
+            await self._connection.send("Target.closeTarget", {"targetId": self._target_id})
+        except Exception as e:
+            logging.warning("Error closing tab: {}".format(e))
+
+    async def navigate(self, url: str) -> None:
+        """
+        Opens URL and waits for the load event
+        :param url: URL to open
+        :return:
+        """
+        load_event = self.wait_for_event("Page.loadEventFired")
+        try:
+            result = await self.send("Page.navigate", {"url": url})
+            if result.get("errorText"):
+                raise Exception("Error loading {}: {}".format(url, result["errorText"]))
+            await asyncio.wait_for(load_event, 60)
+        finally:
+            self.remove_listener(load_event)
+
+    async def evaluate(self, script: str, arguments: Optional[list] = None):
+        """
+        Runs JS function body in the page and waits for its result (promises are awaited by the browser)
+        :param script: JS code (use return statement to return value)
+        :param arguments: JSON-serializable arguments (available as arguments_ array)
+        :return: Result value
+        """
+        expression = "(async () => {{ const arguments_ = {};\n{}\n}})()".format(json.dumps(arguments or []), script)
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True,
+                                                      "awaitPromise": True})
+        if "exceptionDetails" in result:
+            raise Exception("Script error: {}".format(result["exceptionDetails"].get("exception", {})
+                                                      .get("description", result["exceptionDetails"].get("text"))))
+        return result.get("result", {}).get("value")
+
+    async def wait_for(self, root: str, selectors: list[str], timeout: float) -> int:
+        """
+        Waits for one of the elements to appear (using MutationObserver)
+        :param root: JS function that returns document to search in
+        :param selectors: CSS selectors
+        :param timeout: Max time to wait (in seconds)
+        :return: Index of the found selector or -1 on timeout
+        """
+        return await self.evaluate("return window.__lmsDownloader.waitFor({}, arguments_[0], arguments_[1]);"
+                                   .format(root), [selectors, int(timeout * 1000)])
+
+    async def wait_quiet(self, max_wait: float, quiet_period: float = 0.3) -> None:
+        """
+        Waits until DOM of the page and its iframes is not changed for quiet_period (or max_wait is reached)
+        :param max_wait: Max time to wait (in seconds)
+        :param quiet_period: How long page must be idle (in seconds)
+        :return:
+        """
+        await self.evaluate("return window.__lmsDownloader.waitQuiet(true, arguments_[0], arguments_[1]);",
+                            [int(quiet_period * 1000), int(max_wait * 1000)])
+
+    async def click(self, root: str, selector: str, max_wait: float, quiet_period: float = 0.3,
+                    last: bool = False) -> bool:
+        """
+        Clicks element (or its parent button) and waits for the page to change and become idle
+        :param root: JS function that returns document to search in
+        :param selector: CSS selector
+        :param max_wait: Max time to wait for changes (in seconds)
+        :param quiet_period: How long page must be idle (in seconds)
+        :param last: True to click the last element that matches selector instead of the first one
+        :return: False if element is missing or disabled
+        """
+        return await self.evaluate("return window.__lmsDownloader.click({}, arguments_[0], arguments_[1], "
+                                   "arguments_[2], arguments_[3]);".format(root),
+                                   [selector, int(quiet_period * 1000), int(max_wait * 1000), last])
+
+    async def print_to_pdf(self, landscape: bool) -> bytes:
+        """
+        Prints page into PDF using stream mode
+        :param landscape: True to print in landscape mode
+        :return: PDF file as bytes
+        """
+        stream = await self.send("Page.printToPDF", {"landscape": landscape, "transferMode": "ReturnAsStream"})
+        chunks = []
+        try:
+            while True:
+                chunk = await self.send("IO.read", {"handle": stream["stream"], "size": CHUNK_SIZE})
+                if chunk.get("data"):
+                    chunks.append(base64.b64decode(chunk["data"]) if chunk.get("base64Encoded")
+                                  else chunk["data"].encode("latin-1"))
+                if chunk.get("eof"):
+                    break
+        finally:
+            await self.send("IO.close", {"handle": stream["stream"]})
+        return b"".join(chunks)
+
+    async def screenshot(self, selector: str) -> bytes:
+        """
+        Takes PNG screenshot of the element of the top-level document
+        :param selector: CSS selector
+        :return: PNG image as bytes
+        """
+        rect = await self.evaluate("""
+        const rect = document.querySelector(arguments_[0]).getBoundingClientRect();
+        return {x: rect.left + window.scrollX, y: rect.top + window.scrollY, width: rect.width, height: rect.height};
+        """, [selector])
+        screenshot = await self.send("Page.captureScreenshot", {"format": "png", "fromSurface": True,
+                                                                "clip": dict(rect, scale=1)})
+        return base64.b64decode(screenshot["data"])
+
@@ -0,0 +1,273 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+# Magic string of websocket handshake (RFC 6455)
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Websocket opcodes
+_OPCODE_CONTINUATION = 0x0
+_OPCODE_TEXT = 0x1
+_OPCODE_BINARY = 0x2
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+
+class CDPConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Initializes CDPConnection class (Chrome DevTools protocol client over websocket). Use connect() to create it
+        :param reader: Stream of the established websocket connection
+        :param writer: Stream of the established websocket connection
+        """
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = asyncio.Lock()
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = []
+        self._closed = False
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, websocket_url: str) -> "CDPConnection":
+        """
+        Connects to Chrome's DevTools websocket
+        :param websocket_url: ws://host:port/devtools/browser/... URL
+        :return: CDPConnection instance
+        """
+        url = urlparse(websocket_url)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+
+        # Upgrade HTTP connection to websocket
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write("GET {} HTTP/1.1\r\nHost: {}:{}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     "Sec-WebSocket-Key: {}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+                     .format(url.path or "/", url.hostname, url.port or 80, key).encode("ascii"))
+        await writer.drain()
+        response = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        if " 101 " not in response.split("\r\n", 1)[0] or accept not in response:
+            writer.close()
+            raise Exception("Unable to connect to {}: {}".format(websocket_url, response.split("\r\n", 1)[0]))
+        return cls(reader, writer)
+
+    async def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None) -> dict:
+        """
+        Sends command and waits for its result
+        :param method: CDP method (for example, Page.navigate)
+        :param params: Method's params
+        :param session_id: Target session (from Target.attachToTarget) or None to send it to the browser
+        :return: Command result
+        """
+        if self._closed:
+            raise Exception("DevTools connection is closed")
+        self._next_id += 1
+        message = {"id": self._next_id, "method": method, "params": params or {}}
+        if session_id is not None:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message["id"]] = future
+        try:
+            await self._send_frame(_OPCODE_TEXT, json.dumps(message).encode("utf-8"))
+        except BaseException:
+            self._pending.pop(message["id"], None)
+            raise
+        return await future
+
+    def wait_for_event(self, method: str, session_id: Optional[str] = None,
+                       predicate: Optional[Callable[[dict], bool]] = None) -> asyncio.Future:
+        """
+        Subscribes to the next event (must be called before the action that causes it)
+        :param method: CDP event (for example, Page.loadEventFired)
+        :param session_id: Target session or None for browser events
+        :param predicate: Will be called with event params. Event is ignored if it returns False
+        :return: Future that will be resolved with event params
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._listeners.append((method, session_id, predicate, future))
+        return future
+
+    def remove_listener(self, future: asyncio.Future) -> None:
+        """
+        Unsubscribes from the event (if it's not received yet)
+        :param future: Result of wait_for_event()
+        :return:
+        """
+        future.cancel()
+        for listener in self._listeners:
+            if listener[3] is future:
+                self._listeners.remove(listener)
+                break
+
+    async def close(self) -> None:
+        """
+        Closes websocket connection
+        :return:
+        """
+        if not self._closed:
+            try:
+                await self._send_frame(_OPCODE_CLOSE, b"")
+            except Exception:
+                pass
+        self._closed = True
+        self._writer.close()
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    async def _send_frame(self, opcode: int, payload: bytes) -> None:
+        """
+        Sends single masked websocket frame
+        :param opcode: _OPCODE_...
+        :param payload: Frame data
+        :return:
+        """
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([0x80 | len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([0x80 | 126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack(">Q", len(payload))
+        mask = os.urandom(4)
+        async with self._write_lock:
+            self._writer.write(header + mask + _apply_mask(payload, mask))
+            await self._writer.drain()
+
+    async def _read_frame(self) -> tuple[int, bytes]:
+        """
+        Reads websocket message (joining fragmented frames)
+        :return: (opcode, payload)
+        """
+        opcode = None
+        payload = b""
+        while True:
+            first_byte, second_byte = await self._reader.readexactly(2)
+            length = second_byte & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", await self._reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", await self._reader.readexactly(8))[0]
+            mask = await self._reader.readexactly(4) if second_byte & 0x80 else None
+            data = await self._reader.readexactly(length)
+            if mask is not None:
+                data = _apply_mask(data, mask)
+
+            # Control frames can appear between fragments
+            frame_opcode = first_byte & 0x0F
+            if frame_opcode >= _OPCODE_CLOSE:
+                if frame_opcode == _OPCODE_PING:
+                    await self._send_frame(_OPCODE_PONG, data)
+                    continue
+                if frame_opcode == _OPCODE_CLOSE:
+                    return frame_opcode, data
+                continue
+
+            if frame_opcode != _OPCODE_CONTINUATION:
+                opcode = frame_opcode
+            payload += data
+            if first_byte & 0x80:
+                return opcode, payload
+
+    async def _read_loop(self) -> None:
+        """
+        Reads messages and passes them to waiting commands and event listeners
+        :return:
+        """
+        error = Exception("DevTools connection is closed")
+        try:
+            while True:
+                opcode, payload = await self._read_frame()
+                if opcode == _OPCODE_CLOSE:
+                    break
+                if opcode not in (_OPCODE_TEXT, _OPCODE_BINARY):
+                    continue
+                message = json.loads(payload)
+
+                # Command result
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(Exception("{} (code {})".format(message["error"].get("message"),
+                                                                            message["error"].get("code"))))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+
+                # Event
+                for listener in list(self._listeners):
+                    method, session_id, predicate, future = listener
+                    if future.done():
+                        self._listeners.remove(listener)
+                        continue
+                    if method != message.get("method") or session_id != message.get("sessionId"):
+                        continue
+                    if predicate is not None and not predicate(message.get("params", {})):
+                        continue
+                    future.set_result(message.get("params", {}))
+                    self._listeners.remove(listener)
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = Exception("DevTools connection is closed: {}".format(e))
+        except Exception as e:
+            logging.error("Error reading DevTools message", exc_info=e)
+            error = e
+        finally:
+            self._closed = True
+            for future in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(error)
+
+            # Nobody may wait for events anymore, so errors are marked as retrieved
+            for listener in self._listeners:
+                if not listener[3].done():
+                    listener[3].set_exception(error)
+                    listener[3].exception()
+            self._pending.clear()
+            self._listeners.clear()
+
+
+def _apply_mask(data: bytes, mask: bytes) -> bytes:
+    """
+    XORs data with 4-byte websocket mask
+    :param data: Frame payload
+    :param mask: Masking key
+    :return: Masked (or unmasked) payload
+    """
+    if not data:
+        return data
+    repeated_mask = (mask * (len(data) // 4 + 1))[:len(data)]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(repeated_mask, "big")).to_bytes(len(data), "big")
@@ -0,0 +1,166 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Optional
+
+# Manifest file name inside job's directory
+MANIFEST_FILE = "manifest.json"
+
+
+class Checkpoint:
+    def __init__(self, work_dir: str, link: str) -> None:
+        """
+        Initializes Checkpoint class (persistent page-level progress of one link)
+        :param work_dir: Path to the dir where to keep progress of all links
+        :param link: LMS link being downloaded
+        """
+        self._link = link
+        self.job_dir = os.path.join(work_dir, hashlib.sha256(link.encode("utf-8")).hexdigest()[:16])
+        self._lock = threading.Lock()
+        self._manifest = {"link": link, "content_type": None, "captured_all": False, "pages": []}
+
+    def open(self, content_type: int, resume: bool = False) -> list[bytes]:
+        """
+        Starts recording progress. Loads pages captured by previous run if resume is True
+        (pages after the first missing or corrupted one are dropped)
+        :param content_type: Detected content type (manifest of other content type will be discarded)
+        :param resume: False to discard previous progress
+        :return: Contiguous captured pages starting from the first one
+        """
+        manifest_path = os.path.join(self.job_dir, MANIFEST_FILE)
+        pages = []
+        if not resume:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+        elif os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as file:
+                    manifest = json.load(file)
+                if manifest.get("link") != self._link or manifest.get("content_type") != content_type:
+                    raise Exception("manifest doesn't match the link")
+
+                for page_index, page in enumerate(manifest["pages"]):
+                    if page["index"] != page_index:
+                        break
+                    page_path = os.path.join(self.job_dir, "{}.pdf".format(page_index))
+                    if not os.path.exists(page_path):
+                        break
+                    with open(page_path, "rb") as file:
+                        pdf_data = file.read()
+                    if hashlib.sha256(pdf_data).hexdigest() != page["sha256"]:
+                        logging.warning("Page {} is corrupted".format(page_index + 1))
+                        break
+                    pages.append(pdf_data)
+
+                self._manifest = manifest
+                self._manifest["pages"] = self._manifest["pages"][:len(pages)]
+                if len(pages) != len(manifest["pages"]):
+                    self._manifest["captured_all"] = False
+                logging.info("Resuming from page {}".format(len(pages) + 1))
+            except Exception as e:
+                logging.warning("Unable to resume from {}: {}".format(manifest_path, e))
+                pages = []
+
+        self._manifest["content_type"] = content_type
+        self._manifest["pages"] = self._manifest["pages"][:len(pages)]
+        if not pages:
+            self._manifest["captured_all"] = False
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._write_manifest()
+        return pages
+
+    @property
+    def captured_all(self) -> bool:
+        """
+        :return: True if the last page was captured by previous run
+        """
+        return self._manifest["captured_all"]
+
+    @property
+    def next_slide(self) -> int:
+        """
+        :return: Player's slide index after the last saved page (how many slides to skip when resuming).
+        Differs from the number of saved pages if duplicate slides were dropped
+        """
+        if not self._manifest["pages"]:
+            return 0
+        last_page = self._manifest["pages"][-1]
+        return last_page.get("slide", last_page["index"]) + 1
+
+    @property
+    def last_fingerprint(self) -> Optional[str]:
+        """
+        :return: Fingerprint of the last saved page (to detect duplicate of it after resuming) or None if it's unknown
+        """
+        if not self._manifest["pages"]:
+            return None
+        return self._manifest["pages"][-1].get("fingerprint")
+
+    def add_page(self, page_index: int, pdf_data: bytes, slide_index: Optional[int] = None,
+                 page_fingerprint: Optional[str] = None) -> None:
+        """
+        Saves captured page and records it in the manifest
+        :param page_index: Page number (starting from 0)
+        :param pdf_data: PDF file as bytes
+        :param slide_index: Player's slide index of the page. None if it's the same as page_index
+        :param page_fingerprint: Page fingerprint (see PageCache.fingerprint()). None if it's not calculated
+        :return:
+        """
+        with self._lock:
+            with open(os.path.join(self.job_dir, "{}.pdf".format(page_index)), "wb") as file:
+                file.write(pdf_data)
+            page = {"index": page_index,
+                    "slide": slide_index if slide_index is not None else page_index,
+                    "sha256": hashlib.sha256(pdf_data).hexdigest()}
+            if page_fingerprint is not None:
+                page["fingerprint"] = page_fingerprint
+            self._manifest["pages"].append(page)
+            self._write_manifest()
+
+    def finish_capture(self) -> None:
+        """
+        Marks that all pages are captured
+        :return:
+        """
+        with self._lock:
+            self._manifest["captured_all"] = True
+            self._write_manifest()
+
+    def cleanup(self) -> None:
+        """
+        Deletes job's directory after successful download
+        :return:
+        """
+        logging.info("Cleaning up {}".format(self.job_dir))
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def _write_manifest(self) -> None:
+        """
+        Writes manifest atomically
+        :return:
+        """
+        manifest_path = os.path.join(self.job_dir, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self._manifest, file, indent=4)
+        os.replace(manifest_path + ".tmp", manifest_path)
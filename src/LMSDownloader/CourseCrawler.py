@@ -0,0 +1,217 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Optional
+from urllib.parse import urljoin
+
+from LMSDownloader import WorkerPool
+from LMSDownloader.LMSDownloader import LMSDownloader
+
+# Regex to check course link
+COURSE_LINK_REGEX = "\\/course\\/view\\.php\\?id=\\d+"
+
+# Regex to find supported modules (SCORM and H5P) inside course page
+MODULE_LINK_REGEX = "\\/mod\\/(scorm|hvp)\\/view\\.php\\?id=(\\d+)"
+
+# Elements with completion state that must not affect module fingerprint
+COMPLETION_SELECTOR = ".completion-info, .activity-completion, .autocompletion, .togglecompletion, " \
+                      "[data-region='completionrequirements'], [data-region='activity-information']"
+
+# File inside course dir with info about downloaded modules
+COURSE_MANIFEST_FILE = "course.json"
+
+
+def crawl_course(page_source: str, course_link: str) -> list[dict]:
+    """
+    Finds all SCORM and H5P modules in course page
+    :param page_source: HTML of the course page
+    :param course_link: Link to the course page (to resolve relative links)
+    :return: [{"link", "module_id", "name", "section", "file_name", "fingerprint"}, ...] in course order
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, "html.parser")
+
+    # Moodle puts each section into li.section
+    sections = soup.select("li.section") or [soup]
+
+    modules = []
+    module_ids = set()
+    for section_index, section in enumerate(sections):
+        section_name = section.get("data-sectionname") or section.get("aria-label")
+        if not section_name:
+            section_name_element = section.select_one(".sectionname")
+            section_name = section_name_element.get_text(" ", strip=True) if section_name_element else ""
+        section_name = section_name or "Section {}".format(section_index)
+
+        module_index = 0
+        for activity in section.select("li.activity") or [section]:
+            for link_element in activity.find_all("a", href=True):
+                match = re.search(MODULE_LINK_REGEX, link_element["href"])
+                if not match or match.group(2) in module_ids:
+                    continue
+                module_ids.add(match.group(2))
+                module_index += 1
+
+                # Name without hidden "SCORM package" / "Interactive Content" suffix
+                name_element = activity.select_one(".instancename") or link_element
+                for hidden in name_element.select(".accesshide"):
+                    hidden.extract()
+                name = activity.get("data-activityname") or name_element.get_text(" ", strip=True) \
+                    or "Module {}".format(match.group(2))
+
+                modules.append({
+                    "link": urljoin(course_link, link_element["href"]),
+                    "module_id": match.group(2),
+                    "name": name,
+                    "section": section_name,
+                    "file_name": os.path.join(
+                        safe_file_name("{:02d} {}".format(section_index, section_name)),
+                        safe_file_name("{:02d} {}".format(module_index, name))),
+                    "fingerprint": _activity_fingerprint(activity)
+                })
+
+    logging.info("Found {} modules in {} sections".format(len(modules), len(sections)))
+    return modules
+
+
+def download_course(lms_downloader: LMSDownloader, course_link: str, save_to_directory: str = "",
+                    workers: int = 1, force: bool = False,
+                    result_callback: Optional[Callable[[dict], None]] = None, tabs: int = 1) -> list[dict]:
+    """
+    Downloads all SCORM and H5P modules of the course. Outputs are named by section and module.
+    Modules that were already downloaded and not changed in the course page are skipped
+    :param lms_downloader: Configured LMSDownloader instance (it will be copied for crawling and each worker,
+    the first worker continues in the crawler's browser)
+    :param course_link: Link to the course page (course/view.php?id=...)
+    :param save_to_directory: Path to the dir where to save downloaded files
+    :param workers: Number of browsers to download modules with
+    :param force: Set True to download all modules even if they were already downloaded
+    :param result_callback: Will be called with each result as soon as module is processed
+    :param tabs: Number of tabs in each browser to download modules in at the same time
+    :return: One result per module: {"link": str, "paths": list[str], "error": str or None, "duplicates": int,
+    "skipped": bool}
+    """
+    if re.search(COURSE_LINK_REGEX, course_link) is None:
+        raise Exception("Invalid course link! The link must satisfy the expression: {}".format(COURSE_LINK_REGEX))
+
+    # Pages are added into text index under this course
+    course_downloader = copy.copy(lms_downloader)
+    course_downloader.course = course_link
+
+    # Load info about previous downloads
+    manifest_path = os.path.join(save_to_directory, COURSE_MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+
+    # Find modules (browser is kept logged in for the first worker)
+    crawler = copy.copy(course_downloader)
+    crawler.browser = None
+    page_source = crawler.get_page_source(course_link, keep_browser=True)
+    try:
+        modules = crawl_course(page_source, course_link)
+
+        # Skip unchanged modules with existing files
+        results = {}
+        modules_to_download = []
+        for module in modules:
+            previous = manifest.get(module["module_id"])
+            if not force \
+                    and previous is not None \
+                    and previous["fingerprint"] == module["fingerprint"] \
+                    and previous["paths"] \
+                    and all(os.path.exists(path) for path in previous["paths"]):
+                logging.info("Skipping already downloaded module {}".format(module["name"]))
+                results[module["link"]] = {"link": module["link"], "paths": previous["paths"], "error": None,
+                                           "duplicates": 0, "skipped": True}
+                if result_callback is not None:
+                    result_callback(results[module["link"]])
+            else:
+                modules_to_download.append(module)
+    except Exception:
+        crawler.quit_browser()
+        raise
+
+    # Save info about each downloaded module as soon as it's downloaded (so it's skipped after crash)
+    modules_by_link = {module["link"]: module for module in modules_to_download}
+    manifest_lock = threading.Lock()
+
+    def _on_result(result: dict) -> None:
+        result["skipped"] = False
+        if result["error"] is None:
+            module = modules_by_link[result["link"]]
+            with manifest_lock:
+                manifest[module["module_id"]] = {"name": module["name"], "fingerprint": module["fingerprint"],
+                                                 "paths": result["paths"]}
+                _write_manifest(manifest_path, manifest)
+        if result_callback is not None:
+            result_callback(result)
+
+    # Download the rest of them
+    logging.info("Downloading {} / {} modules".format(len(modules_to_download), len(modules)))
+    file_names = {module["link"]: module["file_name"] for module in modules_to_download}
+    for result in WorkerPool.download_parallel(course_downloader, file_names.keys(), save_to_directory,
+                                               workers=workers, result_callback=_on_result,
+                                               file_names=file_names, tabs=tabs, first_downloader=crawler):
+        results[result["link"]] = result
+
+    return [results[module["link"]] for module in modules]
+
+
+def _write_manifest(manifest_path: str, manifest: dict) -> None:
+    """
+    Writes course manifest atomically
+    :param manifest_path: Path to the course.json
+    :param manifest: {module_id: {"name", "fingerprint", "paths"}}
+    :return:
+    """
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=4, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def _activity_fingerprint(activity) -> str:
+    """
+    Hashes activity's text (name, description, etc.) without completion state that changes after viewing
+    :param activity: li.activity element
+    :return: sha256 hex digest
+    """
+    activity = copy.copy(activity)
+    for completion in activity.select(COMPLETION_SELECTOR):
+        completion.extract()
+    return hashlib.sha256(activity.get_text(" ", strip=True).encode("utf-8")).hexdigest()
+
+
+def safe_file_name(name: str) -> str:
+    """
+    Removes characters that are not allowed in file names
+    :param name: Any string
+    :return: File name
+    """
+    return re.sub("\\s+", " ", re.sub("[\\\\/:*?\"<>|]", " ", name)).strip(" .")[:100] or "_"
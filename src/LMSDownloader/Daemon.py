@@ -0,0 +1,333 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Optional
+
+from LMSDownloader.LMSDownloader import LMSDownloader
+
+# Job statuses
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+# How many finished jobs to keep (oldest ones are forgotten)
+FINISHED_JOBS_LIMIT = 1000
+
+
+class Daemon:
+    def __init__(self, lms_downloader: LMSDownloader, save_to_directory: str = "", host: str = "127.0.0.1",
+                 port: int = 8765, workers: int = 1, max_queued_jobs: int = 100) -> None:
+        """
+        Initializes Daemon class (keeps logged-in browsers running and downloads links submitted over local HTTP API)
+        :param lms_downloader: Configured LMSDownloader instance. It will be copied for each worker
+        :param save_to_directory: Path to the dir where to save downloaded files of jobs without "save_to"
+        :param host: Address to listen on (keep it local, API has no authentication)
+        :param port: Port to listen on
+        :param workers: Number of browsers (max number of jobs running at the same time)
+        :param max_queued_jobs: Max number of jobs waiting for a worker (new jobs are rejected when reached)
+        """
+        self._lms_downloader = lms_downloader
+        self._save_to_directory = save_to_directory
+        self._host = host
+        self._port = port
+        self._workers = max(1, workers)
+        self._max_queued_jobs = max_queued_jobs
+
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._jobs_queue = queue.Queue()
+        self._worker_threads = []
+        self._server = None
+
+    def run(self) -> None:
+        """
+        Starts workers and serves API until KeyboardInterrupt
+        :return:
+        """
+        from http.server import ThreadingHTTPServer
+
+        for worker_id in range(self._workers):
+            worker_thread = threading.Thread(target=self._worker, args=(worker_id,),
+                                             name="LMSDownloader-daemon-{}".format(worker_id), daemon=True)
+            worker_thread.start()
+            self._worker_threads.append(worker_thread)
+
+        self._server = ThreadingHTTPServer((self._host, self._port), _make_handler(self))
+        logging.info("Daemon is listening on http://{}:{}".format(self._host, self._port))
+        try:
+            self._server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        Stops API and waits for workers to finish their current jobs (queued jobs are marked as failed)
+        :return:
+        """
+        logging.info("Stopping daemon")
+        if self._server is not None:
+            self._server.server_close()
+
+        # Cancel queued jobs
+        while True:
+            try:
+                job_id = self._jobs_queue.get_nowait()
+            except queue.Empty:
+                break
+            with self._jobs_lock:
+                self._jobs[job_id]["status"] = JOB_STATUS_FAILED
+                self._jobs[job_id]["error"] = "Daemon stopped"
+        for _ in self._worker_threads:
+            self._jobs_queue.put(None)
+        for worker_thread in self._worker_threads:
+            worker_thread.join()
+        self._worker_threads = []
+
+    def submit(self, links: list[str], save_to_directory: Optional[str] = None,
+               file_names: Optional[dict[str, str]] = None) -> dict:
+        """
+        Queues new job
+        :param links: LMS links to download
+        :param save_to_directory: Path to the dir where to save downloaded files (relative to daemon's
+        save_to_directory). None to use daemon's one
+        :param file_names: Output file names (without extension, relative to save_to_directory) for links
+        :return: Job info (see job())
+        """
+        if not isinstance(links, list) or not links or not all(isinstance(link, str) for link in links):
+            raise ValueError("links must be a non-empty list of strings")
+        if file_names is not None and (not isinstance(file_names, dict)
+                                       or not all(isinstance(link, str) and isinstance(file_name, str)
+                                                  for link, file_name in file_names.items())):
+            raise ValueError("file_names must be a dict of strings")
+
+        # Keep all output files inside daemon's save_to_directory
+        save_to_directory = self._resolve_path(self._save_to_directory, save_to_directory or "")
+        resolved_file_names = {}
+        for link, file_name in (file_names or {}).items():
+            file_path = self._resolve_path(save_to_directory, file_name)
+            if file_path == save_to_directory:
+                raise ValueError("Invalid file name: {}".format(file_name))
+            resolved_file_names[link] = os.path.relpath(file_path, save_to_directory)
+
+        if self._jobs_queue.qsize() >= self._max_queued_jobs:
+            raise OverflowError("Too many queued jobs")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_STATUS_QUEUED,
+            "links": list(links),
+            "save_to": save_to_directory,
+            "file_names": resolved_file_names,
+            "done": 0,
+            "total": len(links),
+            "results": [],
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None
+        }
+        with self._jobs_lock:
+            self._jobs[job["id"]] = job
+
+            # Forget the oldest finished jobs
+            finished = [job_id for job_id, job_ in self._jobs.items()
+                        if job_["status"] in (JOB_STATUS_DONE, JOB_STATUS_FAILED)]
+            for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_LIMIT)]:
+                del self._jobs[job_id]
+        self._jobs_queue.put(job["id"])
+        logging.info("Job {} queued ({} links)".format(job["id"], len(links)))
+        return self.job(job["id"])
+
+    def job(self, job_id: str) -> Optional[dict]:
+        """
+        Returns job info
+        :param job_id: ID returned by submit()
+        :return: {"id", "status", "links", "save_to", "file_names", "done", "total", "results", "error", "created",
+        "started", "finished"} or None if there is no such job
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def status(self) -> dict:
+        """
+        Returns daemon status
+        :return: {"workers": int, "queued": int, "running": int, "jobs": int}
+        """
+        with self._jobs_lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {"workers": self._workers,
+                "queued": statuses.count(JOB_STATUS_QUEUED),
+                "running": statuses.count(JOB_STATUS_RUNNING),
+                "jobs": len(statuses)}
+
+    def metrics(self) -> str:
+        """
+        Returns stage timings and counters of all workers
+        :return: Metrics in Prometheus text exposition format
+        """
+        return self._lms_downloader.metrics.to_prometheus()
+
+    @staticmethod
+    def _resolve_path(base_directory: str, path: str) -> str:
+        """
+        Resolves path submitted over API against the base directory
+        :param base_directory: Path to the dir that path must stay inside
+        :param path: Relative path
+        :return: Absolute path inside base_directory
+        """
+        if os.path.isabs(path) or os.path.splitdrive(path)[0]:
+            raise ValueError("Absolute paths are not allowed: {}".format(path))
+        base_directory = os.path.realpath(base_directory)
+        resolved_path = os.path.realpath(os.path.join(base_directory, path))
+        if os.path.commonpath([base_directory, resolved_path]) != base_directory:
+            raise ValueError("Path is outside of the save directory: {}".format(path))
+        return resolved_path
+
+    def _worker(self, worker_id: int) -> None:
+        """
+        Keeps browser running and logged in and downloads queued jobs one by one
+        :param worker_id: Number of the worker (for logs)
+        :return:
+        """
+        worker_downloader = copy.copy(self._lms_downloader)
+        worker_downloader.browser = None
+
+        # Warm up browser before the first job (it will be started again by download_many() if it fails)
+        try:
+            worker_downloader.start_browser()
+        except Exception as e:
+            logging.error("Worker {} can't start browser".format(worker_id), exc_info=e)
+            worker_downloader.quit_browser()
+
+        try:
+            while True:
+                job_id = self._jobs_queue.get()
+                if job_id is None:
+                    break
+                with self._jobs_lock:
+                    job = self._jobs[job_id]
+                    job["status"] = JOB_STATUS_RUNNING
+                    job["started"] = time.time()
+                logging.info("Worker {} started job {}".format(worker_id, job_id))
+
+                def _on_result(result: dict) -> None:
+                    with self._jobs_lock:
+                        job["results"].append(result)
+                        job["done"] += 1
+
+                try:
+                    results = worker_downloader.download_many(job["links"], job["save_to"], result_callback=_on_result,
+                                                              file_names=job["file_names"], keep_browser=True)
+                    failed = any(result["error"] is not None for result in results)
+                    error = None
+                except Exception as e:
+                    logging.error("Error running job {}".format(job_id), exc_info=e)
+                    failed = True
+                    error = str(e)
+
+                # Start browser from scratch after errors (session may be expired)
+                if failed:
+                    worker_downloader.quit_browser()
+
+                with self._jobs_lock:
+                    job["status"] = JOB_STATUS_FAILED if failed else JOB_STATUS_DONE
+                    job["error"] = error
+                    job["finished"] = time.time()
+                logging.info("Worker {} finished job {}: {}".format(worker_id, job_id, job["status"]))
+        finally:
+            worker_downloader.quit_browser()
+
+
+def _make_handler(daemon: Daemon):
+    """
+    Creates HTTP request handler class bound to the daemon
+    :param daemon: Daemon instance
+    :return: BaseHTTPRequestHandler subclass
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.rstrip("/")
+            if path == "/status":
+                self._reply(200, daemon.status())
+            elif path == "/metrics":
+                self._reply_text(200, daemon.metrics())
+            elif path.startswith("/jobs/"):
+                job = daemon.job(path[len("/jobs/"):])
+                if job is None:
+                    self._reply(404, {"error": "Job not found"})
+                else:
+                    self._reply(200, job)
+            else:
+                self._reply(404, {"error": "Not found"})
+
+        def do_POST(self) -> None:
+            if self.path.rstrip("/") != "/jobs":
+                self._reply(404, {"error": "Not found"})
+                return
+
+            # Only JSON requests (plain HTML forms and "simple" cross-site requests can't send this content type)
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                self._reply(415, {"error": "Content-Type must be application/json"})
+                return
+
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                links = request.get("links") or ([request["link"]] if request.get("link") else [])
+                self._reply(202, daemon.submit(links, request.get("save_to"), request.get("file_names")))
+            except OverflowError as e:
+                self._reply(503, {"error": str(e)})
+            except (ValueError, AttributeError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def log_message(self, format_: str, *args) -> None:
+            logging.info("API: " + format_ % args)
+
+        def _reply(self, code: int, data: dict) -> None:
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _reply_text(self, code: int, text: str) -> None:
+            body = text.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return _Handler
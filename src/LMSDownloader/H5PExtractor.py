@@ -0,0 +1,174 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+import logging
+from typing import Optional
+from urllib.parse import urljoin
+
+from LMSDownloader.HTTPSession import HTTPSession
+from LMSDownloader.ImagePdf import image_to_pdf
+
+# Max offset and min size (in percents of slide size) of the element to treat it as a full-slide image
+FULL_SLIDE_TOLERANCE = 2.
+
+# Retrieves H5P integration object (it's defined in the parent page for iframe embedding)
+_INTEGRATION_SCRIPT = """
+const integration = window.H5PIntegration || (window.parent && window.parent.H5PIntegration);
+if (!integration || !integration.contents) return null;
+return JSON.stringify({url: integration.url, contents: integration.contents, base: document.baseURI});
+"""
+
+# Jumps to the slide using Course Presentation's API
+_JUMP_SCRIPT = """
+const instances = (window.H5P && window.H5P.instances) || [];
+const instance = instances.find((instance) => typeof instance.jumpToSlide === "function");
+if (!instance) return false;
+instance.jumpToSlide(arguments[0]);
+return true;
+"""
+
+# Counts slides using Course Presentation's API or DOM
+_SLIDES_COUNT_SCRIPT = """
+const instances = (window.H5P && window.H5P.instances) || [];
+const instance = instances.find((instance) => typeof instance.jumpToSlide === "function");
+if (instance && instance.slides) return instance.slides.length;
+return document.querySelectorAll(".h5p-slide").length;
+"""
+
+
+def extract_slides(browser, http_session: HTTPSession) -> Optional[list[Optional[bytes]]]:
+    """
+    Builds slides of H5P Course Presentation from the original images instead of screenshots.
+    Only slides that consist of one full-slide image (or background image only) can be built this way
+    :param browser: Selenium webdriver (switched to the H5P iframe)
+    :param http_session: Authenticated HTTPSession to download images with
+    :return: PDF file as bytes for each slide (None for slides that must be captured as screenshots)
+             or None if content is not Course Presentation
+    """
+    integration = browser.execute_script(_INTEGRATION_SCRIPT)
+    if not integration:
+        logging.info("H5PIntegration not found")
+        return None
+    integration = json.loads(integration)
+
+    for content_key, content in integration["contents"].items():
+        if not str(content.get("library", "")).startswith("H5P.CoursePresentation"):
+            continue
+
+        # Files are stored relative to the content's dir
+        content_id = content_key.replace("cid-", "", 1)
+        content_url = content.get("contentUrl") or "{}/content/{}".format(integration["url"], content_id)
+        content_url = urljoin(integration["base"], content_url.rstrip("/") + "/")
+
+        # Find image of each slide
+        presentation = json.loads(content["jsonContent"])["presentation"]
+        global_background = _background_path(presentation.get("globalBackgroundSelector"))
+        image_paths = [_slide_image_path(slide, global_background) for slide in presentation["slides"]]
+
+        # Download all images in parallel
+        urls = [urljoin(content_url, image_path) for image_path in image_paths if image_path]
+        logging.info("Downloading {} slide images from {}".format(len(urls), content_url))
+        images = iter(http_session.get_many(urls))
+
+        slides = []
+        for slide_index, image_path in enumerate(image_paths):
+            image_data = next(images) if image_path else None
+            pdf_data = None
+            if image_data is not None:
+                try:
+                    pdf_data = image_to_pdf(image_data)
+                except Exception as e:
+                    logging.warning("Unable to convert image of slide {}: {}".format(slide_index + 1, e))
+            slides.append(pdf_data)
+
+        logging.info("{} / {} slides built from the original images"
+                     .format(sum(1 for slide in slides if slide is not None), len(slides)))
+        return slides
+
+    logging.info("No H5P Course Presentation found")
+    return None
+
+
+def slides_count(browser) -> Optional[int]:
+    """
+    Counts slides of Course Presentation
+    :param browser: Selenium webdriver (switched to the H5P iframe)
+    :return: Number of slides or None if unknown
+    """
+    try:
+        return browser.execute_script(_SLIDES_COUNT_SCRIPT) or None
+    except Exception as e:
+        logging.warning("Unable to count slides: {}".format(e))
+        return None
+
+
+def jump_to_slide(browser, slide_index: int) -> bool:
+    """
+    Opens slide using Course Presentation's API
+    :param browser: Selenium webdriver (switched to the H5P iframe)
+    :param slide_index: Slide number (starting from 0)
+    :return: False if API is not available
+    """
+    try:
+        return bool(browser.execute_script(_JUMP_SCRIPT, slide_index))
+    except Exception as e:
+        logging.warning("Unable to jump to slide {}: {}".format(slide_index + 1, e))
+        return False
+
+
+def _slide_image_path(slide: dict, global_background: Optional[str]) -> Optional[str]:
+    """
+    Finds image that fully represents the slide
+    :param slide: Slide's params
+    :param global_background: Path to the presentation's background image
+    :return: Path to the image (relative to the content's dir) or None if slide is more complex
+    """
+    elements = slide.get("elements") or []
+
+    # Only background
+    if not elements:
+        return _background_path(slide.get("slideBackgroundSelector")) or global_background
+
+    # One image that covers the whole slide
+    if len(elements) == 1:
+        element = elements[0]
+        action = element.get("action") or {}
+        if str(action.get("library", "")).startswith("H5P.Image") \
+                and float(element.get("x", 100)) <= FULL_SLIDE_TOLERANCE \
+                and float(element.get("y", 100)) <= FULL_SLIDE_TOLERANCE \
+                and float(element.get("width", 0)) >= 100 - FULL_SLIDE_TOLERANCE \
+                and float(element.get("height", 0)) >= 100 - FULL_SLIDE_TOLERANCE:
+            return ((action.get("params") or {}).get("file") or {}).get("path")
+
+    return None
+
+
+def _background_path(background_selector: Optional[dict]) -> Optional[str]:
+    """
+    Extracts background image from slideBackgroundSelector or globalBackgroundSelector
+    :param background_selector: Background selector params
+    :return: Path to the image or None if there is no background image
+    """
+    if not background_selector:
+        return None
+    for key in ("imageSlideBackground", "imageGlobalBackground"):
+        if background_selector.get(key) and background_selector[key].get("path"):
+            return background_selector[key]["path"]
+    return None
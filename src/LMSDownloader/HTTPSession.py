@@ -0,0 +1,160 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import Cookie, CookieJar, DefaultCookiePolicy
+from typing import Callable, Optional
+from urllib.request import Request
+
+
+# How many times each request is retried on connection errors
+MAX_RETRIES = 3
+
+
+class HTTPSession:
+    def __init__(self, cookies: list[dict], user_agent: str, max_connections: int = 8,
+                 retries_callback: Optional[Callable[[int], None]] = None) -> None:
+        """
+        Initializes HTTPSession class (keep-alive connection pool authenticated with browser's cookies)
+        :param cookies: Cookies from browser.get_cookies()
+        :param user_agent: Browser's user agent
+        :param max_connections: Max number of connections per host (and max number of parallel requests)
+        :param retries_callback: Will be called with number of retries of each request that was retried
+        """
+        import urllib3
+
+        self._max_connections = max_connections
+        self._retries_callback = retries_callback
+        self._headers = {"User-Agent": user_agent}
+
+        # Cookies are matched against each URL like browser does, so they are not sent to other sites
+        self._cookie_jar = CookieJar(DefaultCookiePolicy(strict_ns_domain=DefaultCookiePolicy.DomainStrictNonDomain))
+        for cookie in cookies:
+            self._cookie_jar.set_cookie(_to_cookiejar_cookie(cookie))
+
+        # urllib3 drops Cookie header on redirects to other hosts
+        self._pool = urllib3.PoolManager(maxsize=max_connections, block=True,
+                                         retries=urllib3.Retry(total=MAX_RETRIES, backoff_factor=0.5),
+                                         timeout=urllib3.Timeout(connect=10., read=60.))
+
+    @classmethod
+    def from_browser(cls, browser, user_agent: str, max_connections: int = 8,
+                     retries_callback: Optional[Callable[[int], None]] = None) -> "HTTPSession":
+        """
+        Creates HTTPSession with cookies of the logged-in browser
+        :param browser: Selenium webdriver
+        :param user_agent: Browser's user agent
+        :param max_connections: Max number of connections per host (and max number of parallel requests)
+        :param retries_callback: Will be called with number of retries of each request that was retried
+        :return: HTTPSession
+        """
+        return cls(browser.get_cookies(), user_agent, max_connections=max_connections,
+                   retries_callback=retries_callback)
+
+    def get(self, url: str) -> bytes:
+        """
+        Downloads file
+        :param url: Absolute URL
+        :return: Response body
+        """
+        from urllib3.exceptions import MaxRetryError
+
+        logging.debug("Downloading {}".format(url))
+        try:
+            response = self._pool.request("GET", url, headers=self._request_headers(url))
+        except MaxRetryError:
+            self._report_retries(MAX_RETRIES)
+            raise
+        if response.retries is not None:
+            self._report_retries(len(response.retries.history))
+        if response.status != 200:
+            raise Exception("Error downloading {}! Status code: {}".format(url, response.status))
+        return response.data
+
+    def _report_retries(self, retries: int) -> None:
+        """
+        Passes number of retries of the request to retries_callback
+        :param retries: Number of retries
+        :return:
+        """
+        if retries and self._retries_callback is not None:
+            self._retries_callback(retries)
+
+    def _request_headers(self, url: str) -> dict:
+        """
+        :param url: Absolute URL
+        :return: Request headers with cookies that match the URL's domain and path
+        """
+        request = Request(url)
+        self._cookie_jar.add_cookie_header(request)
+        headers = dict(self._headers)
+        cookie_header = request.get_header("Cookie")
+        if cookie_header:
+            headers["Cookie"] = cookie_header
+        return headers
+
+    def get_many(self, urls: list[str]) -> list[Optional[bytes]]:
+        """
+        Downloads files in parallel
+        :param urls: Absolute URLs
+        :return: Response bodies in the same order as urls (None for failed ones)
+        """
+        def _get_safe(url: str) -> Optional[bytes]:
+            try:
+                return self.get(url)
+            except Exception as e:
+                logging.warning("Error downloading {}: {}".format(url, e))
+                return None
+
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self._max_connections, len(urls)),
+                                thread_name_prefix="LMSDownloader-http") as executor:
+            return list(executor.map(_get_safe, urls))
+
+    def close(self) -> None:
+        """
+        Closes all connections
+        :return:
+        """
+        self._pool.clear()
+
+
+def _to_cookiejar_cookie(cookie: dict) -> Cookie:
+    """
+    Converts Selenium cookie to http.cookiejar one
+    :param cookie: Cookie from browser.get_cookies()
+    :return: Cookie
+    """
+    domain = cookie.get("domain", "")
+
+    # CookieJar stores host-only cookies of dotless hosts (localhost) with .local suffix
+    if domain and "." not in domain:
+        domain += ".local"
+    path = cookie.get("path") or "/"
+    return Cookie(version=0, name=cookie["name"], value=cookie["value"],
+                  port=None, port_specified=False,
+                  domain=domain, domain_specified=domain.startswith("."), domain_initial_dot=domain.startswith("."),
+                  path=path, path_specified=True,
+                  secure=bool(cookie.get("secure", False)),
+                  expires=cookie.get("expiry"),
+                  discard=cookie.get("expiry") is None,
+                  comment=None, comment_url=None,
+                  rest={"HttpOnly": None} if cookie.get("httpOnly") else {})
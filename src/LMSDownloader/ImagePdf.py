@@ -0,0 +1,175 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import struct
+import zlib
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# PNG file signature
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def image_to_pdf(image_data: bytes, page_size: Optional[tuple[int, int]] = None) -> bytes:
+    """
+    Converts image into single-page PDF (1 pixel = 1 point) without lossy re-encoding.
+    JPEG is embedded as is, 8-bit non-interlaced RGB / grayscale PNG is embedded without decoding,
+    everything else is decoded and compressed losslessly
+    :param image_data: Image file as bytes
+    :param page_size: Page size in points (to keep size of downscaled images). None to use image size
+    :return: PDF file as bytes
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        width, height = image.size
+        page_size = page_size or image.size
+
+        # JPEG can be embedded directly
+        if image.format == "JPEG" and image.mode in ("RGB", "L", "CMYK"):
+            color_space = {"RGB": "/DeviceRGB", "L": "/DeviceGray", "CMYK": "/DeviceCMYK"}[image.mode]
+            decode = "/Decode [1 0 1 0 1 0 1 0]" if image.mode == "CMYK" else ""
+            return _build_pdf(width, height, "/Filter /DCTDecode /ColorSpace {} /BitsPerComponent 8 {}"
+                              .format(color_space, decode), image_data, page_size)
+
+        # PNG without alpha can be embedded without decoding
+        if image.format == "PNG":
+            png_stream = _png_stream(image_data)
+            if png_stream is not None:
+                colors, idat = png_stream
+                return _build_pdf(width, height,
+                                  "/Filter /FlateDecode /ColorSpace {} /BitsPerComponent 8 "
+                                  "/DecodeParms << /Predictor 15 /Colors {} /BitsPerComponent 8 /Columns {} >>"
+                                  .format("/DeviceRGB" if colors == 3 else "/DeviceGray", colors, width), idat,
+                                  page_size)
+
+        # Everything else
+        return _build_pdf(width, height, "/Filter /FlateDecode /ColorSpace /DeviceRGB /BitsPerComponent 8",
+                          zlib.compress(_to_rgb(image).tobytes(), 6), page_size)
+
+
+def compress_image(image_data: bytes, quality: int = 85, scale: float = 1.) -> bytes:
+    """
+    Re-encodes image as JPEG (lossy, but much smaller than PNG screenshots)
+    :param image_data: Image file as bytes
+    :param quality: JPEG quality (1-100)
+    :param scale: Downscale factor (for example, 0.5 to halve width and height). 1 to keep size
+    :return: JPEG file as bytes
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        image = _to_rgb(image)
+        if scale < 1.:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.LANCZOS)
+        jpeg_file = io.BytesIO()
+        image.save(jpeg_file, "JPEG", quality=quality)
+        return jpeg_file.getvalue()
+
+
+def _to_rgb(image: "Image.Image") -> "Image.Image":
+    """
+    Converts image into RGB (alpha is composed onto white background)
+    :param image: PIL image
+    :return: RGB PIL image
+    """
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA", "P", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def _png_stream(png_data: bytes) -> Optional[tuple[int, bytes]]:
+    """
+    Extracts compressed image data from PNG if it can be used in PDF as is
+    :param png_data: PNG file as bytes
+    :return: (number of color components, concatenated IDAT chunks) or None if PNG must be decoded
+    """
+    if not png_data.startswith(PNG_SIGNATURE):
+        return None
+    position = len(PNG_SIGNATURE)
+    colors = None
+    idat = []
+    while position + 8 <= len(png_data):
+        length, chunk_type = struct.unpack(">I4s", png_data[position:position + 8])
+        chunk_data = png_data[position + 8:position + 8 + length]
+        if chunk_type == b"IHDR":
+            _, _, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunk_data)
+            if bit_depth != 8 or interlace != 0 or color_type not in (0, 2):
+                return None
+            colors = 3 if color_type == 2 else 1
+        elif chunk_type in (b"tRNS", b"PLTE"):
+            return None
+        elif chunk_type == b"IDAT":
+            idat.append(chunk_data)
+        elif chunk_type == b"IEND":
+            break
+        position += 12 + length
+    if colors is None or not idat:
+        return None
+    return colors, b"".join(idat)
+
+
+def _build_pdf(width: int, height: int, image_dict: str, image_stream: bytes,
+               page_size: tuple[int, int]) -> bytes:
+    """
+    Builds single-page PDF with one image XObject covering the whole page
+    :param width: Image width
+    :param height: Image height
+    :param image_dict: Image XObject dictionary entries (filter, color space, etc.)
+    :param image_stream: Image XObject stream data
+    :param page_size: Page width and height
+    :return: PDF file as bytes
+    """
+    content = "q {} 0 0 {} 0 0 cm /Im0 Do Q".format(*page_size).encode("ascii")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Resources << /XObject << /Im0 4 0 R >> >> "
+        "/Contents 5 0 R >>".format(*page_size).encode("ascii"),
+        "<< /Type /XObject /Subtype /Image /Width {} /Height {} {} /Length {} >>\nstream\n"
+        .format(width, height, image_dict, len(image_stream)).encode("ascii") + image_stream + b"\nendstream",
+        "<< /Length {} >>\nstream\n".format(len(content)).encode("ascii") + content + b"\nendstream",
+    ]
+
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for object_index, object_data in enumerate(objects):
+        offsets.append(pdf.tell())
+        pdf.write("{} 0 obj\n".format(object_index + 1).encode("ascii"))
+        pdf.write(object_data)
+        pdf.write(b"\nendobj\n")
+    xref_offset = pdf.tell()
+    pdf.write("xref\n0 {}\n0000000000 65535 f \n".format(len(objects) + 1).encode("ascii"))
+    for offset in offsets:
+        pdf.write("{:010d} 00000 n \n".format(offset).encode("ascii"))
+    pdf.write("trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n"
+              .format(len(objects) + 1, xref_offset).encode("ascii"))
+    return pdf.getvalue()
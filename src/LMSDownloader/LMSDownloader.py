@@ -17,23 +17,34 @@
  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
  OTHER DEALINGS IN THE SOFTWARE.
 """
-import base64
+import copy
 import json
 import logging
 import os
 import re
-import tempfile
+import threading
 import time
+from typing import Callable, ContextManager, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
-from PIL import Image
-from PyPDF2 import PdfReader, PdfMerger
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions
-from selenium.webdriver.support.expected_conditions import presence_of_element_located
-from selenium.webdriver.support.wait import WebDriverWait
+# selenium is imported by the methods that use it, so importing this module (for example, for constants
+# or to validate links) doesn't load it
+from LMSDownloader import H5PExtractor, PageText
+from LMSDownloader.Checkpoint import Checkpoint
+from LMSDownloader.HTTPSession import HTTPSession
+from LMSDownloader.ImagePdf import image_to_pdf
+from LMSDownloader.Metrics import Metrics
+from LMSDownloader.NetworkMonitor import NetworkMonitor
+from LMSDownloader.PageCache import PageCache, fingerprint
+from LMSDownloader.PageProcessor import PageProcessor
+from LMSDownloader.PageWaiter import PageWaiter
+from LMSDownloader.PdfAssembler import PageCollector, PdfAssembler
+from LMSDownloader.PdfPrinter import print_to_pdf
+from LMSDownloader.ScormPackage import ScormPackage
+from LMSDownloader.Screenshot import capture_element
+from LMSDownloader.SessionCache import SessionCache
+from LMSDownloader.TextIndex import TextIndex
 
 # Print to PDF settings
 PRINT_SETTINGS = {
@@ -60,6 +71,13 @@ USER_AGENT_DEFAULT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) " \
 # Default regex to check link_to_download
 LINK_CHECK_REGEX_DEFAULT = "^(http|https):\\/\\/online\\.mospolytech\\.ru\\/mod\\/(scorm|hvp)\\/view\\.php\\?id="
 
+# download_many() stops after this many failed browser starts (or logins) in a row
+MAX_BROWSER_START_FAILURES = 3
+
+# Indexes of browser disk cache subdirs used by running browsers (Chrome can't share one between processes)
+_browser_cache_slots = set()
+_browser_cache_slots_lock = threading.Lock()
+
 
 class LMSDownloader:
     def __init__(self, lms_login: str, lms_password: str, link_to_download: str,
@@ -68,7 +86,28 @@ class LMSDownloader:
                  link_check_regex: str = LINK_CHECK_REGEX_DEFAULT,
                  user_agent: str = USER_AGENT_DEFAULT,
                  window_size: str = "960,1080",
-                 headless: bool = True) -> None:
+                 headless: bool = True,
+                 session_cache_file: Optional[str] = None,
+                 session_cache_ttl: float = 3600.,
+                 adaptive_wait: bool = True,
+                 max_volume_size: float = 0.,
+                 work_dir: Optional[str] = None,
+                 resume: bool = False,
+                 page_cache_dir: Optional[str] = None,
+                 page_cache_size: float = 1024.,
+                 h5p_fast_path: bool = True,
+                 scorm_fast_path: bool = False,
+                 blocked_urls: Optional[list[str]] = None,
+                 blocked_resource_types: Optional[list[str]] = None,
+                 browser_cache_dir: Optional[str] = None,
+                 screenshot_quality: int = 0,
+                 screenshot_scale: float = 1.,
+                 drop_duplicates: bool = False,
+                 slide_change_timeout: float = 5.,
+                 metrics_callback: Optional[Callable[[dict], None]] = None,
+                 extract_text: bool = False,
+                 text_index_file: Optional[str] = None,
+                 network_stats: bool = False) -> None:
         """
         Initializes LMSDownloader class (just copies fields)
         :param lms_login: LMS account login
@@ -80,6 +119,34 @@ class LMSDownloader:
         :param user_agent: Browser's user agent to prevent mobile version
         :param window_size: Default browser's window size
         :param headless: Set True to open Chrome in headless mode
+        :param session_cache_file: Path to the JSON file to save session cookies in to skip login next time
+        :param session_cache_ttl: How long (in seconds) saved session cookies can be used
+        :param adaptive_wait: Set True to continue as soon as page is idle (all waits become upper bounds)
+        :param max_volume_size: Split output PDF into multiple files of this size (in MB). 0 to disable splitting
+        :param work_dir: Path to the dir where to save captured pages to be able to resume after crash
+        :param resume: Set True to continue from the first missing page saved in work_dir
+        :param page_cache_dir: Path to the dir where to cache captured pages to reuse unchanged ones next time
+        :param page_cache_size: Max size of page cache (in MB). Least recently used pages will be deleted
+        :param h5p_fast_path: Set True to build H5P slides from the original images instead of screenshots if possible
+        :param scorm_fast_path: Set True to download SCORM package using imsmanifest.xml (slide images
+        or each launchable item printed directly) instead of clicking through the player if possible
+        :param blocked_urls: URL patterns of requests to block (* matches any characters)
+        :param blocked_resource_types: Types of resources to block: "tracker", "font" and / or "media"
+        :param browser_cache_dir: Path to the dir where to keep browser's disk cache between runs
+        :param screenshot_quality: JPEG quality (1-100) to re-encode H5P screenshots with. 0 to embed them losslessly
+        :param screenshot_scale: Downscale factor of H5P screenshots (works only with screenshot_quality)
+        :param drop_duplicates: Set True to compare page fingerprints, wait for the page to change after moving
+        to the next one and drop pages that are the same as the previous ones (slides that intentionally repeat
+        the previous one are dropped too)
+        :param slide_change_timeout: How long to wait for the page to change before treating it as a duplicate
+        :param metrics_callback: Will be called with timing of each download stage and counter increment
+        (see Metrics class)
+        :param extract_text: Set True to save text of each page (text layer of printed pages or visible text
+        of screenshotted ones) into TXT file next to the PDF
+        :param text_index_file: Path to the SQLite database to add text of each page into (full-text search index
+        keyed by course, module and page). None to disable
+        :param network_stats: Set True to count requests (blocked, loaded from the disk cache, received bytes)
+        using browser's performance log and add them into metrics counters
         """
         self._lms_login = lms_login
         self._lms_password = lms_password
@@ -90,28 +157,426 @@ class LMSDownloader:
         self._user_agent = user_agent
         self._window_size = window_size
         self._headless = headless
+        self._session_cache = SessionCache(session_cache_file, session_cache_ttl) if session_cache_file else None
+        self._adaptive_wait = adaptive_wait
+        self._max_volume_size = max_volume_size
+        self._work_dir = work_dir
+        self._resume = resume
+        self.page_cache = PageCache(page_cache_dir, int(page_cache_size * 1024 * 1024)) if page_cache_dir else None
+        self._h5p_fast_path = h5p_fast_path
+        self._scorm_fast_path = scorm_fast_path
+        self.network_monitor = NetworkMonitor(blocked_urls, blocked_resource_types, collect_stats=network_stats) \
+            if blocked_urls or blocked_resource_types or network_stats else None
+        self._browser_cache_dir = browser_cache_dir
+        self._screenshot_quality = screenshot_quality
+        self._screenshot_scale = screenshot_scale
+        self._drop_duplicates = drop_duplicates
+        self._slide_change_timeout = slide_change_timeout
+        self.duplicates_dropped = 0
+        self.metrics = Metrics(metrics_callback)
+        self._extract_text = extract_text
+        self.text_index = TextIndex(text_index_file) if text_index_file else None
+
+        # Course link to add pages into text index under (set by CourseCrawler.download_course())
+        self.course = None
 
         self.browser = None
+        self._page_waiter = None
+        self._debugger_address = None
+        self._browser_cache_slot = None
+        self._current_link = None
+        self._page_text = None
 
     def download(self, save_to_directory: str = "") -> list[str]:
         """
-        Downloads pages into PDF (and TXT for SCORM book)
+        Downloads pages into PDF (and TXT with text of pages)
         :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
         :return: Paths to downloaded files
         """
         # Test link using regex
-        logging.info("Checking link using regex")
-        if re.search(self._link_check_regex, self._link_to_download) is None:
-            raise Exception("Invalid link to download from! The link must satisfy the expression: {}"
-                            .format(self._link_check_regex))
+        self._check_link(self._link_to_download)
 
         # Start browser and log into LMS
         self._start_browser()
+        try:
+            self._login()
+            with self._stage("download", link=self._link_to_download):
+                downloaded_paths = self._download_link(self._link_to_download, save_to_directory)
+        finally:
+            # Exit and close browser
+            self.quit_browser()
+
+        # Done!
+        logging.info("Done!")
+        return downloaded_paths
+
+    def download_sharded(self, save_to_directory: str = "", shards: int = 2) -> list[str]:
+        """
+        Downloads pages into PDF capturing H5P Course Presentation slides in parallel using multiple tabs
+        (each tab opens its own range of slides). Other content types are downloaded as usual
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param shards: Number of tabs to capture slides with
+        :return: Paths to downloaded files
+        """
+        # Test link using regex
+        self._check_link(self._link_to_download)
+
+        # Start browser and log into LMS
+        self.start_browser()
+        try:
+            with self._stage("download", link=self._link_to_download):
+                downloaded_paths = self._download_link(self._link_to_download, save_to_directory, shards=shards)
+        finally:
+            # Exit and close browser
+            self.quit_browser()
+
+        # Done!
+        logging.info("Done!")
+        return downloaded_paths
+
+    def download_many(self, links: Iterable[str], save_to_directory: str = "",
+                      result_callback: Optional[Callable[[dict], None]] = None,
+                      file_names: Optional[dict[str, str]] = None, keep_browser: bool = False) -> list[dict]:
+        """
+        Downloads multiple links using one browser and one login. Stops after MAX_BROWSER_START_FAILURES failed
+        browser starts in a row (the rest of links are not taken from links iterable)
+        :param links: LMS links to download (any iterable, consumed lazily)
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param result_callback: Will be called with each result as soon as link is processed
+        :param file_names: Output file names (without extension, relative to save_to_directory) for links.
+        Page title will be used for links that are not in this dict
+        :param keep_browser: Set True to leave browser running (and logged in) for the next call
+        :return: One result per link: {"link": str, "paths": list[str], "error": str or None, "duplicates": int}
+        """
+        results = []
+
+        # Browser will be started only when the first link arrives (if it's not started by start_browser())
+        browser_ready = self.browser is not None
+        start_failures = 0
+        try:
+            for link in links:
+                result = {"link": link, "paths": [], "error": None, "duplicates": 0}
+                try:
+                    self._check_link(link)
+
+                    # Start browser and log into LMS (again if previous link broke it)
+                    if not browser_ready:
+                        try:
+                            self._start_browser()
+                            if self._debugger_address is None:
+                                self._login()
+                        except Exception:
+                            start_failures += 1
+                            self.quit_browser()
+                            raise
+                        start_failures = 0
+                        browser_ready = True
+
+                    with self._stage("download", link=link):
+                        result["paths"] = self._download_link(link, save_to_directory,
+                                                              file_name=(file_names or {}).get(link))
+                    result["duplicates"] = self.duplicates_dropped
+                    self._count("links_downloaded", link=link)
+                    logging.info("Downloaded {}".format(link))
+                except Exception as e:
+                    logging.error("Error downloading {}".format(link), exc_info=e)
+                    result["error"] = str(e)
+                    self._count("links_failed", link=link)
+
+                    # Reset browser state for the next link or restart it if it's dead
+                    if browser_ready:
+                        browser_ready = self._reset_browser()
+
+                results.append(result)
+                if result_callback is not None:
+                    result_callback(result)
+
+                # Leave the rest of links (to other workers) if browser can't be started
+                if start_failures >= MAX_BROWSER_START_FAILURES:
+                    logging.error("Unable to start browser {} times in a row. Stopping".format(start_failures))
+                    break
+
+        finally:
+            # Exit and close browser (or tab)
+            if not keep_browser:
+                self.quit_browser()
+
+        logging.info("Done! {} / {} links downloaded successfully"
+                     .format(sum(1 for result in results if result["error"] is None), len(results)))
+        return results
+
+    def start_browser(self) -> None:
+        """
+        Starts browser and logs into LMS (to share it with tab downloaders)
+        :return:
+        """
+        self._start_browser()
         self._login()
 
+    def new_tab_downloader(self) -> "LMSDownloader":
+        """
+        Creates copy of this LMSDownloader that will download links in a new tab of this browser
+        using the same login, cookies and cache (call start_browser() first)
+        :return: LMSDownloader that must be used from its own thread
+        """
+        tab_downloader = copy.copy(self)
+        tab_downloader.browser = None
+        tab_downloader._page_waiter = None
+        tab_downloader._browser_cache_slot = None
+        tab_downloader._debugger_address = self.browser.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        return tab_downloader
+
+    def quit_browser(self) -> None:
+        """
+        Closes browser (or only its own tab if it's attached to another LMSDownloader's browser)
+        :return:
+        """
+        if self.browser is None:
+            return
+        self._collect_network()
+        logging.info("Exiting {}".format("tab" if self._debugger_address is not None else "browser"))
+        try:
+            if self._debugger_address is not None:
+                self.browser.close()
+            self.browser.quit()
+        except Exception as e:
+            logging.warning("Error closing browser: {}".format(e))
+        self.browser = None
+        self._release_browser_cache()
+
+    def _check_link(self, link: str) -> None:
+        """
+        Checks link using link_check_regex
+        :param link: LMS link to check
+        :return:
+        """
+        logging.info("Checking link using regex")
+        if re.search(self._link_check_regex, link) is None:
+            raise Exception("Invalid link to download from! The link must satisfy the expression: {}"
+                            .format(self._link_check_regex))
+
+    def _reset_browser(self) -> bool:
+        """
+        Leaves any iframe after failed download. Closes browser if it doesn't respond anymore
+        :return: True if browser can be used further, False if it must be started again
+        """
+        try:
+            self.browser.switch_to.default_content()
+            return True
+        except Exception as e:
+            logging.warning("Browser doesn't respond ({}). It will be restarted".format(e))
+            try:
+                self.browser.quit()
+            except Exception:
+                pass
+            self.browser = None
+            self._release_browser_cache()
+            self._count("browser_restarts")
+            self._count("retries")
+            return False
+
+    def get_page_source(self, link: str, keep_browser: bool = False) -> str:
+        """
+        Opens page in the logged-in browser (browser is started if it's not started yet) and returns its HTML
+        :param link: LMS link to open
+        :param keep_browser: Set True to leave browser running (and logged in) to download links with it
+        :return: Page source
+        """
+        try:
+            if self.browser is None:
+                self._start_browser()
+                self._login()
+            logging.info("Loading {}".format(link))
+            self.browser.get(link)
+            page_source = self.browser.page_source
+        except Exception:
+            self.quit_browser()
+            raise
+        if not keep_browser:
+            self.quit_browser()
+        return page_source
+
+    def _download_link(self, link_to_download: str, save_to_directory: str,
+                       file_name: Optional[str] = None, shards: int = 1) -> list[str]:
+        """
+        Downloads one link using already started and logged-in browser
+        :param link_to_download: LMS link to download
+        :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+        :param file_name: Output file name without extension (relative to save_to_directory). None to use page title
+        :param shards: Number of tabs to capture H5P Course Presentation slides with
+        :return: Paths to downloaded files
+        """
+        self.duplicates_dropped = 0
+        self._current_link = link_to_download
+
+        # Stats are shared with other links, so only their increase is logged
+        network_stats = self.network_monitor.snapshot() if self.network_monitor is not None else None
+
+        # Open link and find the player
+        with self._stage("open_link"):
+            player_url = self._open_link(link_to_download)
+
+        # Try to download SCORM package without the player
+        if player_url is not None and self._scorm_fast_path:
+            with self._stage("scorm_package"):
+                downloaded_paths = self._download_scorm_package(player_url, save_to_directory, file_name)
+            if downloaded_paths is not None:
+                return downloaded_paths
+
+        # Open the player and determine content type
+        with self._stage("open_content"):
+            content_type = self._open_content(player_url)
+
+        # Disable landscape for SCORM book
+        print_settings = PRINT_SETTINGS.copy()
+        if content_type == CONTENT_TYPE_SCORM_BOOK:
+            logging.info("Disabling landscape mode")
+            print_settings["isLandscapeEnabled"] = False
+        else:
+            logging.info("Enabling landscape mode")
+            print_settings["isLandscapeEnabled"] = True
+
+        # Restore progress of the previous run
+        checkpoint = None
+        resumed_pages = []
+        if self._work_dir:
+            checkpoint = Checkpoint(self._work_dir, link_to_download)
+            resumed_pages = checkpoint.open(content_type, resume=self._resume)
+            if resumed_pages:
+                self._count("resumed_pages", len(resumed_pages))
+
+        # Pages are decoded in background while browser moves to the next one
+        # and appended to the output PDF as soon as possible
+        file_path_base = self._file_path_base(save_to_directory, file_name)
+        pdf_assembler = PdfAssembler(file_path_base, max_volume_size=int(self._max_volume_size * 1024 * 1024))
+
+        page_text = None
+        try:
+            # Text of each page is extracted as soon as it's assembled and written in page order
+            page_text = self._open_page_text(link_to_download, file_path_base)
+            for page_index, pdf_data in enumerate(resumed_pages):
+                pdf_assembler.add_page(pdf_data)
+                if page_text is not None:
+                    page_text.add_pdf(page_index, pdf_data)
+
+            # Download all pages (or the rest of them)
+            if checkpoint is not None and checkpoint.captured_all:
+                logging.info("All pages were captured by previous run")
+            else:
+                # Try to build H5P slides from the original images
+                h5p_slides = None
+                if content_type == CONTENT_TYPE_H5P_PRESENTATION and self._h5p_fast_path:
+                    with self._stage("h5p_extract"):
+                        h5p_slides = self._extract_h5p_slides()
+
+                # Keys of captured pages that must be saved into the page cache
+                cache_keys = {}
+
+                # Player's slide indexes of captured pages (they differ from page indexes after dropped duplicates)
+                page_slides = {}
+
+                # Fingerprints of captured pages (to detect duplicate of the last saved page after resuming)
+                page_fingerprints = {}
+
+                def _on_page_assembled(page_index: int, pdf_data: bytes) -> None:
+                    self._count("pages", page=page_index)
+                    self._count("bytes", len(pdf_data), page=page_index)
+                    if checkpoint is not None:
+                        checkpoint.add_page(page_index, pdf_data, page_slides.pop(page_index, None),
+                                            page_fingerprints.pop(page_index, None))
+                    cache_key = cache_keys.pop(page_index, None)
+                    if cache_key is not None:
+                        self.page_cache.put(cache_key, pdf_data)
+                    if page_text is not None:
+                        page_text.add_pdf(page_index, pdf_data)
+
+                self._page_text = page_text
+                page_processor = PageProcessor(pdf_assembler, first_index=len(resumed_pages),
+                                               page_callback=_on_page_assembled,
+                                               image_quality=self._screenshot_quality,
+                                               image_scale=self._screenshot_scale)
+                try:
+                    slides_count = None
+                    if content_type == CONTENT_TYPE_H5P_PRESENTATION and shards > 1:
+                        slides_count = len(h5p_slides) if h5p_slides is not None \
+                            else H5PExtractor.slides_count(self.browser)
+                    if slides_count is not None:
+                        self._capture_h5p_sharded(link_to_download, h5p_slides or [None] * slides_count,
+                                                  print_settings, page_processor, len(resumed_pages), shards)
+                    elif h5p_slides is not None:
+                        self._capture_h5p_slides(h5p_slides, print_settings, page_processor, len(resumed_pages))
+                    else:
+                        first_slide = checkpoint.next_slide if resumed_pages else 0
+                        if first_slide and content_type == CONTENT_TYPE_H5P_PRESENTATION:
+                            self._go_to_h5p_slide(0, first_slide)
+                        elif first_slide:
+                            self._skip_pages(content_type, first_slide)
+                        self._capture_pages(content_type, print_settings, page_processor, len(resumed_pages),
+                                            cache_keys, page_slides, page_fingerprints, first_slide,
+                                            checkpoint.last_fingerprint if resumed_pages else None)
+                    with self._stage("processing_wait"):
+                        page_processor.finish()
+                finally:
+                    page_processor.close()
+                    self._page_text = None
+                if self.page_cache is not None:
+                    logging.info("Page cache: {} hits, {} misses, {} evictions"
+                                 .format(self.page_cache.stats["hits"], self.page_cache.stats["misses"],
+                                         self.page_cache.stats["evictions"]))
+                if checkpoint is not None:
+                    checkpoint.finish_capture()
+                if self.network_monitor is not None and self.network_monitor.collect_stats:
+                    self._collect_network()
+                    network_stats = {name: value - network_stats[name]
+                                     for name, value in self.network_monitor.snapshot().items()}
+                    logging.info("Network: {} requests, {} blocked, {} from disk cache ({:.1f} MB saved)"
+                                 .format(network_stats["requests"], network_stats["blocked_requests"],
+                                         network_stats["cached_requests"], network_stats["cached_bytes"] / 1024 / 1024))
+
+            downloaded_paths = []
+
+            # Wait for text of the last pages
+            if page_text is not None:
+                logging.info("Waiting for text extraction")
+                with self._stage("text_extraction"):
+                    txt_file_path = page_text.close()
+                if txt_file_path is not None:
+                    logging.info("Text saved as {}".format(txt_file_path))
+                    downloaded_paths.append(txt_file_path)
+
+            # Save the last volume
+            with self._stage("pdf_merge"):
+                downloaded_paths.extend(pdf_assembler.close())
+        except BaseException:
+            # Don't leave partial files in the output dir (captured pages are kept in the checkpoint)
+            pdf_assembler.abort()
+            if page_text is not None:
+                page_text.abort()
+            raise
+
+        # Progress is not needed anymore
+        if checkpoint is not None:
+            checkpoint.cleanup()
+
+        # Leave H5P iframe so the browser is ready for the next link
+        self.browser.switch_to.default_content()
+
+        return downloaded_paths
+
+    def _open_link(self, link: str) -> Optional[str]:
+        """
+        Opens LMS link and enters the module if needed
+        :param link: LMS link to open
+        :return: URL of the SCORM player (scorm_object iframe) or None for H5P
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.expected_conditions import presence_of_element_located
+        from selenium.webdriver.support.wait import WebDriverWait
+
         # Open link
-        logging.info("Redirecting to {}".format(self._link_to_download))
-        self.browser.get(self._link_to_download)
+        logging.info("Redirecting to {}".format(link))
+        self.browser.get(link)
 
         # Enter button
         enter_btn_xpath = "//input[@class='btn btn-primary'][@type='submit']"
@@ -136,12 +601,33 @@ class LMSDownloader:
 
         # SCORM
         if self.browser.find_elements(By.ID, "scorm_object"):
-            logging.info("Switching to the iframe")
             iframe_src = self.browser.find_element(By.ID, "scorm_object").get_attribute("src")
-            if iframe_src.lower().startswith("http"):
-                self.browser.get(iframe_src)
-            else:
-                self.browser.get(urljoin(self._link_to_download, iframe_src))
+            if not iframe_src.lower().startswith("http"):
+                iframe_src = urljoin(link, iframe_src)
+            return iframe_src
+
+        # H5P
+        if self.browser.find_elements(By.CLASS_NAME, "h5p-iframe"):
+            return None
+
+        # Something else
+        raise ValueError("Wrong content type! Unsupported link")
+
+    def _open_content(self, player_url: Optional[str]) -> int:
+        """
+        Opens the player, waits for it to load, goes to the first page and determines content type
+        :param player_url: Result of _open_link()
+        :return: CONTENT_TYPE_SCORM_PRESENTATION, CONTENT_TYPE_SCORM_BOOK or CONTENT_TYPE_H5P_PRESENTATION
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.expected_conditions import presence_of_element_located
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        # SCORM
+        if player_url is not None:
+            logging.info("Switching to the iframe")
+            self.browser.get(player_url)
 
             # Wait until loaded
             WebDriverWait(self.browser, 60).until(expected_conditions.any_of(
@@ -149,7 +635,7 @@ class LMSDownloader:
                 presence_of_element_located((By.XPATH, "//div[@class='viewer bookViewer']")),
                 presence_of_element_located((By.XPATH, "//div[@class='viewer pageViewer']"))))
             logging.info("Subject page opened")
-            time.sleep(1)
+            self._wait(1)
 
             # Check for No button
             message_box_buttons = self.browser.find_elements(By.CLASS_NAME, "message-box-buttons-panel__window-button")
@@ -158,8 +644,9 @@ class LMSDownloader:
                 message_box_buttons[-1].click()
 
             # Wait
-            logging.info("Waiting 10s for loading")
-            time.sleep(10)
+            logging.info("Waiting {}10s for loading".format("up to " if self._adaptive_wait else ""))
+            with self._stage("warm_up"):
+                self._wait(10, quiet_period=1.)
             logging.info("Subject page loaded successfully")
 
             # Handle book mode
@@ -169,32 +656,35 @@ class LMSDownloader:
                 book_btn_ = book_btn[0].find_elements(By.XPATH, "./..")
                 if book_btn_:
                     logging.info("Fixing book mode")
+                    self._mark_page()
                     book_btn_[0].click()
-                    time.sleep(1)
+                    self._wait(1, expect_change=True)
 
         # H5P
-        elif self.browser.find_elements(By.CLASS_NAME, "h5p-iframe"):
+        else:
             # Open iframe's src
             logging.info("Switching to the iframe")
             self.browser.switch_to.frame(self.browser.find_element(By.CLASS_NAME, "h5p-iframe"))
 
             # Wait until loaded
             WebDriverWait(self.browser, 60).until(presence_of_element_located((By.CLASS_NAME, "h5p-wrapper")))
-            logging.info("Subject page opened. Waiting 1 second")
-            time.sleep(1)
+            logging.info("Subject page opened. Waiting {}1 second".format("up to " if self._adaptive_wait else ""))
+            self._wait(1)
 
-            # Go to the first page
+            # Go to the first page (using API or by clicking previous button)
             logging.info("Going to the first page")
             previous_slide_btn_xpath = "//div[@class='h5p-footer-button h5p-footer-previous-slide']"
             previous_slide_btn = self.browser.find_element(By.XPATH, previous_slide_btn_xpath)
+            if previous_slide_btn.get_attribute("aria-disabled") == "false":
+                self._mark_page()
+                if H5PExtractor.jump_to_slide(self.browser, 0):
+                    self._wait(self._wait_between_pages, expect_change=True)
+                    previous_slide_btn = self.browser.find_element(By.XPATH, previous_slide_btn_xpath)
             while previous_slide_btn.get_attribute("aria-disabled") == "false":
+                self._mark_page()
                 previous_slide_btn.click()
+                self._wait(self._wait_between_pages, expect_change=True)
                 previous_slide_btn = self.browser.find_element(By.XPATH, previous_slide_btn_xpath)
-                time.sleep(self._wait_between_pages)
-
-        # Something else
-        else:
-            raise ValueError("Wrong content type! Unsupported link")
 
         # Determine content type
         if self.browser.find_elements(By.ID, "playerView"):
@@ -208,46 +698,367 @@ class LMSDownloader:
             content_type = CONTENT_TYPE_H5P_PRESENTATION
         else:
             raise ValueError("Wrong content type! Unsupported link")
+        return content_type
 
-        # Create directory for downloads
-        temp_dir = tempfile.TemporaryDirectory()
-        logging.info("Downloading into {}".format(temp_dir.name))
+    def _capture_pages(self, content_type: int, print_settings: dict, page_processor: PageProcessor,
+                       page_counter: int, cache_keys: dict, page_slides: dict, page_fingerprints: dict,
+                       slide_index: int = 0, previous_fingerprint: Optional[str] = None) -> None:
+        """
+        Captures pages one by one starting from the current one until the last one
+        :param content_type: CONTENT_TYPE_SCORM_PRESENTATION, CONTENT_TYPE_SCORM_BOOK or CONTENT_TYPE_H5P_PRESENTATION
+        :param print_settings: Page.printToPDF settings
+        :param page_processor: PageProcessor to submit captured pages into
+        :param page_counter: Index of the current page
+        :param cache_keys: Will be filled with page cache keys of captured (not cached) pages {page index: key}
+        :param page_slides: Will be filled with player's slide indexes of pages {page index: slide index}
+        :param page_fingerprints: Will be filled with fingerprints of pages {page index: fingerprint}
+        :param slide_index: Player's index of the current slide
+        :param previous_fingerprint: Fingerprint of the page before the current one (last saved page when resuming)
+        :return:
+        """
+        dropped_slides = []
+        while True:
+            page_fingerprint = None
+            if self.page_cache is not None or self._drop_duplicates:
+                page_fingerprint = fingerprint(self.browser)
 
-        # Disable landscape for SCORM book
-        print_settings = PRINT_SETTINGS.copy()
-        if content_type == CONTENT_TYPE_SCORM_BOOK:
-            logging.info("Disabling landscape mode")
-            print_settings["isLandscapeEnabled"] = False
+            # Wait for the page to change if player is slow and drop it if it doesn't
+            duplicate = False
+            if self._drop_duplicates and page_fingerprint is not None and page_fingerprint == previous_fingerprint:
+                page_fingerprint = self._wait_for_page_change(previous_fingerprint)
+                if page_fingerprint == previous_fingerprint:
+                    logging.warning("Slide {} is the same as the previous one. Dropping it"
+                                    .format(slide_index + 1))
+                    dropped_slides.append(slide_index + 1)
+                    self.duplicates_dropped += 1
+                    self._count("duplicates", page=page_counter)
+                    duplicate = True
+
+            if not duplicate:
+                page_slides[page_counter] = slide_index
+                if page_fingerprint is not None:
+                    page_fingerprints[page_counter] = page_fingerprint
+
+            # Try to reuse unchanged page from the cache
+            cached = False
+            if self.page_cache is not None and page_fingerprint is not None and not duplicate:
+                cache_key = PageCache.make_key(page_fingerprint, content_type, json.dumps(print_settings),
+                                               self._window_size, self._screenshot_quality, self._screenshot_scale)
+                pdf_data = self.page_cache.get(cache_key)
+                if pdf_data is not None:
+                    logging.info("Page {} is unchanged. Using cached one".format(page_counter + 1))
+                    self._count("page_cache_hits", page=page_counter)
+                    if self._page_text is not None:
+                        self._page_text.add_dom_text(page_counter, PageText.dom_text(self.browser))
+                    page_processor.submit_ready(page_counter, pdf_data)
+                    cached = True
+                else:
+                    cache_keys[page_counter] = cache_key
+
+            # Capture page
+            if not duplicate and not cached:
+                self._capture_page(content_type, print_settings, page_processor, page_counter)
+            previous_fingerprint = page_fingerprint
+
+            # Finish or next
+            if not self._next_page(content_type):
+                logging.info("Downloading done")
+                if dropped_slides:
+                    logging.warning("{} duplicate slides dropped: {}"
+                                    .format(len(dropped_slides), ", ".join(map(str, dropped_slides))))
+                break
+
+            # Increment counters
+            slide_index += 1
+            if not duplicate:
+                page_counter += 1
+
+    def _wait_for_page_change(self, previous_fingerprint: str) -> Optional[str]:
+        """
+        Polls page fingerprint until it differs from the previous one or slide_change_timeout is reached
+        :param previous_fingerprint: Fingerprint of the previous page
+        :return: Fingerprint of the current page (the same as previous_fingerprint on timeout)
+        """
+        logging.info("Page hasn't changed yet. Waiting up to {:.2f} seconds".format(self._slide_change_timeout))
+        self._count("slide_change_waits")
+        time_started = time.time()
+        page_fingerprint = previous_fingerprint
+        while page_fingerprint == previous_fingerprint and time.time() - time_started < self._slide_change_timeout:
+            time.sleep(0.2)
+            page_fingerprint = fingerprint(self.browser)
+        if page_fingerprint == previous_fingerprint:
+            return page_fingerprint
+
+        # Page has just started changing. Wait for it to be ready
+        self._wait(self._wait_between_pages)
+        return fingerprint(self.browser)
+
+    def _download_scorm_package(self, player_url: str, save_to_directory: str,
+                                file_name: Optional[str] = None) -> Optional[list[str]]:
+        """
+        Downloads SCORM package using imsmanifest.xml. Pre-rendered slide images are downloaded in parallel
+        and assembled directly. If there are no slide images, but multiple launchable items,
+        each item is opened and printed without clicking through the player
+        :param player_url: URL of the scorm_object iframe
+        :param save_to_directory: Path to the dir where to save downloaded PDF
+        :param file_name: Output file name without extension (relative to save_to_directory). None to use page title
+        :return: Paths to downloaded files or None if package must be downloaded using the player
+        """
+        logging.info("Trying to download SCORM package using imsmanifest.xml")
+        file_path_base = self._file_path_base(save_to_directory, file_name)
+        http_session = HTTPSession.from_browser(self.browser, self._user_agent,
+                                                retries_callback=self._count_retries)
+        try:
+            package = ScormPackage.open(http_session, player_url)
+            if package is None:
+                return None
+
+            # Pre-rendered slides
+            slide_urls = package.slide_image_urls()
+            pages = []
+            if slide_urls:
+                logging.info("Downloading {} slide images".format(len(slide_urls)))
+                for slide_index, image_data in enumerate(http_session.get_many(slide_urls)):
+                    if image_data is None:
+                        logging.warning("Slide {} not downloaded".format(slide_index + 1))
+                        return None
+                    pages.append(image_to_pdf(image_data))
+
+            # Nothing to do without the player
+            elif len(package.sco_urls) < 2:
+                logging.info("SCORM package has no slide images and only one launchable item")
+                return None
+        except Exception as e:
+            logging.warning("Unable to download SCORM package using imsmanifest.xml: {}".format(e))
+            return None
+        finally:
+            http_session.close()
+
+        pdf_assembler = PdfAssembler(file_path_base,
+                                     max_volume_size=int(self._max_volume_size * 1024 * 1024))
+        page_text = None
+        try:
+            page_text = self._open_page_text(self._current_link, file_path_base)
+            self._page_text = page_text
+            page_processor = PageProcessor(pdf_assembler, page_callback=page_text.add_pdf if page_text else None)
+            try:
+                # Slide images
+                for page_index, pdf_data in enumerate(pages):
+                    page_processor.submit_ready(page_index, pdf_data)
+
+                # Print each launchable item
+                if not pages:
+                    print_settings = PRINT_SETTINGS.copy()
+                    print_settings["isLandscapeEnabled"] = True
+                    for page_index, sco_url in enumerate(package.sco_urls):
+                        logging.info("Opening {}".format(sco_url))
+                        self.browser.get(sco_url)
+                        self._wait(self._wait_between_pages)
+                        self._capture_page(CONTENT_TYPE_SCORM_PRESENTATION, print_settings, page_processor, page_index)
+
+                page_processor.finish()
+            finally:
+                page_processor.close()
+                self._page_text = None
+            logging.info("Downloading done")
+
+            downloaded_paths = []
+            if page_text is not None:
+                with self._stage("text_extraction"):
+                    txt_file_path = page_text.close()
+                if txt_file_path is not None:
+                    downloaded_paths.append(txt_file_path)
+            downloaded_paths.extend(pdf_assembler.close())
+            return downloaded_paths
+        except BaseException:
+            # Don't leave partial files in the output dir
+            pdf_assembler.abort()
+            if page_text is not None:
+                page_text.abort()
+            raise
+
+    def _file_path_base(self, save_to_directory: str, file_name: Optional[str]) -> str:
+        """
+        Generates output file path and creates its dir
+        :param save_to_directory: Path to the dir where to save downloaded files
+        :param file_name: Output file name without extension (relative to save_to_directory). None to use page title
+        :return: Path to the output file without extension
+        """
+        file_path_base = os.path.join(save_to_directory, file_name if file_name else self.browser.title)
+        directory = os.path.dirname(file_path_base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return file_path_base
+
+    def _open_page_text(self, link: str, file_path_base: str) -> Optional[PageText.PageText]:
+        """
+        Creates PageText to write text of pages into TXT file and text index
+        :param link: LMS link that is being downloaded (text index key)
+        :param file_path_base: Path to the output file without extension
+        :return: PageText or None if text extraction is disabled
+        """
+        if not self._extract_text and self.text_index is None:
+            return None
+        return PageText.PageText(file_path_base + ".txt" if self._extract_text else None, self.text_index,
+                                 course=self.course or "", module=link, title=os.path.basename(file_path_base),
+                                 file=file_path_base)
+
+    def _extract_h5p_slides(self) -> Optional[list[Optional[bytes]]]:
+        """
+        Downloads original images of H5P Course Presentation slides
+        :return: PDF file as bytes for each slide (None for slides that must be captured as screenshots)
+                 or None if it's not possible
+        """
+        logging.info("Trying to build slides from the original images")
+        http_session = HTTPSession.from_browser(self.browser, self._user_agent,
+                                                retries_callback=self._count_retries)
+        try:
+            return H5PExtractor.extract_slides(self.browser, http_session)
+        except Exception as e:
+            logging.warning("Unable to build slides from the original images: {}".format(e))
+            return None
+        finally:
+            http_session.close()
+
+    def _capture_h5p_slides(self, h5p_slides: list[Optional[bytes]], print_settings: dict,
+                            page_processor: PageProcessor, first_index: int,
+                            last_index: Optional[int] = None) -> None:
+        """
+        Submits slides built from the original images and captures the rest of them as screenshots
+        :param h5p_slides: Result of _extract_h5p_slides() (None for each slide to capture all of them)
+        :param print_settings: Page.printToPDF settings
+        :param page_processor: PageProcessor to submit pages into
+        :param first_index: Index of the first slide to submit
+        :param last_index: Index after the last slide to submit. None to submit all remaining slides
+        :return:
+        """
+        current_slide = 0
+        for slide_index in range(first_index, len(h5p_slides) if last_index is None else last_index):
+            if h5p_slides[slide_index] is not None:
+                page_processor.submit_ready(slide_index, h5p_slides[slide_index])
+                continue
+
+            # Open slide and take screenshot
+            self._go_to_h5p_slide(current_slide, slide_index)
+            current_slide = slide_index
+            self._capture_page(CONTENT_TYPE_H5P_PRESENTATION, print_settings, page_processor, slide_index)
+        logging.info("Downloading done")
+
+    def _capture_h5p_sharded(self, link_to_download: str, h5p_slides: list[Optional[bytes]], print_settings: dict,
+                             page_processor: PageProcessor, first_index: int, shards: int) -> None:
+        """
+        Splits slides into contiguous ranges and captures each range in its own tab.
+        This tab captures the first range, other pages are submitted in order after all tabs finish
+        :param link_to_download: LMS link that is being downloaded (to open it in other tabs)
+        :param h5p_slides: Result of _extract_h5p_slides() (None for each slide to capture all of them)
+        :param print_settings: Page.printToPDF settings
+        :param page_processor: PageProcessor to submit pages into
+        :param first_index: Index of the first slide to submit
+        :param shards: Number of tabs
+        :return:
+        """
+        # Split slides that must be captured into ranges of nearly equal size
+        to_capture = [index for index in range(first_index, len(h5p_slides)) if h5p_slides[index] is None]
+        shards = max(1, min(shards, len(to_capture)))
+        bounds = [first_index]
+        for shard_index in range(1, shards):
+            bounds.append(to_capture[len(to_capture) * shard_index // shards])
+        bounds.append(len(h5p_slides))
+        logging.info("Capturing {} slides using {} tabs".format(len(to_capture), shards))
+
+        def _capture_shard(shard_index: int) -> list[bytes]:
+            tab_downloader = self.new_tab_downloader()
+            try:
+                tab_downloader._start_browser()
+                tab_downloader._open_content(tab_downloader._open_link(link_to_download))
+                page_collector = PageCollector()
+                shard_processor = PageProcessor(page_collector, first_index=bounds[shard_index],
+                                                image_quality=self._screenshot_quality,
+                                                image_scale=self._screenshot_scale)
+                try:
+                    tab_downloader._capture_h5p_slides(h5p_slides, print_settings, shard_processor,
+                                                       bounds[shard_index], bounds[shard_index + 1])
+                    shard_processor.finish()
+                finally:
+                    shard_processor.close()
+                return page_collector.pages
+            finally:
+                tab_downloader.quit_browser()
+
+        with ThreadPoolExecutor(max_workers=max(1, shards - 1)) as executor:
+            futures = [executor.submit(_capture_shard, shard_index) for shard_index in range(1, shards)]
+
+            # Capture the first range in this tab while other tabs are working
+            self._capture_h5p_slides(h5p_slides, print_settings, page_processor, bounds[0], bounds[1])
+
+            # Add pages of other tabs in order
+            for shard_index, future in enumerate(futures, start=1):
+                for page_offset, pdf_data in enumerate(future.result()):
+                    page_processor.submit_ready(bounds[shard_index] + page_offset, pdf_data)
+
+    def _go_to_h5p_slide(self, current_slide: int, slide_index: int) -> None:
+        """
+        Opens H5P slide using API or by clicking next button
+        :param current_slide: Index of the currently opened slide
+        :param slide_index: Index of the slide to open
+        :return:
+        """
+        if slide_index == current_slide:
+            return
+        self._mark_page()
+        if H5PExtractor.jump_to_slide(self.browser, slide_index):
+            logging.info("Jumped to slide {}".format(slide_index + 1))
+            self._wait(self._wait_between_pages, expect_change=True)
+            self._collect_network()
         else:
-            logging.info("Enabling landscape mode")
-            print_settings["isLandscapeEnabled"] = True
+            self._skip_pages(CONTENT_TYPE_H5P_PRESENTATION, slide_index - current_slide)
 
-        # Download all pages
-        pdfs = []
-        page_counter = 0
-        while True:
-            # Set path
-            pdf_path = os.path.join(temp_dir.name, "{}.pdf".format(page_counter))
-            png_path = os.path.join(temp_dir.name, "{}.png".format(page_counter))
+    def _capture_page(self, content_type: int, print_settings: dict, page_processor: PageProcessor,
+                      page_counter: int) -> None:
+        """
+        Captures current page
+        :param content_type: CONTENT_TYPE_SCORM_PRESENTATION, CONTENT_TYPE_SCORM_BOOK or CONTENT_TYPE_H5P_PRESENTATION
+        :param print_settings: Page.printToPDF settings
+        :param page_processor: PageProcessor to submit captured page into
+        :param page_counter: Index of the current page
+        :return:
+        """
+        from selenium.webdriver.common.by import By
 
+        with self._stage("capture", page=page_counter):
+            if self._page_text is not None:
+                self._page_text.add_dom_text(page_counter, PageText.dom_text(self.browser))
             if content_type == CONTENT_TYPE_SCORM_PRESENTATION or content_type == CONTENT_TYPE_SCORM_BOOK:
-                # Print into PDF
-                logging.info("Downloading page as: {}".format(pdf_path))
+                # Print into PDF (it's read by chunks and decoded in background)
                 self.browser.execute_script("window.print();")
-                pdf_data = self.browser.execute_cdp_cmd("Page.printToPDF", print_settings)
-                with open(pdf_path, "wb") as file:
-                    file.write(base64.b64decode(pdf_data["data"]))
-                pdfs.append(pdf_path)
+                page_processor.submit_pdf(page_counter, print_to_pdf(self.browser, print_settings))
             elif content_type == CONTENT_TYPE_H5P_PRESENTATION:
-                # Save as image and convert to PDF
-                logging.info("Downloading page as: {}".format(png_path))
-                self.browser.find_element(By.CLASS_NAME, "h5p-iframe").screenshot(png_path)
-                logging.info("Converting into RGB and saving as PDF")
-                image = Image.open(png_path).convert("RGB")
-                image.save(pdf_path)
-                image.close()
-                pdfs.append(pdf_path)
+                # Save as image (will be converted to PDF in background)
+                page_processor.submit_image(page_counter,
+                                            capture_element(self.browser,
+                                                            self.browser.find_element(By.CLASS_NAME, "h5p-iframe")))
+
+    def _skip_pages(self, content_type: int, pages_count: int) -> None:
+        """
+        Moves forward without capturing pages
+        :param content_type: CONTENT_TYPE_SCORM_PRESENTATION, CONTENT_TYPE_SCORM_BOOK or CONTENT_TYPE_H5P_PRESENTATION
+        :param pages_count: How many pages to skip
+        :return:
+        """
+        logging.info("Skipping {} pages".format(pages_count))
+        for _ in range(pages_count):
+            if not self._next_page(content_type):
+                raise Exception("Content has less pages than expected! Try to download it without resuming")
 
+    def _next_page(self, content_type: int) -> bool:
+        """
+        Clicks next button and waits for the next page
+        :param content_type: CONTENT_TYPE_SCORM_PRESENTATION, CONTENT_TYPE_SCORM_BOOK or CONTENT_TYPE_H5P_PRESENTATION
+        :return: False if current page is the last one
+        """
+        from selenium.webdriver.common.by import By
+
+        with self._stage("next_page"):
             # Find next button
             next_slide_btn = None
             if content_type == CONTENT_TYPE_SCORM_PRESENTATION:
@@ -255,125 +1066,268 @@ class LMSDownloader:
                 next_slide_btn = self.browser.find_element(By.XPATH, next_slide_btn_xpath)
             elif content_type == CONTENT_TYPE_SCORM_BOOK:
                 next_slide_btn_xpath = "//button[@class='btn']/div[@class='icon next down']"
-                next_slide_btn = self.browser.find_element(By.XPATH, next_slide_btn_xpath).find_element(By.XPATH,
-                                                                                                        "./..")
+                next_slide_btn = self.browser.find_element(By.XPATH, next_slide_btn_xpath) \
+                    .find_element(By.XPATH, "./..")
             elif content_type == CONTENT_TYPE_H5P_PRESENTATION:
                 next_slide_btn_xpath = "//div[@class='h5p-footer-button h5p-footer-next-slide']"
                 next_slide_btn = self.browser.find_element(By.XPATH, next_slide_btn_xpath)
 
-            # Finish or next
+            # Last page
             if not next_slide_btn.is_enabled() or next_slide_btn.get_attribute("aria-disabled") == "true":
-                logging.info("Downloading done")
-                break
-            else:
-                logging.info("Moving to the next slide and waiting {:.2f} seconds".format(self._wait_between_pages))
-                next_slide_btn.click()
-                time.sleep(self._wait_between_pages)
+                return False
 
-            # Increment counter
-            page_counter += 1
+            logging.info("Moving to the next slide and waiting {}{:.2f} seconds"
+                         .format("up to " if self._adaptive_wait else "", self._wait_between_pages))
+            self._mark_page()
+            next_slide_btn.click()
+            self._wait(self._wait_between_pages, expect_change=True)
+            self._collect_network()
+            return True
 
-        downloaded_paths = []
+    def _stage(self, name: str, **labels) -> ContextManager[None]:
+        """
+        Measures duration of the download stage (see Metrics.stage())
+        :param name: Stage name
+        :param labels: Additional info for metrics callbacks (current link is added automatically)
+        :return: Context manager
+        """
+        labels.setdefault("link", self._current_link)
+        return self.metrics.stage(name, **labels)
 
-        # Extract text for SCORM book
-        if content_type == CONTENT_TYPE_SCORM_BOOK:
-            logging.info("Extracting text")
-            soup = BeautifulSoup(self.browser.page_source, "html.parser")
-            text = soup.get_text("\n")
-            txt_file_path = os.path.join(save_to_directory, self.browser.title + ".txt")
-            with open(txt_file_path, "w", encoding="utf-8") as txt_file:
-                logging.info("Saving text as {}".format(txt_file_path))
-                txt_file.write(text)
-                downloaded_paths.append(txt_file_path)
-
-        # Merge them
-        logging.info("Merging PDF files")
-        merger = PdfMerger()
-        for filename in pdfs:
-            pdf_file = open(filename, "rb")
-            merger.append(PdfReader(pdf_file))
-            pdf_file.close()
-        pdf_file_path = os.path.join(save_to_directory, self.browser.title + ".pdf")
-        logging.info("Saving final PDF as {}".format(pdf_file_path))
-        merger.write(pdf_file_path)
-        downloaded_paths.append(pdf_file_path)
-        merger.close()
-
-        # Delete temp dir
-        logging.info("Cleaning up temp files")
-        temp_dir.cleanup()
-
-        # Exit and close broser
-        logging.info("Exiting browser")
-        self.browser.quit()
+    def _count(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increments metrics counter (see Metrics.count())
+        :param name: Counter name
+        :param value: Increment
+        :param labels: Additional info for metrics callbacks (current link is added automatically)
+        :return:
+        """
+        labels.setdefault("link", self._current_link)
+        self.metrics.count(name, value, **labels)
 
-        # Done!
-        logging.info("Done!")
-        return downloaded_paths
+    def _count_retries(self, retries: int) -> None:
+        """
+        Adds retries of HTTPSession requests into metrics counters (called from HTTPSession threads)
+        :param retries: Number of retries of one request
+        :return:
+        """
+        self._count("retries", retries)
+
+    def _collect_network(self) -> None:
+        """
+        Drains browser's performance log (called after each page so it doesn't grow) and adds
+        network stats into metrics counters
+        :return:
+        """
+        if self.network_monitor is None or not self.network_monitor.collect_stats:
+            return
+        for name, value in self.network_monitor.collect(self.browser).items():
+            if value:
+                self._count("network_" + name, value)
+
+    def _mark_page(self) -> None:
+        """
+        Remembers page state before clicking something (used by adaptive wait)
+        :return:
+        """
+        if self._adaptive_wait:
+            self._page_waiter.mark()
+
+    def _wait(self, max_wait: float, expect_change: bool = False, quiet_period: Optional[float] = None) -> None:
+        """
+        Waits until page is ready (adaptive wait) or just sleeps for max_wait
+        :param max_wait: How long to wait (upper bound for adaptive wait)
+        :param expect_change: True to wait for the page to react on click since _mark_page()
+        :param quiet_period: How long page must be idle (adaptive wait only)
+        :return:
+        """
+        if self._adaptive_wait:
+            self._page_waiter.wait(max_wait, expect_change=expect_change, quiet_period=quiet_period)
+        else:
+            time.sleep(max_wait)
 
     def _login(self) -> None:
         """
         Logs in into LMS account
         :return:
         """
-        logging.info("Logging in...")
-        # Find elements
-        username_filed = self.browser.find_element(By.ID, "username")
-        password_filed = self.browser.find_element(By.ID, "password")
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.expected_conditions import presence_of_element_located
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        with self._stage("login"):
+            # Try to restore saved session first
+            if self._session_cache is not None and self._restore_session():
+                return
+
+            logging.info("Logging in...")
+            # Find elements
+            username_filed = self.browser.find_element(By.ID, "username")
+            password_filed = self.browser.find_element(By.ID, "password")
+
+            # Fill with login and password
+            username_filed.send_keys(self._lms_login)
+            password_filed.send_keys(self._lms_password)
+
+            # Click login button
+            login_button = self.browser.find_element(By.ID, "loginbtn")
+            login_button.click()
+
+            # Wait for usertext or loginerrors element to make sure page is loaded
+            WebDriverWait(self.browser, 60).until(expected_conditions.any_of(
+                presence_of_element_located((By.CLASS_NAME, "usertext")),
+                presence_of_element_located((By.CLASS_NAME, "loginerrors"))))
 
-        # Fill with login and password
-        username_filed.send_keys(self._lms_login)
-        password_filed.send_keys(self._lms_password)
+            # Check login
+            if self.browser.find_elements(By.CLASS_NAME, "loginerrors"):
+                raise Exception("Login error! Check login / password")
+            logging.info("Logged in successfully")
 
-        # Click login button
-        login_button = self.browser.find_element(By.ID, "loginbtn")
-        login_button.click()
+            # Save session for the next time
+            if self._session_cache is not None:
+                self._session_cache.save(self._lms_login, self._login_link, self.browser.get_cookies())
 
-        # Wait for usertext or loginerrors element to make sure page is loaded
+    def _restore_session(self) -> bool:
+        """
+        Injects saved session cookies and checks if session is still valid by reloading login page
+        :return: True if logged in, False if login form must be used (login page is opened in that case)
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.expected_conditions import presence_of_element_located
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        cookies = self._session_cache.load(self._lms_login, self._login_link)
+        if not cookies:
+            return False
+
+        logging.info("Restoring saved session")
+        for cookie in cookies:
+            try:
+                self.browser.add_cookie(cookie)
+            except Exception as e:
+                logging.warning("Error restoring cookie {}: {}".format(cookie.get("name"), e))
+
+        # Reload login page. Moodle shows usertext instead of login form if session is valid
+        self.browser.get(self._login_link)
         WebDriverWait(self.browser, 60).until(expected_conditions.any_of(
             presence_of_element_located((By.CLASS_NAME, "usertext")),
-            presence_of_element_located((By.CLASS_NAME, "loginerrors"))))
+            presence_of_element_located((By.ID, "loginbtn"))))
+        if self.browser.find_elements(By.CLASS_NAME, "usertext"):
+            logging.info("Logged in using saved session")
+            return True
 
-        # Check login
-        if self.browser.find_elements(By.CLASS_NAME, "loginerrors"):
-            raise Exception("Login error! Check login / password")
-        logging.info("Logged in successfully")
+        logging.info("Saved session is not valid anymore")
+        self._session_cache.invalidate(self._lms_login, self._login_link)
+        self._count("retries")
+        return False
 
     def _start_browser(self) -> None:
         """
-        Starts browser and opens login page
+        Starts browser and opens login page (or opens new tab in the existing browser if _debugger_address is set)
+        :return:
+        """
+        from selenium import webdriver
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.expected_conditions import presence_of_element_located
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        with self._stage("start_browser"):
+            if self._debugger_address is not None:
+                self._attach_browser()
+                return
+
+            logging.info("Starting browser{}... Please wait".format(" in headless mode" if self._headless else ""))
+            chrome_options = webdriver.ChromeOptions()
+            if self._headless:
+                chrome_options.add_argument("--headless=old")
+            chrome_options.add_argument(f"--user-agent={self._user_agent}")
+            chrome_options.add_argument(f"--window-size={self._window_size}")
+            # chrome_options.add_argument("--start-maximized")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+            chrome_options.add_argument("--disable-infobars")
+            chrome_options.add_argument("--disable-extensions")
+            chrome_options.add_argument("--ignore-ssl-errors=yes")
+            chrome_options.add_argument("--ignore-certificate-errors")
+            chrome_options.add_argument("--disable-default-apps")
+            chrome_options.add_argument("--disable-notifications")
+            chrome_options.add_argument("--disable-popup-window")
+            chrome_options.add_argument("--kiosk-printing")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-background-timer-throttling")
+            chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+            chrome_options.add_argument("--disable-renderer-backgrounding")
+            if self._browser_cache_dir:
+                chrome_options.add_argument("--disk-cache-dir={}".format(self._acquire_browser_cache()))
+            if self.network_monitor is not None:
+                self.network_monitor.setup_options(chrome_options)
+            chrome_options.add_experimental_option("prefs", {
+                "printing.print_preview_sticky_settings.appState": json.dumps(PRINT_SETTINGS),
+                "download.prompt_for_download": False,
+                "download.directory_upgrade": True,
+                "profile.default_content_setting_values.automatic_downloads": 1
+            })
+
+            # Start browser and open login link
+            try:
+                self.browser = webdriver.Chrome(options=chrome_options)
+            except Exception:
+                self._release_browser_cache()
+                raise
+            self._page_waiter = PageWaiter(self.browser)
+            if self.network_monitor is not None:
+                self.network_monitor.attach(self.browser)
+            logging.info("Loading {}".format(self._login_link))
+            self.browser.get(self._login_link)
+
+            # Wait for login button element to make sure page is loaded
+            WebDriverWait(self.browser, 60).until(presence_of_element_located((By.ID, "loginbtn")))
+            logging.info(self._login_link + " loaded successfully")
+
+    def _attach_browser(self) -> None:
+        """
+        Connects to the already started browser and opens new tab
         :return:
         """
-        logging.info("Starting browser{}... Please wait".format(" in headless mode" if self._headless else ""))
+        from selenium import webdriver
+
+        logging.info("Opening new tab in browser at {}".format(self._debugger_address))
         chrome_options = webdriver.ChromeOptions()
-        if self._headless:
-            chrome_options.add_argument("--headless=old")
-        chrome_options.add_argument(f"--user-agent={self._user_agent}")
-        chrome_options.add_argument(f"--window-size={self._window_size}")
-        # chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--disable-infobars")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--ignore-ssl-errors=yes")
-        chrome_options.add_argument("--ignore-certificate-errors")
-        chrome_options.add_argument("--disable-default-apps")
-        chrome_options.add_argument("--disable-notifications")
-        chrome_options.add_argument("--disable-popup-window")
-        chrome_options.add_argument("--kiosk-printing")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_experimental_option("prefs", {
-            "printing.print_preview_sticky_settings.appState": json.dumps(PRINT_SETTINGS),
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "profile.default_content_setting_values.automatic_downloads": 1
-        })
-
-        # Start browser and open login link
+        chrome_options.add_experimental_option("debuggerAddress", self._debugger_address)
+        if self.network_monitor is not None:
+            self.network_monitor.setup_options(chrome_options)
         self.browser = webdriver.Chrome(options=chrome_options)
-        logging.info("Loading {}".format(self._login_link))
-        self.browser.get(self._login_link)
+        self.browser.switch_to.new_window("tab")
+        self._page_waiter = PageWaiter(self.browser)
+        if self.network_monitor is not None:
+            self.network_monitor.attach(self.browser)
+
+    def _acquire_browser_cache(self) -> str:
+        """
+        Takes the first free subdir of browser_cache_dir (so parallel browsers don't share one, but the same
+        subdirs are reused on the next run)
+        :return: Path to the disk cache dir for the browser
+        """
+        with _browser_cache_slots_lock:
+            slot = 0
+            while slot in _browser_cache_slots:
+                slot += 1
+            _browser_cache_slots.add(slot)
+        self._browser_cache_slot = slot
+        cache_dir = os.path.abspath(os.path.join(self._browser_cache_dir, str(slot)))
+        os.makedirs(cache_dir, exist_ok=True)
+        logging.info("Using browser disk cache at {}".format(cache_dir))
+        return cache_dir
 
-        # Wait for login button element to make sure page is loaded
-        WebDriverWait(self.browser, 60).until(presence_of_element_located((By.ID, "loginbtn")))
-        logging.info(self._login_link + " loaded successfully")
+    def _release_browser_cache(self) -> None:
+        """
+        Frees subdir of browser_cache_dir taken by _acquire_browser_cache()
+        :return:
+        """
+        if self._browser_cache_slot is None:
+            return
+        with _browser_cache_slots_lock:
+            _browser_cache_slots.discard(self._browser_cache_slot)
+        self._browser_cache_slot = None
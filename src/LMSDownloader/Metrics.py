@@ -0,0 +1,144 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TextIO
+
+# Prefix of Prometheus metric names
+PROMETHEUS_PREFIX = "lmsdownloader"
+
+
+class Metrics:
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None) -> None:
+        """
+        Initializes Metrics class (collects timings of download stages and counters, passes each of them
+        to callbacks as soon as it's recorded and keeps totals for export)
+        :param callback: Will be called with each event:
+        {"type": "stage", "name": str, "duration": float, "time": float, ...labels} or
+        {"type": "counter", "name": str, "value": float, "time": float, ...labels}
+        """
+        self._lock = threading.Lock()
+        self._callbacks = [callback] if callback is not None else []
+        self.stages = {}
+        self.counters = {}
+
+    def add_callback(self, callback: Callable[[dict], None]) -> None:
+        """
+        Adds one more callback (see __init__())
+        :param callback: Will be called with each event
+        :return:
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    @contextmanager
+    def stage(self, name: str, **labels) -> Iterator[None]:
+        """
+        Measures duration of the code inside with block (it's recorded even if exception is raised)
+        :param name: Stage name (for example, "login")
+        :param labels: Additional info for callbacks (for example, link and page)
+        :return:
+        """
+        time_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - time_started, **labels)
+
+    def record(self, name: str, duration: float, **labels) -> None:
+        """
+        Records duration of the stage
+        :param name: Stage name
+        :param duration: Duration in seconds
+        :param labels: Additional info for callbacks
+        :return:
+        """
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "total": 0., "max": 0.})
+            stage["count"] += 1
+            stage["total"] += duration
+            stage["max"] = max(stage["max"], duration)
+        self._emit(dict(labels, type="stage", name=name, duration=duration))
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increments counter
+        :param name: Counter name (for example, "pages")
+        :param value: Increment
+        :param labels: Additional info for callbacks
+        :return:
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self._emit(dict(labels, type="counter", name=name, value=value))
+
+    def to_prometheus(self) -> str:
+        """
+        Formats totals using Prometheus text exposition format
+        :return: Metrics as text
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+            counters = dict(self.counters)
+
+        lines = ["# HELP {0}_stage_seconds Duration of download stages".format(PROMETHEUS_PREFIX),
+                 "# TYPE {0}_stage_seconds summary".format(PROMETHEUS_PREFIX)]
+        for name, stage in sorted(stages.items()):
+            lines.append("{}_stage_seconds_sum{{stage=\"{}\"}} {}".format(PROMETHEUS_PREFIX, name, stage["total"]))
+            lines.append("{}_stage_seconds_count{{stage=\"{}\"}} {}".format(PROMETHEUS_PREFIX, name, stage["count"]))
+        lines.append("# HELP {0}_stage_seconds_max Max duration of download stages".format(PROMETHEUS_PREFIX))
+        lines.append("# TYPE {0}_stage_seconds_max gauge".format(PROMETHEUS_PREFIX))
+        for name, stage in sorted(stages.items()):
+            lines.append("{}_stage_seconds_max{{stage=\"{}\"}} {}".format(PROMETHEUS_PREFIX, name, stage["max"]))
+        for name, value in sorted(counters.items()):
+            lines.append("# TYPE {}_{}_total counter".format(PROMETHEUS_PREFIX, name))
+            lines.append("{}_{}_total {}".format(PROMETHEUS_PREFIX, name, value))
+        return "\n".join(lines) + "\n"
+
+    def _emit(self, event: dict) -> None:
+        """
+        Passes event to callbacks
+        :param event: Stage or counter event
+        :return:
+        """
+        event["time"] = time.time()
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(event)
+
+
+def jsonl_writer(file: TextIO) -> Callable[[dict], None]:
+    """
+    Creates callback that writes each event into file as JSON line
+    :param file: Opened text file
+    :return: Callback for Metrics
+    """
+    lock = threading.Lock()
+
+    def _write(event: dict) -> None:
+        with lock:
+            file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            file.flush()
+
+    return _write
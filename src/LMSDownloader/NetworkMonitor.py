@@ -0,0 +1,138 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+import threading
+from typing import Optional
+
+# URL patterns (for Network.setBlockedURLs) of resources that are not needed for PDF and screenshots
+RESOURCE_TYPE_PATTERNS = {
+    "tracker": ["*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*", "*mc.yandex.ru/*",
+                "*connect.facebook.net/*", "*top-fwz1.mail.ru/*", "*vk.com/rtrg*"],
+    "font": ["*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*", "*.eot", "*.eot?*"],
+    "media": ["*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.mp3", "*.mp3?*", "*.ogg", "*.ogg?*", "*.m4a", "*.m4a?*",
+              "*.wav", "*.wav?*", "*.m3u8", "*.m3u8?*", "*.mpd", "*.mpd?*"],
+}
+
+
+class NetworkMonitor:
+    def __init__(self, blocked_urls: Optional[list[str]] = None,
+                 blocked_resource_types: Optional[list[str]] = None,
+                 collect_stats: bool = False) -> None:
+        """
+        Initializes NetworkMonitor class (blocks unneeded requests and counts requests that were blocked
+        or loaded from the disk cache using browser's performance log)
+        :param blocked_urls: URL patterns to block (* matches any characters)
+        :param blocked_resource_types: Types of resources to block (keys of RESOURCE_TYPE_PATTERNS)
+        :param collect_stats: Set True to enable performance log and count requests (collect() must be called
+        after each page, because browser keeps the log until it's read)
+        """
+        self.blocked_patterns = list(blocked_urls or [])
+        for resource_type in blocked_resource_types or []:
+            if resource_type not in RESOURCE_TYPE_PATTERNS:
+                raise Exception("Unknown resource type to block: {}! Supported types: {}"
+                                .format(resource_type, ", ".join(RESOURCE_TYPE_PATTERNS)))
+            self.blocked_patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+
+        self.collect_stats = collect_stats
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "received_bytes": 0, "blocked_requests": 0,
+                      "cached_requests": 0, "cached_bytes": 0}
+
+    def setup_options(self, chrome_options) -> None:
+        """
+        Enables performance log if stats are collected
+        :param chrome_options: webdriver.ChromeOptions of the browser (or tab) that will be started
+        :return:
+        """
+        if not self.collect_stats:
+            return
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def attach(self, browser) -> None:
+        """
+        Enables request blocking in the current tab
+        :param browser: Selenium webdriver
+        :return:
+        """
+        if not self.blocked_patterns:
+            return
+        logging.info("Blocking {} URL patterns".format(len(self.blocked_patterns)))
+        try:
+            browser.execute_cdp_cmd("Network.enable", {})
+            browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_patterns})
+        except Exception as e:
+            logging.warning("Unable to block requests: {}".format(e))
+
+    def snapshot(self) -> dict:
+        """
+        :return: Copy of current stats (subtract it from the later ones to get stats of the link)
+        """
+        with self._lock:
+            return dict(self.stats)
+
+    def collect(self, browser) -> dict:
+        """
+        Reads network events from the performance log and updates stats
+        (must be called after each page because the log is kept until it's read)
+        :param browser: Selenium webdriver
+        :return: Increments of stats since the previous call
+        """
+        increments = dict.fromkeys(self.stats, 0)
+        if not self.collect_stats:
+            return increments
+        try:
+            entries = browser.get_log("performance")
+        except Exception as e:
+            logging.warning("Unable to read performance log: {}".format(e))
+            return increments
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.requestWillBeSent":
+                increments["requests"] += 1
+
+            elif method == "Network.loadingFinished":
+                increments["received_bytes"] += int(params.get("encodedDataLength", 0))
+
+            # Blocked by Network.setBlockedURLs
+            elif method == "Network.loadingFailed" and params.get("blockedReason") == "inspector":
+                increments["blocked_requests"] += 1
+
+            # Loaded from the disk cache (size is taken from headers because nothing was received)
+            elif method == "Network.responseReceived" and params.get("response", {}).get("fromDiskCache"):
+                increments["cached_requests"] += 1
+                headers = {key.lower(): value for key, value in params["response"].get("headers", {}).items()}
+                try:
+                    increments["cached_bytes"] += int(headers.get("content-length", 0))
+                except ValueError:
+                    pass
+
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+        return increments
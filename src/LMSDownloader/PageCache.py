@@ -0,0 +1,178 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import logging
+import os
+import threading
+from typing import Optional
+
+# Hashes serialized DOM of the document and all same-origin iframes (SHA-256 if available, cyrb53 otherwise)
+_FINGERPRINT_SCRIPT = """
+const callback = arguments[arguments.length - 1];
+const parts = [];
+const walk = (doc) => {
+    if (!doc || !doc.documentElement) return;
+    parts.push(doc.documentElement.outerHTML);
+    for (const frame of doc.querySelectorAll("iframe, frame")) {
+        try { walk(frame.contentDocument); } catch (e) {}
+    }
+};
+walk(document);
+const text = parts.join("\\n");
+const cyrb53 = (str) => {
+    let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+    for (let i = 0; i < str.length; i++) {
+        const ch = str.charCodeAt(i);
+        h1 = Math.imul(h1 ^ ch, 2654435761);
+        h2 = Math.imul(h2 ^ ch, 1597334677);
+    }
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return "cyrb53-" + text.length + "-" + (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16);
+};
+if (window.crypto && window.crypto.subtle) {
+    window.crypto.subtle.digest("SHA-256", new TextEncoder().encode(text))
+        .then((digest) => callback(Array.from(new Uint8Array(digest))
+            .map((byte) => byte.toString(16).padStart(2, "0")).join("")))
+        .catch(() => callback(cyrb53(text)));
+} else {
+    callback(cyrb53(text));
+}
+"""
+
+
+def fingerprint(browser) -> Optional[str]:
+    """
+    Calculates fingerprint of the current page (hash of DOM of the currently selected frame and its iframes)
+    :param browser: Selenium webdriver
+    :return: Hash as string or None on error
+    """
+    try:
+        return browser.execute_async_script(_FINGERPRINT_SCRIPT)
+    except Exception as e:
+        logging.warning("Error calculating page fingerprint: {}".format(e))
+        return None
+
+
+class PageCache:
+    def __init__(self, cache_dir: str, max_size: int = 1024 * 1024 * 1024) -> None:
+        """
+        Initializes PageCache class (content-addressed on-disk cache of captured pages with LRU eviction)
+        :param cache_dir: Path to the dir where to store cached pages
+        :param max_size: Max total size (in bytes) of cached pages
+        """
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_saved": 0}
+
+        # Calculate current size
+        os.makedirs(self._cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """
+        Generates cache key from page fingerprint and everything else that affects captured page
+        :param parts: Fingerprint, content type, capture settings, etc.
+        :return: sha256 hex digest
+        """
+        return hashlib.sha256("\n".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Retrieves cached page and marks it as recently used
+        :param key: Key from make_key()
+        :return: PDF file as bytes or None if page is not in cache
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "rb") as file:
+                    pdf_data = file.read()
+                os.utime(path)
+            except FileNotFoundError:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(pdf_data)
+        return pdf_data
+
+    def put(self, key: str, pdf_data: bytes) -> None:
+        """
+        Saves page into the cache and evicts least recently used pages if cache is too big
+        :param key: Key from make_key()
+        :param pdf_data: PDF file as bytes
+        :return:
+        """
+        path = self._path(key)
+        with self._lock:
+            if os.path.exists(path):
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as file:
+                file.write(pdf_data)
+            os.replace(path + ".tmp", path)
+            self._size += len(pdf_data)
+
+            if self._size > self._max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Deletes least recently used pages until cache size is below 90% of max_size
+        :return:
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._size <= self._max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+                self.stats["evictions"] += 1
+            except FileNotFoundError:
+                pass
+        logging.info("Page cache evicted. Current size: {:.1f} MB".format(self._size / 1024 / 1024))
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        """
+        Lists all cached pages
+        :return: [(path, last used timestamp, size), ...]
+        """
+        entries = []
+        for directory, _, files in os.walk(self._cache_dir):
+            for file in files:
+                if file.endswith(".pdf"):
+                    path = os.path.join(directory, file)
+                    try:
+                        stat = os.stat(path)
+                        entries.append((path, stat.st_mtime, stat.st_size))
+                    except FileNotFoundError:
+                        pass
+        return entries
+
+    def _path(self, key: str) -> str:
+        """
+        :param key: Key from make_key()
+        :return: Path to the cached page
+        """
+        return os.path.join(self._cache_dir, key[:2], key + ".pdf")
@@ -0,0 +1,202 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import base64
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+from LMSDownloader.ImagePdf import compress_image, image_to_pdf
+from LMSDownloader.PdfAssembler import PdfAssembler
+from LMSDownloader.PdfPrinter import decode_pdf
+
+
+class PageProcessor:
+    def __init__(self, assembler: PdfAssembler, workers: int = 2, max_pending: int = 4, first_index: int = 0,
+                 page_callback: Optional[Callable[[int, bytes], None]] = None,
+                 image_quality: int = 0, image_scale: float = 1.) -> None:
+        """
+        Initializes PageProcessor class (decodes captured pages in background so browser
+        can move to the next page immediately, and passes them to the assembler in order)
+        :param assembler: PdfAssembler (or PageCollector) to append decoded pages to
+        :param workers: Number of background threads (decoding and PIL encoding release GIL)
+        :param max_pending: Max number of captured but not yet assembled pages (submit() blocks when reached)
+        :param first_index: Index of the first page that will be submitted (previous ones are already assembled)
+        :param page_callback: Will be called with page index and PDF data after page is assembled
+        :param image_quality: JPEG quality (1-100) to re-encode screenshots with. 0 to embed them losslessly
+        :param image_scale: Downscale factor of screenshots (works only with image_quality)
+        """
+        self._assembler = assembler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="LMSDownloader-page")
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._decoded = {}
+        self._next_index = first_index
+        self._page_callback = page_callback
+        self._image_quality = image_quality
+        self._image_scale = image_scale
+        self._error = None
+        self._error_raised = False
+        self._assembling = False
+
+    def submit_pdf(self, page_index: int, chunks: list[dict]) -> None:
+        """
+        Queues page printed by print_to_pdf(). Its chunks are decoded in background
+        :param page_index: Page number (starting from first_index, without gaps)
+        :param chunks: Result of print_to_pdf()
+        :return:
+        """
+        self._submit(page_index, decode_pdf, chunks)
+
+    def submit_image(self, page_index: int, image_base64: str) -> None:
+        """
+        Queues screenshot that must be converted into PDF
+        :param page_index: Page number (starting from first_index, without gaps)
+        :param image_base64: PNG screenshot as base64 string
+        :return:
+        """
+        self._submit(page_index, self._image_to_pdf, image_base64)
+
+    def submit_ready(self, page_index: int, pdf_data: bytes) -> None:
+        """
+        Queues page that doesn't need to be decoded (for example, from cache)
+        :param page_index: Page number (starting from first_index, without gaps)
+        :param pdf_data: PDF file as bytes
+        :return:
+        """
+        self._submit(page_index, bytes, pdf_data)
+
+    def finish(self) -> None:
+        """
+        Waits for all pages to be decoded and assembled
+        :return:
+        """
+        logging.info("Waiting for {} pages to be processed".format(len(self._futures)))
+        for future in self._futures:
+            future.result()
+        self._raise_error()
+
+    def close(self) -> None:
+        """
+        Waits for already submitted pages (so they are assembled even if capturing fails) and stops background
+        threads. Raises assembler or page callback error if it wasn't raised by finish() or submit()
+        :return:
+        """
+        self._executor.shutdown(wait=True)
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        """
+        Raises error of background threads (only once)
+        :return:
+        """
+        with self._lock:
+            error = self._error if not self._error_raised else None
+            self._error_raised = self._error is not None
+        if error is not None:
+            raise error
+
+    def _submit(self, page_index: int, function, data: Union[str, bytes, list]) -> None:
+        """
+        Submits job into the pool. Blocks if there are already max_pending pages in the queue
+        :param page_index: Page number
+        :param function: decode_pdf, _image_to_pdf or bytes
+        :param data: Printed chunks, base64 screenshot or PDF file as bytes
+        :return:
+        """
+        # Raise errors as early as possible
+        self._raise_error()
+
+        logging.info("Processing page {}".format(page_index + 1))
+        self._pending.acquire()
+        try:
+            future = self._executor.submit(self._process, page_index, function, data)
+        except Exception:
+            self._pending.release()
+            raise
+        self._futures.append(future)
+
+    def _image_to_pdf(self, image_base64: str) -> bytes:
+        """
+        Decodes screenshot and converts it into PDF page (optionally re-encoding it as JPEG)
+        :param image_base64: PNG image as base64 string
+        :return: PDF file as bytes
+        """
+        image_data = base64.b64decode(image_base64)
+        if not self._image_quality:
+            return image_to_pdf(image_data)
+
+        from PIL import Image
+        with Image.open(io.BytesIO(image_data)) as image:
+            page_size = image.size
+        return image_to_pdf(compress_image(image_data, self._image_quality, self._image_scale), page_size)
+
+    def _process(self, page_index: int, function, data: Union[str, bytes, list]) -> None:
+        """
+        Decodes page and passes decoded pages to the assembler in order (runs on the pool, so the submitting
+        thread never writes). Only one thread assembles pages at a time, others just leave their pages to it,
+        so the lock is never held while writing
+        :param page_index: Page number
+        :param function: decode_pdf, _image_to_pdf or bytes
+        :param data: Printed chunks, base64 screenshot or PDF file as bytes
+        :return:
+        """
+        try:
+            pdf_data = function(data) if self._error is None else None
+        except Exception as e:
+            with self._lock:
+                self._error = self._error or e
+            self._pending.release()
+            return
+
+        with self._lock:
+            if self._error is not None:
+                self._pending.release()
+                return
+
+            self._decoded[page_index] = pdf_data
+            if self._assembling:
+                return
+            self._assembling = True
+
+        while True:
+            with self._lock:
+                if self._error is not None or self._next_index not in self._decoded:
+                    self._assembling = False
+                    return
+                next_index = self._next_index
+                pdf_data = self._decoded.pop(next_index)
+
+            try:
+                self._assembler.add_page(pdf_data)
+                if self._page_callback is not None:
+                    self._page_callback(next_index, pdf_data)
+            except Exception as e:
+                with self._lock:
+                    self._error = e
+                    self._assembling = False
+                self._pending.release()
+                return
+
+            with self._lock:
+                self._next_index += 1
+            self._pending.release()
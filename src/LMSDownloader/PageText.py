@@ -0,0 +1,237 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import atexit
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, wait
+from typing import TYPE_CHECKING, Optional
+
+from LMSDownloader.TextIndex import TextIndex
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# Returns visible text of the currently selected frame and all its same-origin iframes
+_DOM_TEXT_SCRIPT = """
+const parts = [];
+const walk = (doc) => {
+    if (!doc || !doc.body) return;
+    parts.push(doc.body.innerText);
+    for (const frame of doc.querySelectorAll("iframe, frame")) {
+        try { walk(frame.contentDocument); } catch (e) {}
+    }
+};
+walk(document);
+return parts.join("\\n");
+"""
+
+# Max number of text extraction processes (pages are assembled one by one, so more of them would only idle)
+MAX_PROCESS_WORKERS = 2
+
+# Shared by all downloaders (text extraction is CPU-bound, so one pool per process is enough)
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def dom_text(browser) -> str:
+    """
+    Retrieves visible text of the current page
+    :param browser: Selenium webdriver (script will be executed in the currently selected frame)
+    :return: Text or empty string on error
+    """
+    try:
+        return browser.execute_script(_DOM_TEXT_SCRIPT) or ""
+    except Exception as e:
+        logging.warning("Error retrieving page text: {}".format(e))
+        return ""
+
+
+def pdf_text(pdf_data: bytes) -> str:
+    """
+    Extracts text layer of PDF file (runs inside the process pool)
+    :param pdf_data: PDF file as bytes
+    :return: Text of all pages
+    """
+    from PyPDF2 import PdfReader
+
+    return "\n".join(page.extract_text() for page in PdfReader(io.BytesIO(pdf_data)).pages)
+
+
+def shutdown_process_pool() -> None:
+    """
+    Stops text extraction processes (called at exit). Pool will be started again if it's needed after that
+    :return:
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
+            atexit.unregister(shutdown_process_pool)
+
+
+def _get_process_pool() -> "ProcessPoolExecutor":
+    """
+    Creates process pool on the first call. Workers are spawned, so scripts that extract text must start
+    downloading under if __name__ == "__main__":
+    :return: ProcessPoolExecutor
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Spawn workers instead of forking process with running threads
+            _process_pool = ProcessPoolExecutor(max_workers=min(MAX_PROCESS_WORKERS, os.cpu_count() or 1),
+                                                mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown_process_pool)
+        return _process_pool
+
+
+class PageText:
+    def __init__(self, txt_file_path: Optional[str], text_index: Optional[TextIndex] = None,
+                 course: str = "", module: str = "", title: str = "", file: str = "", first_index: int = 0) -> None:
+        """
+        Initializes PageText class (collects text of each page from the page itself and from its PDF,
+        extracted on a process pool, and appends it to the TXT file and text index in page order)
+        :param txt_file_path: Path to the output TXT file. None to write only into text index
+        :param text_index: TextIndex to add pages into (module's old pages will be deleted). None to disable
+        :param course: Course link (text index key)
+        :param module: Module link (text index key)
+        :param title: Module title
+        :param file: Path to the downloaded file without extension
+        :param first_index: Index of the first page that will be added
+        """
+        self._txt_file_path = txt_file_path
+        self._text_index = text_index
+        self._course = course
+        self._module = module
+        self._title = title
+        self._file = file
+
+        self._lock = threading.Lock()
+        self._dom_texts = {}
+        self._futures = {}
+        self._next_index = first_index
+        self._aborted = False
+        self.pages_count = 0
+
+        # File is opened only to append pages, so nothing has to be closed if download fails
+        if self._txt_file_path:
+            open(self._txt_file_path, "w", encoding="utf-8").close()
+
+        if self._text_index is not None:
+            self._text_index.clear(course, module)
+
+    def add_dom_text(self, page_index: int, text: str) -> None:
+        """
+        Stores text of the visited page (must be called before add_pdf() of the same page)
+        :param page_index: Page number (starting from first_index)
+        :param text: Result of dom_text()
+        :return:
+        """
+        with self._lock:
+            self._dom_texts[page_index] = text
+
+    def add_pdf(self, page_index: int, pdf_data: bytes) -> None:
+        """
+        Queues text extraction of the assembled page
+        :param page_index: Page number (starting from first_index, without gaps)
+        :param pdf_data: PDF file as bytes
+        :return:
+        """
+        future = _get_process_pool().submit(pdf_text, pdf_data)
+        with self._lock:
+            self._futures[page_index] = future
+        future.add_done_callback(self._on_done)
+
+    def close(self) -> Optional[str]:
+        """
+        Waits for all pages and writes them
+        :return: Path to the TXT file or None if it's not written or pages have no text
+        """
+        with self._lock:
+            futures = list(self._futures.values())
+        wait(futures)
+        self._write_ready()
+
+        # Don't leave empty file if pages have no text (for example, images only)
+        if not self._txt_file_path or self._aborted:
+            return None
+        if self.pages_count == 0:
+            os.remove(self._txt_file_path)
+            return None
+        return self._txt_file_path
+
+    def abort(self) -> None:
+        """
+        Stops writing pages (after download error), deletes the TXT file and module's pages in text index
+        :return:
+        """
+        with self._lock:
+            self._aborted = True
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+            if self._txt_file_path and os.path.exists(self._txt_file_path):
+                os.remove(self._txt_file_path)
+            if self._text_index is not None:
+                self._text_index.clear(self._course, self._module)
+
+    def _on_done(self, _: Future) -> None:
+        try:
+            self._write_ready()
+        except Exception as e:
+            logging.error("Error writing page text", exc_info=e)
+
+    def _write_ready(self) -> None:
+        """
+        Writes extracted pages in order
+        :return:
+        """
+        with self._lock:
+            if self._aborted:
+                return
+            texts = []
+            while self._next_index in self._futures and self._futures[self._next_index].done():
+                future = self._futures.pop(self._next_index)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logging.warning("Error extracting text of page {}: {}".format(self._next_index + 1, e))
+                    text = ""
+
+                # Printed pages have text layer, screenshots have only text of the page itself
+                text = text.strip() or self._dom_texts.pop(self._next_index, "").strip()
+                self._dom_texts.pop(self._next_index, None)
+                if text:
+                    texts.append(text)
+                    self.pages_count += 1
+                    if self._text_index is not None:
+                        self._text_index.add_page(self._course, self._module, self._next_index + 1, self._title,
+                                                  self._file, text)
+                self._next_index += 1
+
+            if texts and self._txt_file_path:
+                with open(self._txt_file_path, "a", encoding="utf-8") as txt_file:
+                    txt_file.write("".join(text + "\n\n" for text in texts))
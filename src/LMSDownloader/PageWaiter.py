@@ -0,0 +1,132 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import logging
+import time
+from typing import Optional
+
+# Installs MutationObserver into the current document and all same-origin iframes (can be called multiple times)
+_INSTALL_SCRIPT = """
+const state = window.__lmsDownloaderWaiter || (window.__lmsDownloaderWaiter = {
+    lastChange: performance.now(),
+    mutations: 0,
+    resources: -1,
+    observed: new WeakSet()
+});
+const onMutation = () => { state.lastChange = performance.now(); state.mutations++; };
+const observe = (doc) => {
+    if (!doc || state.observed.has(doc)) return;
+    state.observed.add(doc);
+    new MutationObserver(onMutation).observe(doc, {subtree: true, childList: true, attributes: true,
+                                                   characterData: true});
+};
+const walk = (doc) => {
+    observe(doc);
+    for (const frame of doc.querySelectorAll("iframe, frame")) {
+        try { walk(frame.contentDocument); } catch (e) {}
+    }
+};
+walk(document);
+"""
+
+# Returns current readiness state of the document and all same-origin iframes
+_STATE_SCRIPT = _INSTALL_SCRIPT + """
+let complete = true, pendingImages = 0, resources = 0;
+const check = (doc) => {
+    if (!doc) return;
+    if (doc.readyState !== "complete") complete = false;
+    for (const image of doc.images) if (!image.complete) pendingImages++;
+    try { resources += doc.defaultView.performance.getEntriesByType("resource").length; } catch (e) {}
+    for (const frame of doc.querySelectorAll("iframe, frame")) {
+        try { check(frame.contentDocument); } catch (e) {}
+    }
+};
+check(document);
+
+// Treat new network requests as changes too
+if (resources !== state.resources) {
+    state.resources = resources;
+    state.lastChange = performance.now();
+}
+return {complete: complete, pendingImages: pendingImages, mutations: state.mutations,
+        quietFor: (performance.now() - state.lastChange) / 1000};
+"""
+
+
+class PageWaiter:
+    def __init__(self, browser, quiet_period: float = 0.3, poll_interval: float = 0.1) -> None:
+        """
+        Initializes PageWaiter class (waits until page stops changing instead of fixed sleeps)
+        :param browser: Selenium webdriver (script will be executed in the currently selected frame)
+        :param quiet_period: How long (in seconds) DOM and network must be idle to consider page ready
+        :param poll_interval: How often (in seconds) to check page state
+        """
+        self._browser = browser
+        self._quiet_period = quiet_period
+        self._poll_interval = poll_interval
+        self._mutations_mark = 0
+
+    def mark(self) -> None:
+        """
+        Remembers current number of DOM mutations. Call it before clicking something
+        to make wait(expect_change=True) wait for the page to react
+        :return:
+        """
+        state = self._get_state()
+        self._mutations_mark = state["mutations"] if state else 0
+
+    def wait(self, max_wait: float, expect_change: bool = False, quiet_period: Optional[float] = None) -> float:
+        """
+        Waits until page is loaded and DOM and network are idle for quiet_period
+        :param max_wait: Hard upper bound (in seconds)
+        :param expect_change: True to wait for at least one DOM mutation since mark()
+        :param quiet_period: Overrides quiet_period from __init__
+        :return: How long (in seconds) it actually waited
+        """
+        if quiet_period is None:
+            quiet_period = self._quiet_period
+        time_started = time.time()
+        while True:
+            waited = time.time() - time_started
+            if waited >= max_wait:
+                logging.debug("Page is not idle after {:.2f}s".format(waited))
+                return waited
+
+            state = self._get_state()
+            if state is not None \
+                    and state["complete"] \
+                    and state["pendingImages"] == 0 \
+                    and state["quietFor"] >= quiet_period \
+                    and (not expect_change or state["mutations"] != self._mutations_mark):
+                logging.debug("Page is ready after {:.2f}s".format(waited))
+                return waited
+
+            time.sleep(min(self._poll_interval, max(max_wait - waited, 0)))
+
+    def _get_state(self) -> Optional[dict]:
+        """
+        Installs observers (if needed) and retrieves page state
+        :return: {"complete": bool, "pendingImages": int, "mutations": int, "quietFor": float} or None on error
+        """
+        try:
+            return self._browser.execute_script(_STATE_SCRIPT)
+        except Exception as e:
+            # Page can be in the middle of navigation
+            logging.debug("Error retrieving page state: {}".format(e))
+            return None
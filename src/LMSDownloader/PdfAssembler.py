@@ -0,0 +1,283 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+# Object IDs reserved for the page tree root and the catalog of each volume
+_PAGES_ID = 1
+_CATALOG_ID = 2
+
+
+class PdfAssembler:
+    def __init__(self, file_path_base: str, max_volume_size: int = 0) -> None:
+        """
+        Initializes PdfAssembler class (appends pages into the output PDF as soon as they're captured).
+        Objects of each page are written to disk immediately, so memory usage doesn't grow with the number of pages
+        :param file_path_base: Path to the output PDF without extension
+        :param max_volume_size: Max size (in bytes) of one output file. 0 to save everything into one file
+        """
+        self._file_path_base = file_path_base
+        self._max_volume_size = max_volume_size
+
+        self._lock = threading.Lock()
+        self._volume = None
+        self._volume_paths = []
+        self.pages_count = 0
+
+    def add_page(self, pdf_data: bytes) -> None:
+        """
+        Appends all pages of PDF file to the current volume. Starts new volume if the current one is too big
+        :param pdf_data: PDF file as bytes
+        :return:
+        """
+        from PyPDF2 import PdfReader
+
+        with self._lock:
+            # Finish current volume
+            if self._volume is not None \
+                    and self._max_volume_size > 0 \
+                    and self._volume.size + len(pdf_data) > self._max_volume_size:
+                self._finish_volume()
+
+            if self._volume is None:
+                if self._max_volume_size > 0:
+                    file_path = "{} ({}).pdf".format(self._file_path_base, len(self._volume_paths) + 1)
+                else:
+                    file_path = self._file_path_base + ".pdf"
+                self._volume = _StreamingPdfWriter(file_path)
+
+            reader = PdfReader(io.BytesIO(pdf_data))
+            for page in reader.pages:
+                self._volume.add_page(reader, page)
+            self.pages_count += 1
+
+    def close(self) -> list[str]:
+        """
+        Writes the last volume
+        :return: Paths to the output files
+        """
+        with self._lock:
+            if self._volume is not None:
+                self._finish_volume()
+
+            # Don't number the only volume
+            if len(self._volume_paths) == 1 and self._max_volume_size > 0:
+                file_path = self._file_path_base + ".pdf"
+                os.replace(self._volume_paths[0], file_path)
+                self._volume_paths[0] = file_path
+            return self._volume_paths
+
+    def abort(self) -> None:
+        """
+        Closes and deletes the unfinished volume (after download error). Finished volumes are kept
+        :return:
+        """
+        with self._lock:
+            if self._volume is not None:
+                logging.info("Deleting unfinished {}".format(self._volume.file_path))
+                self._volume.abort()
+                self._volume = None
+
+    def _finish_volume(self) -> None:
+        """
+        Writes page tree and cross-reference table of the current volume and closes it
+        :return:
+        """
+        logging.info("Saving final PDF as {}".format(self._volume.file_path))
+        self._volume.close()
+        self._volume_paths.append(self._volume.file_path)
+        self._volume = None
+
+
+class _StreamingPdfWriter:
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes _StreamingPdfWriter class (writes objects of each added page into the file right away and keeps
+        only their offsets. The file is written as file_path.part and renamed after close())
+        :param file_path: Path to the output PDF
+        """
+        self.file_path = file_path
+        self._file = open(file_path + ".part", "wb")
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets = {}
+        self._next_id = _CATALOG_ID + 1
+        self._page_ids = []
+
+    @property
+    def size(self) -> int:
+        """
+        :return: Number of bytes written so far
+        """
+        return self._file.tell()
+
+    def add_page(self, reader, page) -> None:
+        """
+        Copies page with all objects it references
+        :param reader: PdfReader of the source file
+        :param page: Page of the source file
+        :return:
+        """
+        from PyPDF2.generic import NameObject, NullObject
+
+        # Source object ID -> output object ID (objects shared by pages of the same source are written once)
+        id_map = {}
+        pending = []
+
+        def _allocate(source_id: Optional[tuple]) -> int:
+            object_id = self._next_id
+            self._next_id += 1
+            if source_id is not None:
+                id_map[source_id] = object_id
+            return object_id
+
+        def _resolve(reference) -> object:
+            source_id = (reference.idnum, reference.generation)
+            if source_id not in id_map:
+                target = reference.get_object()
+
+                # Don't follow links to other pages' tree
+                if isinstance(target, dict) and target.get("/Type") == "/Pages":
+                    return NullObject()
+                pending.append((_allocate(source_id), target))
+            return _reference(id_map[source_id])
+
+        page_reference = page.indirect_reference
+        page_id = _allocate((page_reference.idnum, page_reference.generation) if page_reference is not None else None)
+        page_copy = _copy_object(page, _resolve)
+        page_copy[NameObject("/Parent")] = _reference(_PAGES_ID)
+        self._write_object(page_id, page_copy)
+        self._page_ids.append(page_id)
+
+        while pending:
+            object_id, source_object = pending.pop()
+            object_copy = _copy_object(source_object, _resolve)
+
+            # Pages that are only referenced (for example, by link annotations) are not part of this page tree
+            if isinstance(object_copy, dict) and object_copy.get("/Type") == "/Page":
+                object_copy.pop("/Parent", None)
+            self._write_object(object_id, object_copy)
+
+    def close(self) -> None:
+        """
+        Writes page tree, catalog, cross-reference table and trailer and renames the file
+        :return:
+        """
+        from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+
+        self._write_object(_PAGES_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(_reference(page_id) for page_id in self._page_ids),
+            NameObject("/Count"): NumberObject(len(self._page_ids))
+        }))
+        self._write_object(_CATALOG_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): _reference(_PAGES_ID)
+        }))
+
+        # Cross-reference table (objects that were allocated but not written are marked as free)
+        xref_offset = self._file.tell()
+        self._file.write("xref\n0 {}\n0000000000 65535 f \n".format(self._next_id).encode("ascii"))
+        for object_id in range(1, self._next_id):
+            if object_id in self._offsets:
+                self._file.write("{:010d} 00000 n \n".format(self._offsets[object_id]).encode("ascii"))
+            else:
+                self._file.write(b"0000000000 00000 f \n")
+        self._file.write("trailer\n<< /Size {} /Root {} 0 R >>\nstartxref\n{}\n%%EOF\n"
+                         .format(self._next_id, _CATALOG_ID, xref_offset).encode("ascii"))
+        self._file.close()
+        os.replace(self.file_path + ".part", self.file_path)
+
+    def abort(self) -> None:
+        """
+        Closes and deletes the unfinished file
+        :return:
+        """
+        self._file.close()
+        try:
+            os.remove(self.file_path + ".part")
+        except OSError:
+            pass
+
+    def _write_object(self, object_id: int, pdf_object) -> None:
+        """
+        Writes indirect object
+        :param object_id: Output object ID
+        :param pdf_object: Object with already remapped references
+        :return:
+        """
+        self._offsets[object_id] = self._file.tell()
+        self._file.write("{} 0 obj\n".format(object_id).encode("ascii"))
+        pdf_object.write_to_stream(self._file, None)
+        self._file.write(b"\nendobj\n")
+
+
+def _reference(object_id: int):
+    """
+    :param object_id: Output object ID
+    :return: IndirectObject pointing to it
+    """
+    from PyPDF2.generic import IndirectObject
+
+    return IndirectObject(object_id, 0, None)
+
+
+def _copy_object(pdf_object, resolve: Callable):
+    """
+    Copies direct object replacing references using resolve()
+    :param pdf_object: Source object
+    :param resolve: Function that takes source IndirectObject and returns the object to write instead of it
+    :return: Copied object
+    """
+    from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+    if isinstance(pdf_object, IndirectObject):
+        return resolve(pdf_object)
+    if isinstance(pdf_object, StreamObject):
+        # Stream length is written by StreamObject itself
+        stream_copy = pdf_object.__class__()
+        stream_copy._data = pdf_object._data
+        for key, value in pdf_object.items():
+            if key != "/Length":
+                stream_copy[NameObject(key)] = _copy_object(value, resolve)
+        return stream_copy
+    if isinstance(pdf_object, DictionaryObject):
+        return DictionaryObject({NameObject(key): _copy_object(value, resolve) for key, value in pdf_object.items()})
+    if isinstance(pdf_object, ArrayObject):
+        return ArrayObject(_copy_object(value, resolve) for value in pdf_object)
+    return pdf_object
+
+
+class PageCollector:
+    def __init__(self) -> None:
+        """
+        Initializes PageCollector class (keeps pages in memory to assemble them later, for example, from shards)
+        """
+        self.pages = []
+
+    def add_page(self, pdf_data: bytes) -> None:
+        """
+        Stores page
+        :param pdf_data: PDF file as bytes
+        :return:
+        """
+        self.pages.append(pdf_data)
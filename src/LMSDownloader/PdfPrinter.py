@@ -0,0 +1,72 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import base64
+import logging
+
+# Max size of each chunk read from the browser (in bytes)
+CHUNK_SIZE = 1024 * 1024
+
+
+def print_to_pdf(browser, print_settings: dict, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """
+    Prints current page into PDF using Page.printToPDF in stream mode and reads it by chunks (IO.read).
+    Chunks are returned as they arrived, so they can be decoded by decode_pdf() in background
+    while the browser moves to the next page (all webdriver calls stay on the calling thread)
+    :param browser: Selenium webdriver
+    :param print_settings: Page.printToPDF settings
+    :param chunk_size: Max size of each chunk (in bytes)
+    :return: IO.read responses ({"data": str, "base64Encoded": bool})
+    """
+    try:
+        printed = browser.execute_cdp_cmd("Page.printToPDF", dict(print_settings, transferMode="ReturnAsStream"))
+        stream_handle = printed.get("stream")
+    except Exception as e:
+        logging.warning("Unable to print in stream mode: {}".format(e))
+        stream_handle = None
+
+    # Old browsers don't support stream mode
+    if stream_handle is None:
+        return [{"data": browser.execute_cdp_cmd("Page.printToPDF", print_settings)["data"], "base64Encoded": True}]
+
+    chunks = []
+    try:
+        while True:
+            chunk = browser.execute_cdp_cmd("IO.read", {"handle": stream_handle, "size": chunk_size})
+            if chunk.get("data"):
+                chunks.append({"data": chunk["data"], "base64Encoded": chunk.get("base64Encoded", False)})
+            if chunk.get("eof"):
+                break
+    finally:
+        try:
+            browser.execute_cdp_cmd("IO.close", {"handle": stream_handle})
+        except Exception as e:
+            logging.warning("Unable to close PDF stream: {}".format(e))
+    return chunks
+
+
+def decode_pdf(chunks: list[dict]) -> bytes:
+    """
+    Decodes chunks read by print_to_pdf() (doesn't use browser, so it can run in any thread)
+    :param chunks: Result of print_to_pdf()
+    :return: PDF file as bytes
+    """
+    return b"".join(base64.b64decode(chunk["data"]) if chunk["base64Encoded"] else chunk["data"].encode("latin-1")
+                    for chunk in chunks)
@@ -0,0 +1,140 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Optional
+from urllib.parse import urljoin
+
+from LMSDownloader.HTTPSession import HTTPSession
+
+# Moodle serves unpacked SCORM packages from this dir
+PACKAGE_ROOT_REGEX = r"(https?:[^\"'\s]*?/mod_scorm/content/\d+/)"
+
+# Slide images exported by presentation converters (slide1.png, slides/slide_02.jpg, etc.)
+SLIDE_IMAGE_REGEX = r"(?:^|/)slides?[_\-]?(\d+)\.(?:png|jpe?g)$"
+
+
+class ScormPackage:
+    def __init__(self, root_url: str, manifest_xml: bytes) -> None:
+        """
+        Initializes ScormPackage class (parses imsmanifest.xml)
+        :param root_url: URL of the package root dir (with trailing slash)
+        :param manifest_xml: Content of imsmanifest.xml
+        """
+        self.root_url = root_url
+        self.sco_urls = []
+        self.file_urls = []
+
+        manifest = ElementTree.fromstring(manifest_xml)
+
+        # Collect resources
+        resources = {}
+        for resource in _find_all(manifest, "resource"):
+            base = urljoin(root_url, _xml_base(resource))
+            if resource.get("href"):
+                resources[resource.get("identifier")] = urljoin(base, resource.get("href"))
+            for file in _find_all(resource, "file"):
+                if file.get("href"):
+                    file_url = urljoin(base, file.get("href"))
+                    if file_url not in self.file_urls:
+                        self.file_urls.append(file_url)
+
+        # Launchable items in the default organization's order
+        organizations = next(iter(_find_all(manifest, "organizations")), None)
+        organization = None
+        if organizations is not None:
+            default_organization = organizations.get("default")
+            for organization_ in _find_all(organizations, "organization"):
+                if organization is None or organization_.get("identifier") == default_organization:
+                    organization = organization_
+        if organization is not None:
+            for item in _find_all(organization, "item"):
+                sco_url = resources.get(item.get("identifierref"))
+                if sco_url and sco_url not in self.sco_urls:
+                    self.sco_urls.append(sco_url)
+
+        logging.info("SCORM package has {} launchable items and {} files"
+                     .format(len(self.sco_urls), len(self.file_urls)))
+
+    @classmethod
+    def open(cls, http_session: HTTPSession, player_url: str) -> Optional["ScormPackage"]:
+        """
+        Finds package root using player's URL and downloads imsmanifest.xml
+        :param http_session: Authenticated HTTPSession
+        :param player_url: URL of the scorm_object iframe (loadSCO.php or package's file)
+        :return: ScormPackage or None if package root not found
+        """
+        root_url = find_package_root(http_session, player_url)
+        if root_url is None:
+            logging.info("SCORM package root not found")
+            return None
+        logging.info("Downloading {}".format(urljoin(root_url, "imsmanifest.xml")))
+        return cls(root_url, http_session.get(urljoin(root_url, "imsmanifest.xml")))
+
+    def slide_image_urls(self) -> list[str]:
+        """
+        Finds pre-rendered slide images
+        :return: URLs of slide images ordered by slide number
+        """
+        slides = {}
+        for file_url in self.file_urls:
+            # Skip files outside of the package (absolute hrefs to other sites)
+            if not file_url.startswith(self.root_url):
+                continue
+            match = re.search(SLIDE_IMAGE_REGEX, file_url[len(self.root_url):], re.IGNORECASE)
+            if match:
+                slides.setdefault(int(match.group(1)), file_url)
+        return [slides[slide_number] for slide_number in sorted(slides)]
+
+
+def find_package_root(http_session: HTTPSession, player_url: str) -> Optional[str]:
+    """
+    Finds SCORM package root dir
+    :param http_session: Authenticated HTTPSession
+    :param player_url: URL of the scorm_object iframe (loadSCO.php or package's file)
+    :return: URL of the package root dir (with trailing slash) or None if not found
+    """
+    match = re.search(PACKAGE_ROOT_REGEX, player_url)
+    if match:
+        return match.group(1)
+
+    # loadSCO.php redirects to the package using JS
+    html = http_session.get(player_url).decode("utf-8", errors="ignore").replace("\\/", "/")
+    match = re.search(PACKAGE_ROOT_REGEX, html)
+    return match.group(1) if match else None
+
+
+def _find_all(element: ElementTree.Element, tag: str) -> list[ElementTree.Element]:
+    """
+    Finds all descendants by tag name ignoring namespaces (manifests use different SCORM / IMS versions)
+    :param element: Where to search
+    :param tag: Tag name without namespace
+    :return: Found elements in document order
+    """
+    return [child for child in element.iter() if child is not element and child.tag.rsplit("}", 1)[-1] == tag]
+
+
+def _xml_base(element: ElementTree.Element) -> str:
+    """
+    :param element: XML element
+    :return: xml:base attribute or empty string
+    """
+    return element.get("{http://www.w3.org/XML/1998/namespace}base", "")
@@ -0,0 +1,61 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+
+# Calculates element's rectangle in the top-level document (adding offsets of all parent frames)
+_ELEMENT_RECT_SCRIPT = """
+const rect = arguments[0].getBoundingClientRect();
+let x = rect.left, y = rect.top;
+let view = window;
+while (view.frameElement) {
+    const frame = view.frameElement;
+    const frameRect = frame.getBoundingClientRect();
+    x += frameRect.left + frame.clientLeft;
+    y += frameRect.top + frame.clientTop;
+    view = view.parent;
+}
+return {x: x + view.scrollX, y: y + view.scrollY, width: rect.width, height: rect.height};
+"""
+
+
+def capture_element(browser, element) -> str:
+    """
+    Takes PNG screenshot of the element using Page.captureScreenshot with a clip rectangle
+    (without scrolling and saving screenshot of the whole viewport)
+    :param browser: Selenium webdriver (switched to the element's frame)
+    :param element: WebElement to capture
+    :return: PNG image as base64 string
+    """
+    try:
+        rect = browser.execute_script(_ELEMENT_RECT_SCRIPT, element)
+        if rect["width"] >= 1 and rect["height"] >= 1:
+            screenshot = browser.execute_cdp_cmd("Page.captureScreenshot", {
+                "format": "png",
+                "clip": {"x": rect["x"], "y": rect["y"], "width": rect["width"], "height": rect["height"],
+                         "scale": 1},
+                "fromSurface": True
+            })
+            return screenshot["data"]
+    except Exception as e:
+        logging.warning("Unable to capture screenshot using CDP: {}".format(e))
+
+    # Fallback to WebDriver's element screenshot
+    return element.screenshot_as_base64
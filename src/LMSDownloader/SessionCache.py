@@ -0,0 +1,123 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+# Cookie fields accepted by WebDriver's add_cookie()
+COOKIE_FIELDS = ["name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite"]
+
+# One lock for all instances, because workers can share the same cache file
+_file_lock = threading.Lock()
+
+
+class SessionCache:
+    def __init__(self, cache_file: str, ttl: float = 3600.) -> None:
+        """
+        Initializes SessionCache class (on-disk cache of LMS session cookies)
+        :param cache_file: Path to the JSON file to store cookies in
+        :param ttl: How long (in seconds) saved cookies can be used
+        """
+        self._cache_file = cache_file
+        self._ttl = ttl
+
+    def load(self, login: str, login_link: str) -> Optional[list[dict]]:
+        """
+        Loads saved cookies
+        :param login: LMS account login
+        :param login_link: Link to LMS login page
+        :return: List of cookies or None if there are no valid cookies
+        """
+        entry = self._read().get(_key(login, login_link))
+        if entry is None:
+            return None
+        if time.time() > entry.get("expires", 0):
+            logging.info("Saved session is expired")
+            self.invalidate(login, login_link)
+            return None
+        return entry.get("cookies")
+
+    def save(self, login: str, login_link: str, cookies: list[dict]) -> None:
+        """
+        Saves cookies into the cache file
+        :param login: LMS account login
+        :param login_link: Link to LMS login page
+        :param cookies: Cookies from browser.get_cookies()
+        :return:
+        """
+        cookies = [{field: cookie[field] for field in COOKIE_FIELDS if field in cookie} for cookie in cookies]
+        with _file_lock:
+            entries = self._read()
+            entries[_key(login, login_link)] = {"expires": time.time() + self._ttl, "cookies": cookies}
+            self._write(entries)
+        logging.info("Session saved into {}".format(self._cache_file))
+
+    def invalidate(self, login: str, login_link: str) -> None:
+        """
+        Deletes saved cookies
+        :param login: LMS account login
+        :param login_link: Link to LMS login page
+        :return:
+        """
+        with _file_lock:
+            entries = self._read()
+            if entries.pop(_key(login, login_link), None) is not None:
+                self._write(entries)
+
+    def _read(self) -> dict:
+        """
+        Reads all entries from the cache file
+        :return: {key: {"expires": timestamp, "cookies": [...]}}
+        """
+        if not os.path.exists(self._cache_file):
+            return {}
+        try:
+            with open(self._cache_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except Exception as e:
+            logging.warning("Error reading session cache {}: {}".format(self._cache_file, e))
+            return {}
+
+    def _write(self, entries: dict) -> None:
+        """
+        Writes all entries into the cache file (atomically, readable only by owner)
+        :param entries: {key: {"expires": timestamp, "cookies": [...]}}
+        :return:
+        """
+        cache_dir = os.path.dirname(os.path.abspath(self._cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = self._cache_file + ".tmp"
+        with open(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as file:
+            json.dump(entries, file)
+        os.replace(temp_file, self._cache_file)
+
+
+def _key(login: str, login_link: str) -> str:
+    """
+    Generates cache key without storing login in plain text
+    :param login: LMS account login
+    :param login_link: Link to LMS login page
+    :return: sha256 hex digest
+    """
+    return hashlib.sha256("{}\n{}".format(login, login_link).encode("utf-8")).hexdigest()
@@ -0,0 +1,133 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+# Pages are stored in a regular table (unique by course, module and page) and indexed by external content FTS5 table
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    course TEXT NOT NULL,
+    module TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    file TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (course, module, page)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    title, text, content='pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    INSERT INTO pages_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+"""
+
+
+class TextIndex:
+    def __init__(self, db_path: str) -> None:
+        """
+        Initializes TextIndex class (SQLite full-text index of downloaded pages keyed by course, module and page).
+        One instance can be shared by multiple threads, one file can be shared by multiple processes
+        :param db_path: Path to the SQLite database (will be created if not exists)
+        """
+        import sqlite3
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._connection.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._connection.close()
+            raise Exception("Unable to create text index (SQLite must be built with FTS5): {}".format(e))
+
+    def clear(self, course: str, module: str) -> None:
+        """
+        Deletes all pages of the module (before downloading it again)
+        :param course: Course link (empty string if module was downloaded without course)
+        :param module: Module link
+        :return:
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM pages WHERE course = ? AND module = ?", (course, module))
+
+    def add_page(self, course: str, module: str, page: int, title: str, file: str, text: str) -> None:
+        """
+        Adds page into the index or replaces existing one
+        :param course: Course link (empty string if module was downloaded without course)
+        :param module: Module link
+        :param page: Page number (starting from 1)
+        :param title: Module title
+        :param file: Path to the downloaded file without extension
+        :param text: Page text
+        :return:
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT INTO pages (course, module, page, title, file, text) "
+                                     "VALUES (?, ?, ?, ?, ?, ?) "
+                                     "ON CONFLICT (course, module, page) DO UPDATE "
+                                     "SET title = excluded.title, file = excluded.file, text = excluded.text",
+                                     (course, module, page, title, file, text))
+
+    def search(self, query: str, limit: int = 20, course: Optional[str] = None) -> list[dict]:
+        """
+        Finds pages using FTS5 query syntax (words, "phrases", prefix*, AND / OR / NOT)
+        :param query: Search query
+        :param limit: Max number of results
+        :param course: Course link to search in. None to search everywhere
+        :return: Best matches first: [{"course", "module", "page", "title", "file", "snippet"}, ...]
+        """
+        sql = "SELECT pages.course, pages.module, pages.page, pages.title, pages.file, " \
+              "snippet(pages_fts, 1, '[', ']', '...', 16) " \
+              "FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid WHERE pages_fts MATCH ?"
+        params = [query]
+        if course is not None:
+            sql += " AND pages.course = ?"
+            params.append(course)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [{"course": row[0], "module": row[1], "page": row[2], "title": row[3], "file": row[4],
+                 "snippet": row[5]} for row in rows]
+
+    def close(self) -> None:
+        """
+        Closes database
+        :return:
+        """
+        with self._lock:
+            logging.info("Closing text index")
+            self._connection.close()
@@ -0,0 +1,135 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import copy
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from LMSDownloader.LMSDownloader import LMSDownloader
+
+
+def download_parallel(lms_downloader: LMSDownloader, links: Iterable[str], save_to_directory: str = "",
+                      workers: int = 2, result_callback: Optional[Callable[[dict], None]] = None,
+                      file_names: Optional[dict[str, str]] = None, tabs: int = 1,
+                      first_downloader: Optional[LMSDownloader] = None) -> list[dict]:
+    """
+    Downloads links using pool of browsers. Each worker starts its own browser, logs in once
+    and takes links from the shared queue until it's empty. If tabs > 1, each browser downloads
+    multiple links at the same time in separate tabs sharing one login, cookies and cache
+    :param lms_downloader: Configured LMSDownloader instance. It will be copied for each worker
+    :param links: LMS links to download
+    :param save_to_directory: Path to the dir where to save downloaded PDF and TXT
+    :param workers: Number of browsers to start (will be limited by the number of links)
+    :param result_callback: Will be called with each result as soon as link is processed (from worker's thread)
+    :param file_names: Output file names (without extension, relative to save_to_directory) for links
+    :param tabs: Number of tabs in each browser to download links in at the same time
+    :param first_downloader: LMSDownloader with already started and logged-in browser (for example, after
+    get_page_source()) for the first worker to use instead of starting a new one. It's closed when worker finishes
+    :return: One result per link in the same order as links:
+    {"link": str, "paths": list[str], "error": str or None, "duplicates": int}
+    """
+    links = list(links)
+    if not links:
+        if first_downloader is not None:
+            first_downloader.quit_browser()
+        return []
+
+    # Put all links into the shared queue
+    links_queue = queue.Queue()
+    for index, link in enumerate(links):
+        links_queue.put((index, link))
+
+    results = [None] * len(links)
+    results_lock = threading.Lock()
+
+    def _download(worker_downloader: LMSDownloader, worker_id: str) -> None:
+        # Indexes of taken links in the same order as results from download_many()
+        taken_indexes = []
+
+        def _take_links() -> Iterator[str]:
+            while True:
+                try:
+                    index, link = links_queue.get_nowait()
+                except queue.Empty:
+                    return
+                logging.info("Worker {} took link {} / {}".format(worker_id, index + 1, len(links)))
+                taken_indexes.append(index)
+                yield link
+
+        def _on_result(result: dict) -> None:
+            with results_lock:
+                results[taken_indexes[-1]] = result
+            if result_callback is not None:
+                result_callback(result)
+
+        worker_downloader.download_many(_take_links(), save_to_directory, result_callback=_on_result,
+                                        file_names=file_names)
+
+    def _worker(worker_id: int) -> None:
+        # Each worker has its own browser
+        if worker_id == 0 and first_downloader is not None:
+            worker_downloader = first_downloader
+        else:
+            worker_downloader = copy.copy(lms_downloader)
+            worker_downloader.browser = None
+        if tabs <= 1:
+            _download(worker_downloader, str(worker_id))
+            return
+
+        # Start browser and log in once for all tabs
+        try:
+            if worker_downloader.browser is None:
+                worker_downloader.start_browser()
+        except Exception as e:
+            # Links will be taken by other workers or will fail with the same error in single-tab mode
+            logging.error("Worker {} can't start browser".format(worker_id), exc_info=e)
+            worker_downloader.quit_browser()
+            _download(worker_downloader, str(worker_id))
+            return
+
+        try:
+            with ThreadPoolExecutor(max_workers=tabs, thread_name_prefix="LMSDownloader-tab") as tab_executor:
+                tab_futures = [tab_executor.submit(_download, worker_downloader.new_tab_downloader(),
+                                                   "{}.{}".format(worker_id, tab_id))
+                               for tab_id in range(tabs)]
+                for tab_future in tab_futures:
+                    tab_future.result()
+        finally:
+            worker_downloader.quit_browser()
+
+    # Start workers and wait for all of them
+    workers = max(1, min(workers, (len(links) + tabs - 1) // max(tabs, 1)))
+    logging.info("Downloading {} links using {} workers with {} tabs each".format(len(links), workers, tabs))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="LMSDownloader-worker") as executor:
+        futures = [executor.submit(_worker, worker_id) for worker_id in range(workers)]
+        for future in futures:
+            future.result()
+
+    # Links left on the queue by workers that stopped because their browsers can't be started
+    for index, link in enumerate(links):
+        if results[index] is None:
+            results[index] = {"link": link, "paths": [], "error": "Not downloaded: no browser could be started",
+                              "duplicates": 0}
+            if result_callback is not None:
+                result_callback(results[index])
+
+    return results
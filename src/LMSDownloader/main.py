@@ -19,9 +19,12 @@
 """
 import argparse
 import logging
+import os
+import re
 import sys
+from typing import Iterator
 
-from LMSDownloader import LMSDownloader
+from LMSDownloader import CourseCrawler, Daemon, LMSDownloader, Metrics, WorkerPool
 
 
 def logging_setup() -> None:
@@ -45,6 +48,87 @@ def logging_setup() -> None:
     logging.info("logging setup is complete")
 
 
+def read_links(links_file: str) -> Iterator[str]:
+    """
+    Reads links from file or stdin skipping empty lines and #comments
+    :param links_file: path to the file or "-" to read from stdin
+    :return: links one by one
+    """
+    file = sys.stdin if links_file == "-" else open(links_file, "r", encoding="utf-8")
+    try:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def validate(args: argparse.Namespace) -> bool:
+    """
+    Checks links and options without starting browser (--dry-run)
+    :param args: Parsed arguments
+    :return: True if everything is valid
+    """
+    errors = []
+
+    # Options
+    link_check_regex = None
+    try:
+        link_check_regex = re.compile(args.link_check_regex)
+    except re.error as e:
+        errors.append("Invalid --link-check-regex: {}".format(e))
+    if not args.login_link.lower().startswith(("http://", "https://")):
+        errors.append("Invalid --login-link: {}".format(args.login_link))
+    if re.fullmatch("\\d+,\\d+", args.window_size) is None:
+        errors.append("Invalid --window-size (must be WIDTH,HEIGHT): {}".format(args.window_size))
+    for name, value in (("--workers", args.workers), ("--tabs", args.tabs), ("--shards", args.shards)):
+        if value < 1:
+            errors.append("{} must be at least 1".format(name))
+    for name, value in (("--wait-between-pages", args.wait_between_pages),
+                        ("--max-volume-size", args.max_volume_size),
+                        ("--page-cache-size", args.page_cache_size),
+                        ("--slide-change-timeout", args.slide_change_timeout)):
+        if value < 0:
+            errors.append("{} must not be negative".format(name))
+    if not 0 <= args.screenshot_quality <= 100:
+        errors.append("--screenshot-quality must be from 0 to 100")
+    if not 0 < args.screenshot_scale <= 1:
+        errors.append("--screenshot-scale must be greater than 0 and not greater than 1")
+
+    # Paths (nothing is created)
+    for name, path in (("--save-to", args.save_to), ("--work-dir", args.work_dir),
+                       ("--page-cache-dir", args.page_cache_dir), ("--browser-cache-dir", args.browser_cache_dir)):
+        if path and os.path.exists(path) and not os.path.isdir(path):
+            errors.append("{} is not a directory: {}".format(name, path))
+    for name, path in (("--session-cache", args.session_cache), ("--text-index", args.text_index),
+                       ("--metrics-jsonl", args.metrics_jsonl), ("--metrics-prometheus", args.metrics_prometheus)):
+        if path and os.path.isdir(path):
+            errors.append("{} is a directory: {}".format(name, path))
+
+    # Links
+    links_count = 0
+    if args.course_link:
+        links_count += 1
+        if re.search(CourseCrawler.COURSE_LINK_REGEX, args.course_link) is None:
+            errors.append("Invalid course link: {}".format(args.course_link))
+    elif link_check_regex is not None and (args.link_to_download or args.links_file):
+        try:
+            links = [args.link_to_download] if args.link_to_download else read_links(args.links_file)
+            for link in links:
+                links_count += 1
+                if link_check_regex.search(link) is None:
+                    errors.append("Invalid link: {}".format(link))
+        except OSError as e:
+            errors.append("Unable to read --links-file: {}".format(e))
+
+    for error in errors:
+        logging.error(error)
+    logging.info("Dry run: {} links checked, {} errors".format(links_count, len(errors)))
+    return not errors
+
+
 def main():
     # Generate and parse arguments
     parser = argparse.ArgumentParser()
@@ -62,12 +146,29 @@ def main():
         type=str,
         required=True,
     )
-    parser.add_argument(
+    links_group = parser.add_mutually_exclusive_group(required=True)
+    links_group.add_argument(
         "-link",
         "--link-to-download",
         help="LMS link to download",
         type=str,
-        required=True,
+    )
+    links_group.add_argument(
+        "--links-file",
+        help="path to the file with LMS links to download (one per line) or \"-\" to read them from stdin. "
+             "All links will be downloaded using one browser session",
+        type=str,
+    )
+    links_group.add_argument(
+        "--course-link",
+        help="link to the course page (course/view.php?id=...) to download all its SCORM and H5P modules",
+        type=str,
+    )
+    links_group.add_argument(
+        "--daemon",
+        help="keep --workers logged-in browsers running and download links submitted over local HTTP API "
+             "(POST /jobs, GET /jobs/<id>, GET /status)",
+        action="store_true",
     )
     parser.add_argument(
         "-path",
@@ -76,6 +177,30 @@ def main():
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--workers",
+        help="number of browsers to download links from --links-file or --course-link in parallel "
+             "(each one logs in once). In --daemon mode it's the max number of jobs running at the same time",
+        type=int,
+        required=False,
+        default=1
+    )
+    parser.add_argument(
+        "--tabs",
+        help="number of tabs in each browser to download links in at the same time "
+             "(tabs share one login, cookies and cache. Use with --headless)",
+        type=int,
+        required=False,
+        default=1
+    )
+    parser.add_argument(
+        "--shards",
+        help="number of tabs to capture slides of a single H5P presentation with at the same time "
+             "(each tab opens its own range of slides. Use with -link and --headless)",
+        type=int,
+        required=False,
+        default=1
+    )
     parser.add_argument(
         "--login-link",
         help="link to LMS login page",
@@ -117,6 +242,193 @@ def main():
         action="store_true",
         required=False
     )
+    parser.add_argument(
+        "--session-cache",
+        help="path to the JSON file to save session cookies in to skip login next time",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--session-cache-ttl",
+        help="how long (in seconds) saved session cookies can be used",
+        type=float,
+        required=False,
+        default=3600.
+    )
+    parser.add_argument(
+        "--no-adaptive-wait",
+        help="specify to always wait full time instead of continuing as soon as page is idle",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--max-volume-size",
+        help="split output PDF into multiple files of this size (in MB). 0 to disable splitting",
+        type=float,
+        required=False,
+        default=0.
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="path to the dir where to save captured pages to be able to resume after crash",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--resume",
+        help="specify to continue from the first missing page saved in --work-dir",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--page-cache-dir",
+        help="path to the dir where to cache captured pages to reuse unchanged ones next time",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--page-cache-size",
+        help="max size of page cache (in MB). Least recently used pages will be deleted",
+        type=float,
+        required=False,
+        default=1024.
+    )
+    parser.add_argument(
+        "--no-h5p-fast-path",
+        help="specify to always capture H5P slides as screenshots instead of using the original images",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--scorm-fast-path",
+        help="specify to download SCORM package using imsmanifest.xml (slide images or each launchable item "
+             "printed directly) instead of clicking through the player if possible",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--force",
+        help="specify to download all modules of --course-link even if they were already downloaded",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--block-urls",
+        help="URL patterns of requests to block (* matches any characters)",
+        type=str,
+        nargs="+",
+        required=False
+    )
+    parser.add_argument(
+        "--block-resource-types",
+        help="types of resources to block (they are not needed for PDF and screenshots, but fonts and media "
+             "may change how some pages look)",
+        type=str,
+        nargs="+",
+        choices=["tracker", "font", "media"],
+        required=False
+    )
+    parser.add_argument(
+        "--browser-cache-dir",
+        help="path to the dir where to keep browser's disk cache between runs (SCORM players and other "
+             "static files will be loaded from it)",
+        type=str,
+        required=False
+    )
+    parser.add_argument(
+        "--screenshot-quality",
+        help="JPEG quality (1-100) to re-encode H5P screenshots with (much smaller output). "
+             "By default screenshots are embedded losslessly",
+        type=int,
+        required=False,
+        default=0
+    )
+    parser.add_argument(
+        "--screenshot-scale",
+        help="downscale factor of H5P screenshots, for example, 0.5 (works only with --screenshot-quality)",
+        type=float,
+        required=False,
+        default=1.
+    )
+    parser.add_argument(
+        "--drop-duplicates",
+        help="specify to compare page fingerprints: if the page hasn't changed after moving to the next one, "
+             "it's awaited and dropped as a duplicate if it still doesn't change (each dropped slide is logged)",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--slide-change-timeout",
+        help="how long to wait for the page to change before dropping it as a duplicate",
+        type=float,
+        required=False,
+        default=5.
+    )
+    parser.add_argument(
+        "--daemon-host",
+        help="address for --daemon to listen on (API has no authentication, keep it local)",
+        type=str,
+        required=False,
+        default="127.0.0.1"
+    )
+    parser.add_argument(
+        "--daemon-port",
+        help="port for --daemon to listen on",
+        type=int,
+        required=False,
+        default=8765
+    )
+    parser.add_argument(
+        "--max-queued-jobs",
+        help="max number of --daemon jobs waiting for a browser (new jobs are rejected when reached)",
+        type=int,
+        required=False,
+        default=100
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        help="path to the file to append timing of each download stage and counter increment to (as JSON lines)",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        help="path to the file to save total stage timings and counters to on exit (Prometheus text format)",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--extract-text",
+        help="specify to save text of each page into TXT file next to the PDF",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--text-index",
+        help="path to the SQLite database to add text of each page into (full-text search index keyed by course, "
+             "module and page)",
+        type=str,
+        required=False,
+        default=None
+    )
+    parser.add_argument(
+        "--dry-run",
+        help="specify to only check links and options without starting browser (exit code is 0 if they're valid)",
+        action="store_true",
+        required=False
+    )
+    parser.add_argument(
+        "--network-stats",
+        help="specify to count requests (blocked, loaded from the disk cache, received bytes) using browser's "
+             "performance log and add them into metrics",
+        action="store_true",
+        required=False
+    )
     parser.add_argument(
         "--no-logging-init",
         help="specify to bypass logging initialization",
@@ -124,28 +436,106 @@ def main():
         required=False
     )
     args = parser.parse_args()
+    if args.resume and not args.work_dir:
+        parser.error("--resume requires --work-dir")
+    if args.shards > 1 and not args.link_to_download:
+        parser.error("--shards can only be used with -link (one H5P presentation)")
 
     # Initialize logging
     if not args.no_logging_init:
         logging_setup()
 
+    # Check everything without starting browser
+    if args.dry_run:
+        sys.exit(0 if validate(args) else -1)
+
     # Initialize class
-    lms_downloader = LMSDownloader.LMSDownloader(args.login, args.password, args.link_to_download,
+    lms_downloader = LMSDownloader.LMSDownloader(args.login, args.password, args.link_to_download or "",
                                                  login_link=args.login_link,
                                                  wait_between_pages=args.wait_between_pages,
                                                  link_check_regex=args.link_check_regex,
                                                  user_agent=args.user_agent,
                                                  window_size=args.window_size,
-                                                 headless=args.headless)
+                                                 headless=args.headless,
+                                                 session_cache_file=args.session_cache,
+                                                 session_cache_ttl=args.session_cache_ttl,
+                                                 adaptive_wait=not args.no_adaptive_wait,
+                                                 max_volume_size=args.max_volume_size,
+                                                 work_dir=args.work_dir,
+                                                 resume=args.resume,
+                                                 page_cache_dir=args.page_cache_dir,
+                                                 page_cache_size=args.page_cache_size,
+                                                 h5p_fast_path=not args.no_h5p_fast_path,
+                                                 scorm_fast_path=args.scorm_fast_path,
+                                                 blocked_urls=args.block_urls,
+                                                 blocked_resource_types=args.block_resource_types,
+                                                 browser_cache_dir=args.browser_cache_dir,
+                                                 screenshot_quality=args.screenshot_quality,
+                                                 screenshot_scale=args.screenshot_scale,
+                                                 drop_duplicates=args.drop_duplicates,
+                                                 slide_change_timeout=args.slide_change_timeout,
+                                                 extract_text=args.extract_text,
+                                                 text_index_file=args.text_index,
+                                                 network_stats=args.network_stats)
+
+    # Write metrics as they are recorded
+    metrics_file = None
+    if args.metrics_jsonl:
+        metrics_file = open(args.metrics_jsonl, "a", encoding="utf-8")
+        lms_downloader.metrics.add_callback(Metrics.jsonl_writer(metrics_file))
 
     # Download
     try:
-        logging.info("Saved as: {}".format(", ".join(lms_downloader.download(args.save_to))))
+        # Daemon mode
+        if args.daemon:
+            Daemon.Daemon(lms_downloader, args.save_to, host=args.daemon_host, port=args.daemon_port,
+                          workers=args.workers, max_queued_jobs=args.max_queued_jobs).run()
+            sys.exit(0)
+
+        # Batch mode
+        if args.links_file or args.course_link:
+            if args.course_link:
+                results = CourseCrawler.download_course(lms_downloader, args.course_link, args.save_to,
+                                                        workers=args.workers, force=args.force, tabs=args.tabs)
+            elif args.workers > 1 or args.tabs > 1:
+                results = WorkerPool.download_parallel(lms_downloader, read_links(args.links_file), args.save_to,
+                                                       workers=args.workers, tabs=args.tabs)
+            else:
+                results = lms_downloader.download_many(read_links(args.links_file), args.save_to)
+            for result in results:
+                if result.get("skipped"):
+                    logging.info("SKIPPED {} (already downloaded)".format(result["link"]))
+                elif result["error"] is None:
+                    logging.info("OK {} saved as: {}{}".format(result["link"], ", ".join(result["paths"]),
+                                                               " ({} duplicate pages dropped)"
+                                                               .format(result["duplicates"])
+                                                               if result.get("duplicates") else ""))
+                else:
+                    logging.error("FAILED {}: {}".format(result["link"], result["error"]))
+            sys.exit(0 if all(result["error"] is None for result in results) else -1)
+
+        # Single link
+        if args.shards > 1:
+            downloaded_paths = lms_downloader.download_sharded(args.save_to, shards=args.shards)
+        else:
+            downloaded_paths = lms_downloader.download(args.save_to)
+        logging.info("Saved as: {}".format(", ".join(downloaded_paths)))
         sys.exit(0)
     except KeyboardInterrupt:
         logging.warning("KeyboardInterrupt! Exiting")
     except Exception as e:
         logging.error("Error download data", exc_info=e)
+    finally:
+        # Save metrics
+        if metrics_file is not None:
+            metrics_file.close()
+        if args.metrics_prometheus:
+            with open(args.metrics_prometheus, "w", encoding="utf-8") as prometheus_file:
+                prometheus_file.write(lms_downloader.metrics.to_prometheus())
+
+        # Close text index
+        if lms_downloader.text_index is not None:
+            lms_downloader.text_index.close()
     sys.exit(-1)
 
 
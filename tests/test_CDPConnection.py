@@ -0,0 +1,176 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import unittest
+
+from LMSDownloader import CDPConnection as CDPConnectionModule
+from LMSDownloader.CDPConnection import CDPConnection
+
+
+def _frame(opcode: int, payload: bytes, fin: bool = True) -> bytes:
+    """
+    :param opcode: Websocket opcode
+    :param payload: Frame data
+    :param fin: False for all fragments except the last one
+    :return: Unmasked server frame
+    """
+    header = bytes([(0x80 if fin else 0) | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([126]) + struct.pack(">H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack(">Q", len(payload))
+    return header + payload
+
+
+async def _read_client_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """
+    Reads frame sent by CDPConnection (client frames must be masked)
+    :param reader: Server side stream
+    :return: (opcode, unmasked payload)
+    """
+    first_byte, second_byte = await reader.readexactly(2)
+    assert second_byte & 0x80, "Client frame is not masked"
+    length = second_byte & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4)
+    data = await reader.readexactly(length)
+    return first_byte & 0x0F, bytes(byte ^ mask[index % 4] for index, byte in enumerate(data))
+
+
+class _FakeChrome:
+    def __init__(self, fragment: bool = False) -> None:
+        """
+        Websocket server that answers each command with its params
+        :param fragment: True to split answers into 2 fragments with ping between them
+        """
+        self.fragment = fragment
+        self.pongs = []
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return "ws://127.0.0.1:{}/devtools/browser/test".format(self.server.sockets[0].getsockname()[1])
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        request = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        key = [line.split(":", 1)[1].strip() for line in request.split("\r\n")
+               if line.lower().startswith("sec-websocket-key:")][0]
+        accept = base64.b64encode(hashlib.sha1((key + CDPConnectionModule._WEBSOCKET_GUID).encode("ascii"))
+                                  .digest()).decode("ascii")
+        writer.write("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept).encode("ascii"))
+        try:
+            while True:
+                opcode, payload = await _read_client_frame(reader)
+                if opcode == CDPConnectionModule._OPCODE_PONG:
+                    self.pongs.append(payload)
+                    continue
+                if opcode == CDPConnectionModule._OPCODE_CLOSE:
+                    break
+                message = json.loads(payload)
+                answer = json.dumps({"id": message["id"], "result": message["params"]}).encode("utf-8")
+                if self.fragment:
+                    writer.write(_frame(CDPConnectionModule._OPCODE_TEXT, answer[:10], fin=False)
+                                 + _frame(CDPConnectionModule._OPCODE_PING, b"ping")
+                                 + _frame(CDPConnectionModule._OPCODE_CONTINUATION, answer[10:]))
+                else:
+                    writer.write(_frame(CDPConnectionModule._OPCODE_TEXT, answer))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+
+class _BrokenWriter:
+    def write(self, _data: bytes) -> None:
+        raise ConnectionResetError("Connection reset")
+
+    async def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TestCDPConnection(unittest.IsolatedAsyncioTestCase):
+    async def _round_trip(self, fragment: bool, sizes: list[int]) -> _FakeChrome:
+        fake_chrome = _FakeChrome(fragment=fragment)
+        connection = await CDPConnection.connect(await fake_chrome.start())
+        try:
+            for size in sizes:
+                params = {"data": "x" * size}
+                self.assertEqual(await connection.send("Test.echo", params), params)
+        finally:
+            await connection.close()
+            await fake_chrome.stop()
+        return fake_chrome
+
+    async def test_payload_lengths(self) -> None:
+        # 7-bit, 16-bit and 64-bit lengths in both directions
+        await self._round_trip(False, [0, 100, 125, 126, 1000, 65535, 70000])
+
+    async def test_fragmented_message_with_ping(self) -> None:
+        fake_chrome = await self._round_trip(True, [50, 300])
+        self.assertEqual(fake_chrome.pongs, [b"ping", b"ping"])
+
+    async def test_failed_send_is_not_pending(self) -> None:
+        connection = CDPConnection(asyncio.StreamReader(), _BrokenWriter())
+        try:
+            with self.assertRaises(ConnectionResetError):
+                await connection.send("Test.echo")
+            self.assertEqual(connection._pending, {})
+        finally:
+            await connection.close()
+
+    async def test_remove_listener(self) -> None:
+        connection = CDPConnection(asyncio.StreamReader(), _BrokenWriter())
+        try:
+            future = connection.wait_for_event("Page.loadEventFired", session_id="session")
+            connection.remove_listener(future)
+            self.assertTrue(future.cancelled())
+            self.assertEqual(connection._listeners, [])
+        finally:
+            await connection.close()
+
+    def test_apply_mask(self) -> None:
+        mask = b"\x01\x02\x03\x04"
+        data = bytes(range(256)) * 3 + b"abc"
+        masked = CDPConnectionModule._apply_mask(data, mask)
+        self.assertEqual(masked[:4], b"\x01\x03\x01\x07")
+        self.assertEqual(CDPConnectionModule._apply_mask(masked, mask), data)
+        self.assertEqual(CDPConnectionModule._apply_mask(b"", mask), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import os
+import tempfile
+import unittest
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from LMSDownloader import LMSDownloader as LMSDownloaderModule
+from LMSDownloader.Checkpoint import Checkpoint
+from LMSDownloader.LMSDownloader import CONTENT_TYPE_SCORM_PRESENTATION, LMSDownloader
+
+
+def _slide_pdf(slide: str) -> bytes:
+    """
+    :param slide: Slide name
+    :return: One-page PDF which width identifies the slide
+    """
+    pdf_writer = PdfWriter()
+    pdf_writer.add_blank_page(width=100 + ord(slide), height=100)
+    pdf_file = io.BytesIO()
+    pdf_writer.write(pdf_file)
+    return pdf_file.getvalue()
+
+
+class _FakePlayer:
+    def __init__(self, slides: list[str], crash_on: str = None) -> None:
+        """
+        Player that shows slides one by one (the same names are duplicate slides)
+        :param slides: Slide names
+        :param crash_on: Slide name to raise an exception at while capturing it
+        """
+        self.slides = slides
+        self.crash_on = crash_on
+        self.current = 0
+        self.captured = []
+
+    def install(self, lms_downloader: LMSDownloader) -> None:
+        lms_downloader.browser = self
+        lms_downloader._open_link = lambda link: None
+        lms_downloader._open_content = lambda player_url: CONTENT_TYPE_SCORM_PRESENTATION
+        lms_downloader._next_page = self.next_page
+        lms_downloader._capture_page = self.capture_page
+        lms_downloader._wait_for_page_change = lambda previous_fingerprint: previous_fingerprint
+
+    def fingerprint(self, _browser) -> str:
+        return self.slides[self.current]
+
+    def next_page(self, _content_type: int) -> bool:
+        if self.current >= len(self.slides) - 1:
+            return False
+        self.current += 1
+        return True
+
+    def capture_page(self, _content_type: int, _print_settings: dict, page_processor, page_counter: int) -> None:
+        slide = self.slides[self.current]
+        if slide == self.crash_on:
+            raise Exception("Browser crashed")
+        self.captured.append(slide)
+        page_processor.submit_ready(page_counter, _slide_pdf(slide))
+
+    @property
+    def switch_to(self):
+        return self
+
+    def default_content(self) -> None:
+        pass
+
+
+class TestResume(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.work_dir = os.path.join(self._temp_dir.name, "work")
+        self.save_to = os.path.join(self._temp_dir.name, "out")
+        self._fingerprint = LMSDownloaderModule.fingerprint
+
+    def tearDown(self) -> None:
+        LMSDownloaderModule.fingerprint = self._fingerprint
+        self._temp_dir.cleanup()
+
+    def _download(self, player: _FakePlayer, resume: bool) -> list[str]:
+        lms_downloader = LMSDownloader("", "", "", work_dir=self.work_dir, resume=resume, drop_duplicates=True,
+                                       extract_text=False)
+        player.install(lms_downloader)
+        LMSDownloaderModule.fingerprint = player.fingerprint
+        return lms_downloader._download_link("link", self.save_to, file_name="slides")
+
+    def test_resume_after_dropped_duplicate(self) -> None:
+        slides = ["A", "B", "B", "C", "D", "E"]
+
+        # The second "B" is dropped, so 3 pages are saved while the player is on the 5th slide
+        with self.assertRaises(Exception):
+            self._download(_FakePlayer(slides, crash_on="D"), resume=False)
+        checkpoint = Checkpoint(self.work_dir, "link")
+        self.assertEqual(len(checkpoint.open(CONTENT_TYPE_SCORM_PRESENTATION, resume=True)), 3)
+        self.assertEqual(checkpoint.next_slide, 4)
+
+        # Only the rest of the slides must be captured
+        player = _FakePlayer(slides)
+        downloaded_paths = self._download(player, resume=True)
+        self.assertEqual(player.captured, ["D", "E"])
+
+        pdf_reader = PdfReader(downloaded_paths[0])
+        self.assertEqual([chr(int(page.mediabox.width) - 100) for page in pdf_reader.pages], ["A", "B", "C", "D", "E"])
+
+    def test_resume_drops_duplicate_of_last_saved_page(self) -> None:
+        slides = ["A", "B", "B", "C"]
+
+        # Run stops right after "B", so the first slide after resume is its duplicate
+        with self.assertRaises(Exception):
+            self._download(_FakePlayer(slides, crash_on="C"), resume=False)
+        checkpoint = Checkpoint(self.work_dir, "link")
+        checkpoint.open(CONTENT_TYPE_SCORM_PRESENTATION, resume=True)
+        self.assertEqual(checkpoint.next_slide, 2)
+        self.assertEqual(checkpoint.last_fingerprint, "B")
+
+        player = _FakePlayer(slides)
+        downloaded_paths = self._download(player, resume=True)
+        self.assertEqual(player.captured, ["C"])
+
+        pdf_reader = PdfReader(downloaded_paths[0])
+        self.assertEqual([chr(int(page.mediabox.width) - 100) for page in pdf_reader.pages], ["A", "B", "C"])
+
+    def test_next_slide_of_old_manifest(self) -> None:
+        checkpoint = Checkpoint(self.work_dir, "link")
+        checkpoint.open(CONTENT_TYPE_SCORM_PRESENTATION)
+        self.assertEqual(checkpoint.next_slide, 0)
+        self.assertIsNone(checkpoint.last_fingerprint)
+        checkpoint.add_page(0, _slide_pdf("A"))
+        checkpoint.add_page(1, _slide_pdf("B"))
+        self.assertEqual(checkpoint.next_slide, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import tempfile
+import unittest
+
+from LMSDownloader.Daemon import Daemon
+from LMSDownloader.LMSDownloader import LMSDownloader
+
+
+class TestResolvePath(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.base_directory = os.path.realpath(os.path.join(self._temp_dir.name, "downloads"))
+        os.makedirs(self.base_directory)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_inside(self) -> None:
+        self.assertEqual(Daemon._resolve_path(self.base_directory, ""), self.base_directory)
+        self.assertEqual(Daemon._resolve_path(self.base_directory, "course/module"),
+                         os.path.join(self.base_directory, "course", "module"))
+        self.assertEqual(Daemon._resolve_path(self.base_directory, "course/../module"),
+                         os.path.join(self.base_directory, "module"))
+
+    def test_outside(self) -> None:
+        for path in ("..", "../downloads2", "course/../../etc", os.path.abspath(os.sep), self.base_directory):
+            with self.assertRaises(ValueError, msg=path):
+                Daemon._resolve_path(self.base_directory, path)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks are not supported")
+    def test_symlink_outside(self) -> None:
+        os.symlink(self._temp_dir.name, os.path.join(self.base_directory, "link"))
+        with self.assertRaises(ValueError):
+            Daemon._resolve_path(self.base_directory, "link/file")
+
+    def test_submit(self) -> None:
+        daemon = Daemon(LMSDownloader("", "", ""), save_to_directory=self.base_directory)
+        job = daemon.submit(["link"], "course", {"link": "01 module"})
+        self.assertEqual(job["save_to"], os.path.join(self.base_directory, "course"))
+        self.assertEqual(job["file_names"], {"link": "01 module"})
+
+        for links, save_to, file_names in (([], None, None), (["link"], "../other", None),
+                                           (["link"], None, {"link": "../../file"}), (["link"], None, {"link": ""}),
+                                           ("link", None, None), (["link"], None, {"link": 1})):
+            with self.assertRaises(ValueError):
+                daemon.submit(links, save_to, file_names)
+        self.assertEqual(daemon.status()["queued"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
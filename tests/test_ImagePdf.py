@@ -0,0 +1,100 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import unittest
+import zlib
+
+from PIL import Image
+from PyPDF2 import PdfReader
+
+from LMSDownloader.ImagePdf import _png_stream, compress_image, image_to_pdf
+
+
+def _image_file(image: Image.Image, image_format: str) -> bytes:
+    """
+    :param image: PIL image
+    :param image_format: "PNG" or "JPEG"
+    :return: Image file as bytes
+    """
+    image_file = io.BytesIO()
+    image.save(image_file, image_format)
+    return image_file.getvalue()
+
+
+def _read_image(pdf_data: bytes) -> tuple[list[float], dict]:
+    """
+    :param pdf_data: Result of image_to_pdf()
+    :return: Page MediaBox and image XObject
+    """
+    page = PdfReader(io.BytesIO(pdf_data), strict=True).pages[0]
+    return [float(value) for value in page.mediabox], page["/Resources"]["/XObject"]["/Im0"].get_object()
+
+
+class TestImagePdf(unittest.TestCase):
+    def test_jpeg_is_embedded_as_is(self) -> None:
+        jpeg_data = _image_file(Image.new("RGB", (40, 30), (200, 10, 10)), "JPEG")
+        media_box, image = _read_image(image_to_pdf(jpeg_data))
+        self.assertEqual(media_box, [0, 0, 40, 30])
+        self.assertEqual(image["/Filter"], "/DCTDecode")
+        self.assertEqual(image["/ColorSpace"], "/DeviceRGB")
+        self.assertEqual(image._data, jpeg_data)
+
+    def test_png_is_embedded_without_decoding(self) -> None:
+        png_data = _image_file(Image.new("L", (17, 5), 128), "PNG")
+        media_box, image = _read_image(image_to_pdf(png_data))
+        self.assertEqual(media_box, [0, 0, 17, 5])
+        self.assertEqual(image["/Filter"], "/FlateDecode")
+        self.assertEqual(image["/ColorSpace"], "/DeviceGray")
+        self.assertEqual(image["/DecodeParms"]["/Predictor"], 15)
+        self.assertEqual(image["/DecodeParms"]["/Columns"], 17)
+        self.assertEqual(image._data, _png_stream(png_data)[1])
+
+        # Each row is PNG filter byte and 17 gray pixels
+        self.assertEqual(len(zlib.decompress(image._data)), 5 * (1 + 17))
+
+    def test_png_stream(self) -> None:
+        self.assertEqual(_png_stream(_image_file(Image.new("RGB", (2, 2)), "PNG"))[0], 3)
+        self.assertEqual(_png_stream(_image_file(Image.new("L", (2, 2)), "PNG"))[0], 1)
+
+        # Alpha, palette and non-PNG data must be decoded
+        self.assertIsNone(_png_stream(_image_file(Image.new("RGBA", (2, 2)), "PNG")))
+        self.assertIsNone(_png_stream(_image_file(Image.new("P", (2, 2)), "PNG")))
+        self.assertIsNone(_png_stream(b"not a png"))
+
+    def test_alpha_is_composed_onto_white(self) -> None:
+        image = Image.new("RGBA", (2, 1), (0, 0, 0, 0))
+        image.putpixel((1, 0), (10, 20, 30, 255))
+        _, pdf_image = _read_image(image_to_pdf(_image_file(image, "PNG")))
+        self.assertEqual(pdf_image["/ColorSpace"], "/DeviceRGB")
+        self.assertEqual(zlib.decompress(pdf_image._data), bytes([255, 255, 255, 10, 20, 30]))
+
+    def test_page_size_of_downscaled_image(self) -> None:
+        jpeg_data = compress_image(_image_file(Image.new("RGBA", (100, 60), (0, 0, 255, 255)), "PNG"),
+                                   quality=50, scale=0.5)
+        with Image.open(io.BytesIO(jpeg_data)) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (50, 30)))
+
+        media_box, image = _read_image(image_to_pdf(jpeg_data, (100, 60)))
+        self.assertEqual(media_box, [0, 0, 100, 60])
+        self.assertEqual((image["/Width"], image["/Height"]), (50, 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import json
+import unittest
+
+from LMSDownloader.Metrics import Metrics, jsonl_writer
+
+
+class TestMetrics(unittest.TestCase):
+    def test_to_prometheus(self):
+        metrics = Metrics()
+        metrics.record("capture", 1.5, link="a")
+        metrics.record("capture", 0.5, link="a")
+        metrics.record("login", 2.)
+        metrics.count("pages", 3)
+        metrics.count("retries")
+        metrics.count("retries", 2)
+
+        lines = metrics.to_prometheus().splitlines()
+        self.assertIn("lmsdownloader_stage_seconds_sum{stage=\"capture\"} 2.0", lines)
+        self.assertIn("lmsdownloader_stage_seconds_count{stage=\"capture\"} 2", lines)
+        self.assertIn("lmsdownloader_stage_seconds_max{stage=\"capture\"} 1.5", lines)
+        self.assertIn("lmsdownloader_stage_seconds_count{stage=\"login\"} 1", lines)
+        self.assertIn("# TYPE lmsdownloader_pages_total counter", lines)
+        self.assertIn("lmsdownloader_pages_total 3", lines)
+        self.assertIn("lmsdownloader_retries_total 3", lines)
+
+        # Stages are sorted and each sample line is "name value"
+        self.assertLess(lines.index("lmsdownloader_stage_seconds_sum{stage=\"capture\"} 2.0"),
+                        lines.index("lmsdownloader_stage_seconds_sum{stage=\"login\"} 2.0"))
+        for line in lines:
+            if not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1])
+
+    def test_empty(self):
+        text = Metrics().to_prometheus()
+        self.assertTrue(text.endswith("\n"))
+        self.assertTrue(all(line.startswith("#") for line in text.splitlines()))
+
+    def test_jsonl_writer(self):
+        jsonl_file = io.StringIO()
+        metrics = Metrics(jsonl_writer(jsonl_file))
+        with metrics.stage("download", link="a"):
+            pass
+        metrics.count("retries", 2, link="a")
+
+        events = [json.loads(line) for line in jsonl_file.getvalue().splitlines()]
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0]["type"], "stage")
+        self.assertEqual(events[0]["name"], "download")
+        self.assertEqual(events[0]["link"], "a")
+        self.assertGreaterEqual(events[0]["duration"], 0)
+        self.assertEqual({key: events[1][key] for key in ("type", "name", "value", "link")},
+                         {"type": "counter", "name": "retries", "value": 2, "link": "a"})
+        self.assertIn("time", events[1])
+        self.assertEqual(metrics.counters, {"retries": 2})
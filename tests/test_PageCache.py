@@ -0,0 +1,75 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import tempfile
+import unittest
+
+from LMSDownloader.PageCache import PageCache
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self._temp_dir.name
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def _make_old(self, page_cache: PageCache, key: str, timestamp: float) -> None:
+        os.utime(page_cache._path(key), (timestamp, timestamp))
+
+    def test_get_and_put(self) -> None:
+        page_cache = PageCache(self.cache_dir)
+        key = PageCache.make_key("fingerprint", 0, "{}")
+        self.assertNotEqual(key, PageCache.make_key("fingerprint", 1, "{}"))
+        self.assertIsNone(page_cache.get(key))
+        page_cache.put(key, b"pdf")
+        self.assertEqual(page_cache.get(key), b"pdf")
+        self.assertEqual(page_cache.stats, {"hits": 1, "misses": 1, "evictions": 0, "bytes_saved": 3})
+
+    def test_lru_eviction(self) -> None:
+        page_cache = PageCache(self.cache_dir, max_size=300)
+        keys = [PageCache.make_key(name) for name in "abcd"]
+        for index, key in enumerate(keys[:3]):
+            page_cache.put(key, b"x" * 100)
+            self._make_old(page_cache, key, 1000 * (index + 1))
+
+        # "a" is the oldest one, but it's used again
+        self.assertIsNotNone(page_cache.get(keys[0]))
+
+        # Cache is shrunk below 90% of max_size starting from the least recently used pages
+        page_cache.put(keys[3], b"x" * 100)
+        self.assertEqual([os.path.exists(page_cache._path(key)) for key in keys], [True, False, False, True])
+        self.assertEqual(page_cache.stats["evictions"], 2)
+
+        # Size is restored from the disk
+        self.assertEqual(PageCache(self.cache_dir, max_size=300)._size, 200)
+
+    def test_existing_page_is_not_rewritten(self) -> None:
+        page_cache = PageCache(self.cache_dir, max_size=150)
+        key = PageCache.make_key("a")
+        page_cache.put(key, b"x" * 100)
+        page_cache.put(key, b"x" * 100)
+        self.assertEqual(page_cache._size, 100)
+        self.assertEqual(page_cache.stats["evictions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
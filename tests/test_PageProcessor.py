@@ -0,0 +1,80 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+import time
+import unittest
+
+from LMSDownloader.PageProcessor import PageProcessor
+from LMSDownloader.PdfAssembler import PageCollector
+
+
+class TestPageProcessor(unittest.TestCase):
+    def test_pages_in_order(self) -> None:
+        page_collector = PageCollector()
+        callback_pages = []
+        page_processor = PageProcessor(page_collector, workers=4, first_index=2,
+                                       page_callback=lambda page_index, _: callback_pages.append(page_index))
+        try:
+            for page_index in range(2, 22):
+                page_processor.submit_ready(page_index, str(page_index).encode())
+            page_processor.finish()
+        finally:
+            page_processor.close()
+        self.assertEqual(page_collector.pages, [str(page_index).encode() for page_index in range(2, 22)])
+        self.assertEqual(callback_pages, list(range(2, 22)))
+
+    def test_slow_callback_does_not_block_submit(self) -> None:
+        callback_started = threading.Event()
+        release_callback = threading.Event()
+
+        def _page_callback(_page_index: int, _pdf_data: bytes) -> None:
+            callback_started.set()
+            release_callback.wait(5)
+
+        page_processor = PageProcessor(PageCollector(), page_callback=_page_callback)
+        try:
+            page_processor.submit_ready(0, b"0")
+            self.assertTrue(callback_started.wait(5))
+
+            # Other pages are decoded and queued while the first one is still in the callback
+            time_started = time.time()
+            page_processor.submit_ready(1, b"1")
+            page_processor.submit_ready(2, b"2")
+            self.assertLess(time.time() - time_started, 1)
+        finally:
+            release_callback.set()
+            page_processor.close()
+
+    def test_callback_error_is_raised_by_close(self) -> None:
+        def _page_callback(page_index: int, _pdf_data: bytes) -> None:
+            if page_index == 1:
+                raise ValueError("Disk is full")
+
+        page_collector = PageCollector()
+        page_processor = PageProcessor(page_collector, page_callback=_page_callback)
+        for page_index in range(3):
+            page_processor.submit_ready(page_index, str(page_index).encode())
+        with self.assertRaisesRegex(ValueError, "Disk is full"):
+            page_processor.close()
+        self.assertEqual(page_collector.pages, [b"0", b"1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import io
+import os
+import tempfile
+import unittest
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from LMSDownloader.PdfAssembler import PageCollector, PdfAssembler
+
+
+def _make_pdf(*widths: int) -> bytes:
+    """
+    :param widths: Width of each page (used to identify pages)
+    :return: PDF file as bytes
+    """
+    pdf_writer = PdfWriter()
+    for width in widths:
+        pdf_writer.add_blank_page(width=width, height=100)
+    pdf_file = io.BytesIO()
+    pdf_writer.write(pdf_file)
+    return pdf_file.getvalue()
+
+
+def _widths(file_path: str) -> list[int]:
+    return [int(page.mediabox.width) for page in PdfReader(file_path, strict=True).pages]
+
+
+class TestPdfAssembler(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.file_path_base = os.path.join(self._temp_dir.name, "output")
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_pages_in_order(self) -> None:
+        pdf_assembler = PdfAssembler(self.file_path_base)
+        pdf_assembler.add_page(_make_pdf(101))
+        pdf_assembler.add_page(_make_pdf(102, 103))
+        pdf_assembler.add_page(_make_pdf(104))
+        self.assertEqual(pdf_assembler.close(), [self.file_path_base + ".pdf"])
+        self.assertEqual(_widths(self.file_path_base + ".pdf"), [101, 102, 103, 104])
+        self.assertEqual(os.listdir(self._temp_dir.name), ["output.pdf"])
+
+    def test_shared_objects_are_written_once(self) -> None:
+        pdf_assembler = PdfAssembler(self.file_path_base)
+        pdf_assembler.add_page(_make_pdf(101, 102))
+        pdf_assembler.close()
+        pdf_reader = PdfReader(self.file_path_base + ".pdf", strict=True)
+        self.assertEqual(pdf_reader.trailer["/Root"]["/Pages"]["/Count"], 2)
+        for page in pdf_reader.pages:
+            self.assertEqual(page["/Parent"].get_object()["/Type"], "/Pages")
+
+    def test_volumes(self) -> None:
+        page_size = len(_make_pdf(101))
+        pdf_assembler = PdfAssembler(self.file_path_base, max_volume_size=page_size)
+        for width in range(101, 106):
+            pdf_assembler.add_page(_make_pdf(width))
+        volume_paths = pdf_assembler.close()
+        self.assertGreater(len(volume_paths), 1)
+        self.assertEqual(volume_paths, ["{} ({}).pdf".format(self.file_path_base, volume)
+                                        for volume in range(1, len(volume_paths) + 1)])
+        self.assertEqual(sum((_widths(volume_path) for volume_path in volume_paths), []), list(range(101, 106)))
+
+    def test_single_volume_is_not_numbered(self) -> None:
+        pdf_assembler = PdfAssembler(self.file_path_base, max_volume_size=1024 * 1024)
+        pdf_assembler.add_page(_make_pdf(101))
+        self.assertEqual(pdf_assembler.close(), [self.file_path_base + ".pdf"])
+
+    def test_no_pages(self) -> None:
+        self.assertEqual(PdfAssembler(self.file_path_base).close(), [])
+        self.assertEqual(os.listdir(self._temp_dir.name), [])
+
+    def test_abort_deletes_unfinished_file(self) -> None:
+        pdf_assembler = PdfAssembler(self.file_path_base)
+        pdf_assembler.add_page(_make_pdf(101))
+        self.assertEqual(os.listdir(self._temp_dir.name), ["output.pdf.part"])
+        pdf_assembler.abort()
+        self.assertEqual(os.listdir(self._temp_dir.name), [])
+
+    def test_page_collector(self) -> None:
+        page_collector = PageCollector()
+        page_collector.add_page(b"1")
+        page_collector.add_page(b"2")
+        self.assertEqual(page_collector.pages, [b"1", b"2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import unittest
+
+from LMSDownloader.ScormPackage import ScormPackage, find_package_root
+
+ROOT_URL = "https://lms.example.com/pluginfile.php/42/mod_scorm/content/3/"
+
+MANIFEST = b"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest identifier="course" xmlns="http://www.imsglobal.org/xsd/imscp_v1p1"
+          xmlns:adlcp="http://www.adlnet.org/xsd/adlcp_v1p3">
+    <organizations default="main">
+        <organization identifier="other">
+            <item identifier="other_1" identifierref="res_3"/>
+        </organization>
+        <organization identifier="main">
+            <item identifier="item_1" identifierref="res_2"/>
+            <item identifier="item_2">
+                <item identifier="item_2_1" identifierref="res_1"/>
+                <item identifier="item_2_2" identifierref="res_2"/>
+            </item>
+        </organization>
+    </organizations>
+    <resources>
+        <resource identifier="res_1" href="lesson1.html" adlcp:scormType="sco">
+            <file href="lesson1.html"/>
+            <file href="slides/slide10.png"/>
+            <file href="slides/slide2.png"/>
+        </resource>
+        <resource identifier="res_2" href="index.html?page=2" xml:base="content/" adlcp:scormType="sco">
+            <file href="index.html"/>
+            <file href="slide_1.JPG"/>
+            <file href="https://cdn.example.com/slide3.png"/>
+        </resource>
+        <resource identifier="res_3" href="other.html"/>
+        <resource identifier="shared">
+            <file href="lesson1.html"/>
+        </resource>
+    </resources>
+</manifest>
+"""
+
+
+class _FakeHTTPSession:
+    def __init__(self, pages: dict[str, bytes]) -> None:
+        self.pages = pages
+
+    def get(self, url: str) -> bytes:
+        return self.pages[url]
+
+
+class TestScormPackage(unittest.TestCase):
+    def test_manifest(self) -> None:
+        package = ScormPackage(ROOT_URL, MANIFEST)
+
+        # Default organization only, in items order, without repeats
+        self.assertEqual(package.sco_urls, [ROOT_URL + "content/index.html?page=2", ROOT_URL + "lesson1.html"])
+        self.assertEqual(package.file_urls, [ROOT_URL + "lesson1.html", ROOT_URL + "slides/slide10.png",
+                                             ROOT_URL + "slides/slide2.png", ROOT_URL + "content/index.html",
+                                             ROOT_URL + "content/slide_1.JPG", "https://cdn.example.com/slide3.png"])
+
+    def test_slide_image_urls(self) -> None:
+        # Ordered by number, files outside of the package are ignored
+        self.assertEqual(ScormPackage(ROOT_URL, MANIFEST).slide_image_urls(),
+                         [ROOT_URL + "content/slide_1.JPG", ROOT_URL + "slides/slide2.png",
+                          ROOT_URL + "slides/slide10.png"])
+
+    def test_manifest_without_organizations(self) -> None:
+        package = ScormPackage(ROOT_URL, b"<manifest><resources><resource identifier='r' href='a.html'/>"
+                                         b"</resources></manifest>")
+        self.assertEqual(package.sco_urls, [])
+        self.assertEqual(package.slide_image_urls(), [])
+
+    def test_find_package_root(self) -> None:
+        self.assertEqual(find_package_root(_FakeHTTPSession({}), ROOT_URL + "index.html"), ROOT_URL)
+
+        # loadSCO.php redirects using JS with escaped slashes
+        player_url = "https://lms.example.com/mod/scorm/loadSCO.php?a=1&scoid=2"
+        script = "location = \"{}index.html\";".format(ROOT_URL.replace("/", "\\/")).encode("utf-8")
+        self.assertEqual(find_package_root(_FakeHTTPSession({player_url: script}), player_url), ROOT_URL)
+        self.assertIsNone(find_package_root(_FakeHTTPSession({player_url: b"<html></html>"}), player_url))
+
+    def test_open(self) -> None:
+        package = ScormPackage.open(_FakeHTTPSession({ROOT_URL + "imsmanifest.xml": MANIFEST}),
+                                    ROOT_URL + "lesson1.html")
+        self.assertEqual(package.root_url, ROOT_URL)
+        self.assertEqual(len(package.sco_urls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
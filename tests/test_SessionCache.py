@@ -0,0 +1,89 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import stat
+import tempfile
+import unittest
+
+from LMSDownloader.SessionCache import SessionCache
+
+LOGIN_LINK = "https://lms.example.com/login/index.php"
+
+COOKIES = [{"name": "MoodleSession", "value": "secret", "path": "/", "domain": "lms.example.com", "secure": True,
+            "httpOnly": True, "sameSite": "Lax", "size": 42}]
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self._temp_dir.name, "cache", "session.json")
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_save_and_load(self) -> None:
+        SessionCache(self.cache_file).save("student", LOGIN_LINK, COOKIES)
+
+        # Fields that add_cookie() doesn't accept are dropped
+        cookies = SessionCache(self.cache_file).load("student", LOGIN_LINK)
+        self.assertEqual(cookies, [{key: value for key, value in COOKIES[0].items() if key != "size"}])
+
+        # Sessions are separated by login and LMS
+        self.assertIsNone(SessionCache(self.cache_file).load("other", LOGIN_LINK))
+        self.assertIsNone(SessionCache(self.cache_file).load("student", "https://other.example.com/login"))
+
+    def test_file_is_private_and_has_no_login(self) -> None:
+        SessionCache(self.cache_file).save("student", LOGIN_LINK, COOKIES)
+        if os.name == "posix":
+            self.assertEqual(stat.S_IMODE(os.stat(self.cache_file).st_mode), 0o600)
+        with open(self.cache_file, "r", encoding="utf-8") as file:
+            self.assertNotIn("student", file.read())
+        self.assertFalse(os.path.exists(self.cache_file + ".tmp"))
+
+    def test_expired_session(self) -> None:
+        session_cache = SessionCache(self.cache_file, ttl=-1)
+        session_cache.save("student", LOGIN_LINK, COOKIES)
+        self.assertIsNone(session_cache.load("student", LOGIN_LINK))
+
+        # Expired entry is deleted
+        self.assertIsNone(SessionCache(self.cache_file).load("student", LOGIN_LINK))
+
+    def test_invalidate(self) -> None:
+        session_cache = SessionCache(self.cache_file)
+        session_cache.save("student", LOGIN_LINK, COOKIES)
+        session_cache.save("other", LOGIN_LINK, COOKIES)
+        session_cache.invalidate("student", LOGIN_LINK)
+        self.assertIsNone(session_cache.load("student", LOGIN_LINK))
+        self.assertIsNotNone(session_cache.load("other", LOGIN_LINK))
+
+    def test_corrupted_file(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, "w", encoding="utf-8") as file:
+            file.write("{not json")
+        session_cache = SessionCache(self.cache_file)
+        self.assertIsNone(session_cache.load("student", LOGIN_LINK))
+
+        # Cache is overwritten by the next login
+        session_cache.save("student", LOGIN_LINK, COOKIES)
+        self.assertIsNotNone(session_cache.load("student", LOGIN_LINK))
+
+
+if __name__ == "__main__":
+    unittest.main()
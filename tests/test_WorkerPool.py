@@ -0,0 +1,63 @@
+"""
+ Copyright (C) 2023 Fern Lane, LMSDownloader
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+ IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR
+ OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+ OTHER DEALINGS IN THE SOFTWARE.
+"""
+import unittest
+
+from LMSDownloader import WorkerPool
+from LMSDownloader.LMSDownloader import MAX_BROWSER_START_FAILURES, LMSDownloader
+
+
+class _BrokenBrowserDownloader(LMSDownloader):
+    """
+    LMSDownloader which browser never starts
+    """
+    start_attempts = 0
+
+    def _start_browser(self) -> None:
+        _BrokenBrowserDownloader.start_attempts += 1
+        raise Exception("Chrome not found")
+
+
+class TestBrowserStartFailures(unittest.TestCase):
+    def setUp(self) -> None:
+        _BrokenBrowserDownloader.start_attempts = 0
+        self.links = ["link{}".format(index) for index in range(MAX_BROWSER_START_FAILURES + 2)]
+
+    def test_download_many_stops(self) -> None:
+        links = iter(self.links)
+        results = _BrokenBrowserDownloader("", "", "", link_check_regex=".").download_many(links)
+        self.assertEqual(len(results), MAX_BROWSER_START_FAILURES)
+        self.assertTrue(all(result["error"] == "Chrome not found" for result in results))
+        self.assertEqual(_BrokenBrowserDownloader.start_attempts, MAX_BROWSER_START_FAILURES)
+
+        # The rest of links are not taken
+        self.assertEqual(list(links), self.links[MAX_BROWSER_START_FAILURES:])
+
+    def test_download_parallel_reports_left_links(self) -> None:
+        reported = []
+        results = WorkerPool.download_parallel(_BrokenBrowserDownloader("", "", "", link_check_regex="."),
+                                               self.links, workers=1, result_callback=reported.append)
+        self.assertEqual([result["link"] for result in results], self.links)
+        self.assertTrue(all(result["error"] for result in results))
+        self.assertEqual(len(reported), len(self.links))
+        self.assertEqual(_BrokenBrowserDownloader.start_attempts, MAX_BROWSER_START_FAILURES)
+
+
+if __name__ == "__main__":
+    unittest.main()